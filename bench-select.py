@@ -0,0 +1,117 @@
+
+# Benchmark of row decoding for select() on SQLite.
+#
+#     ~/w/binder$ python bench-select.py [row_count]
+#
+# Compares the old per-cell decoding loop in ResultIterator with the
+# per-table row decoder.
+
+import gc, os, sys, tempfile, time
+import datetime
+
+PROJECT_DIR = os.path.abspath(os.path.dirname( __file__ ))
+sys.path.insert(0, PROJECT_DIR)
+
+from binder import *
+
+
+# columns without db_to_py() conversion
+PlainTable = Table(
+    "bench_plain",
+    AutoIdCol("bench_id"),
+    IntCol("i1"),
+    FloatCol("f1"),
+    UnicodeCol("s1", 20),
+)
+
+# columns with and without db_to_py() conversion
+MixedTable = Table(
+    "bench_mixed",
+    AutoIdCol("bench_id"),
+    IntCol("i1"),
+    FloatCol("f1"),
+    UnicodeCol("s1", 20),
+    DateCol("d1"),
+    BoolCol("b1"),
+)
+
+
+class PerCellResultIterator:
+    "ResultIterator as it was before per-table row decoders."
+
+    def __init__(self, cursor, table):
+        self.cursor = cursor
+        self.table = table
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        row = {}
+        values = self.cursor.fetchone()
+        if values is None:
+            self.cursor = None
+            raise StopIteration
+        cols = self.table.cols
+        for i in range(len(cols)):
+            col = cols[i]
+            dbvalue = values[i]
+            value = col.db_to_py(dbvalue)
+            row[col.col_name] = value
+        return row
+
+
+def bench_per_cell(conn, table):
+    col_names = ",".join([col.col_name for col in table.cols])
+    cursor = conn._execute("SELECT %s FROM %s" % (col_names, table.table_name))
+    return list(PerCellResultIterator(cursor, table))
+
+
+def bench_decoder(conn, table):
+    return conn.select(table)
+
+
+def run(name, fn, conn, table, row_count):
+    gc.collect()
+    gc.disable()
+    start = time.time()
+    rows = fn(conn, table)
+    elapsed = time.time() - start
+    gc.enable()
+    assert len(rows) == row_count
+    print "%-12s %-8s %8.2fs %12.0f rows/sec" \
+        % (table.table_name, name, elapsed, row_count / elapsed)
+
+
+def main(row_count):
+    fd, dbfile = tempfile.mkstemp(suffix=".db3")
+    os.close(fd)
+    try:
+        conn = SqliteConnection(dbfile)
+        d = datetime.date(2006, 5, 30)
+        print "SQLite select of %d rows:" % row_count
+        for table in [PlainTable, MixedTable]:
+            conn.create_table(table)
+            rows = []
+            for i in xrange(row_count):
+                row = table.new(i1=i, f1=i * 0.5, s1=u"row %d" % i)
+                if table is MixedTable:
+                    row["d1"] = d
+                    row["b1"] = (i % 2 == 0)
+                rows.append(row)
+            conn.insert_many(table, rows)
+            conn.commit()
+            rows = None
+            run("before", bench_per_cell, conn, table, row_count)
+            run("after", bench_decoder, conn, table, row_count)
+        conn.close()
+    finally:
+        os.remove(dbfile)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        row_count = int(sys.argv[1])
+    else:
+        row_count = 1000000
+    main(row_count)
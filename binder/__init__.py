@@ -14,15 +14,44 @@ from binder.col import DateTimeUTCCol
 # Table definition
 from binder.table import Table
 
+# Row types
+from binder.table import ROW_DICT
+from binder.table import ROW_TUPLE
+from binder.table import ROW_RECORD
+from binder.table import ROW_NAMEDTUPLE
+
 # Query constructors
 from binder.table import AND
 from binder.table import OR
+from binder.table import NOT
+from binder.table import Param
+
+# Aggregate constructors
+from binder.table import COUNT
+from binder.table import SUM
+from binder.table import MIN
+from binder.table import MAX
+from binder.table import AVG
 
 # Connection object
 from binder.db_sqlite import SqliteConnection
 from binder.db_postgres import PostgresConnection
 from binder.db_mysql import MysqlConnection
 
+# Connection running calls on a worker thread
+from binder.asyncconn import AsyncConnection
+
+# Connection pool
+from binder.pool import ConnectionPool
+from binder.pool import PoolTimeout
+
+# Connection per thread
+from binder.threadlocal import ThreadLocalConnection
+
+# Result caches
+from binder.resultcache import DictResultCache
+from binder.resultcache import SqliteResultCache
+
 # Isolation levels
 from binder.conn import READ_COMMITTED
 from binder.conn import REPEATABLE_READ
@@ -0,0 +1,175 @@
+"Connection API returning futures, with calls run on a worker thread."
+
+import Queue
+import sys
+import threading
+
+
+class Future:
+    "Result of a call run on an AsyncConnection's worker thread."
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.isSet()
+
+    def result(self, timeout=None):
+        "Waits for the call and returns its result or raises its exception."
+        self._done.wait(timeout)
+        if not self._done.isSet():
+            raise Exception, "Future: no result after %s seconds" % timeout
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def add_done_callback(self, fn):
+        "Calls fn(future) when done, from the worker thread if not done yet."
+        self._lock.acquire()
+        try:
+            if not self._done.isSet():
+                self._callbacks.append(fn)
+                return
+        finally:
+            self._lock.release()
+        fn(self)
+
+    def _set(self, result, exc_info):
+        self._lock.acquire()
+        try:
+            self._result = result
+            self._exc_info = exc_info
+            self._done.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+        finally:
+            self._lock.release()
+        for fn in callbacks:
+            fn(self)
+
+
+class _CloseFuture(Future):
+
+    def __init__(self, thread):
+        Future.__init__(self)
+        self._thread = thread
+
+    def result(self, timeout=None):
+        result = Future.result(self, timeout)
+        self._thread.join(timeout)
+        return result
+
+
+def _delegate(name):
+    def method(self, *args, **kwargs):
+        return self._call(getattr(self._conn, name), *args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+class AsyncConnection:
+
+    # The connection is opened, used and closed on one worker thread, so
+    # calls run in order and sqlite3's same thread check is satisfied.
+    # Each method returns a Future instead of blocking the caller.
+
+    def __init__(self, conn_class, *args, **kwargs):
+        self._queue = Queue.Queue()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.setDaemon(True)
+        self._thread.start()
+        self._is_open = True
+        # calls queued while an iterator is in use mustn't close it
+        kwargs['multiple_iterators'] = True
+        try:
+            self._conn = self._call(conn_class, *args, **kwargs).result()
+        except:
+            self._queue.put(None)
+            self._is_open = False
+            raise
+        self.DbError = self._conn.DbError
+        self.dialect = self._conn.dialect
+
+    def _call(self, fn, *args, **kwargs):
+        assert self._is_open, "Connection is closed"
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            try:
+                result = fn(*args, **kwargs)
+            except:
+                future._set(None, sys.exc_info())
+            else:
+                future._set(result, None)
+            if isinstance(future, _CloseFuture):
+                return
+
+    def close(self):
+        "Returns Future, its result() also waits for the worker thread to end."
+        assert self._is_open, "Connection is closed"
+        future = _CloseFuture(self._thread)
+        self._queue.put((future, self._conn.close, (), {}))
+        self._is_open = False
+        return future
+
+    commit = _delegate("commit")
+    rollback = _delegate("rollback")
+
+    create_table = _delegate("create_table")
+    drop_table = _delegate("drop_table")
+    drop_table_if_exists = _delegate("drop_table_if_exists")
+
+    insert = _delegate("insert")
+    insert_many = _delegate("insert_many")
+    update = _delegate("update")
+    update_by_id = _delegate("update_by_id")
+    delete = _delegate("delete")
+    delete_by_id = _delegate("delete_by_id")
+
+    select = _delegate("select")
+    select_one = _delegate("select_one")
+    select_by_id = _delegate("select_by_id")
+    get = _delegate("get")
+    get_many = _delegate("get_many")
+    select_distinct = _delegate("select_distinct")
+    count = _delegate("count")
+    aggregate = _delegate("aggregate")
+
+    def xselect(self, *args, **kwargs):
+        "Returns Future of an AsyncResultIterator."
+        future = Future()
+        def wrap(ri_future):
+            try:
+                i = AsyncResultIterator(self, ri_future.result())
+            except:
+                future._set(None, sys.exc_info())
+            else:
+                future._set(i, None)
+        self._call(self._conn.xselect, *args, **kwargs) \
+            .add_done_callback(wrap)
+        return future
+
+
+class AsyncResultIterator:
+
+    def __init__(self, aconn, ri):
+        self._aconn = aconn
+        self._ri = ri
+
+    def next_batch(self):
+        "Returns Future of a list of up to batch_size rows, empty at the end."
+        return self._aconn._call(self._ri.next_batch)
+
+    def close(self):
+        return self._aconn._call(self._ri.close)
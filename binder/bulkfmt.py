@@ -0,0 +1,280 @@
+"""Text formats for bulk loading and exporting rows - Postgres COPY and
+MySQL LOAD DATA."""
+
+import re
+from datetime import datetime
+
+from binder.col import *
+from binder.sqlgen import DIALECT_POSTGRES, DIALECT_MYSQL, row_values
+
+
+# NULL marker, fields are separated by tabs and rows end with a newline
+NULL_FIELD = "\\N"
+
+_ESCAPES = {
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\0": "\\0",
+    }
+
+_ESCAPE_RE = re.compile(r"[\\\t\n\r\0]")
+
+# as output by Postgres COPY TO, also \ooo octal and \xhh hex
+_UNESCAPES_POSTGRES = {
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+    }
+
+_UNESCAPE_RE_POSTGRES = re.compile(r"\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)")
+
+# as output by MySQL SELECT INTO OUTFILE
+_UNESCAPES_MYSQL = {
+    "0": "\0",
+    "Z": "\x1a",
+    "b": "\b",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    }
+
+_UNESCAPE_RE_MYSQL = re.compile(r"\\(.)", re.DOTALL)
+
+
+def escape_field(s):
+    return _ESCAPE_RE.sub(lambda m: _ESCAPES[m.group(0)], s)
+
+
+def unescape_field(s, dialect=DIALECT_POSTGRES):
+    if not "\\" in s:
+        return s
+    if dialect == DIALECT_MYSQL:
+        return _UNESCAPE_RE_MYSQL.sub(_unescape_match_mysql, s)
+    return _UNESCAPE_RE_POSTGRES.sub(_unescape_match_postgres, s)
+
+
+def _unescape_match_postgres(m):
+    seq = m.group(1)
+    if seq[0] == "x" and len(seq) > 1:
+        return chr(int(seq[1:], 16))
+    if seq[0] in "01234567":
+        return chr(int(seq, 8) & 0xff)
+    return _UNESCAPES_POSTGRES.get(seq, seq)
+
+
+def _unescape_match_mysql(m):
+    c = m.group(1)
+    return _UNESCAPES_MYSQL.get(c, c)
+
+
+def _str_field(col, value):
+    return str(value)
+
+def _float_field(col, value):
+    return repr(float(value))
+
+def _bool_field_postgres(col, value):
+    if value:
+        return "t"
+    return "f"
+
+def _bool_field_mysql(col, value):
+    if value:
+        return "1"
+    return "0"
+
+def _datetime_field_mysql(col, value):
+    assert value.tzinfo is None
+    return value.isoformat(" ")[:19]
+
+def _unicode_field(col, value):
+    return col.py_to_db(value).encode("utf-8")
+
+def _db_field(col, value):
+    return col.py_to_db(value)
+
+
+_TO_FIELD_POSTGRES = {
+    AutoIdCol: _str_field,
+    IntCol: _str_field,
+    FloatCol: _float_field,
+    BoolCol: _bool_field_postgres,
+    UnicodeCol: _unicode_field,
+    DateCol: _db_field,
+    DateTimeUTCCol: _db_field,
+}
+
+_TO_FIELD_MYSQL = {
+    AutoIdCol: _str_field,
+    IntCol: _str_field,
+    FloatCol: _float_field,
+    BoolCol: _bool_field_mysql,
+    UnicodeCol: _unicode_field,
+    DateCol: _db_field,
+    DateTimeUTCCol: _datetime_field_mysql,
+}
+
+_TO_FIELD = {
+    DIALECT_POSTGRES: _TO_FIELD_POSTGRES,
+    DIALECT_MYSQL: _TO_FIELD_MYSQL,
+}
+
+
+def _int_value(col, s):
+    return int(s)
+
+def _float_value(col, s):
+    return float(s)
+
+def _bool_value_postgres(col, s):
+    return s == "t"
+
+def _bool_value_mysql(col, s):
+    return s != "0"
+
+def _unicode_value(col, s):
+    return s.decode("utf-8")
+
+def _date_value(col, s):
+    return col.db_to_py(s)
+
+def _datetime_value(col, s):
+    # "YYYY-MM-DD HH:MM:SS" with optional fraction of a second
+    return datetime.strptime(s[:19], "%Y-%m-%d %H:%M:%S")
+
+
+_FROM_FIELD_POSTGRES = {
+    AutoIdCol: _int_value,
+    IntCol: _int_value,
+    FloatCol: _float_value,
+    BoolCol: _bool_value_postgres,
+    UnicodeCol: _unicode_value,
+    DateCol: _date_value,
+    DateTimeUTCCol: _datetime_value,
+}
+
+_FROM_FIELD_MYSQL = {
+    AutoIdCol: _int_value,
+    IntCol: _int_value,
+    FloatCol: _float_value,
+    BoolCol: _bool_value_mysql,
+    UnicodeCol: _unicode_value,
+    DateCol: _date_value,
+    DateTimeUTCCol: _datetime_value,
+}
+
+_FROM_FIELD = {
+    DIALECT_POSTGRES: _FROM_FIELD_POSTGRES,
+    DIALECT_MYSQL: _FROM_FIELD_MYSQL,
+}
+
+
+def bulk_cols(table, row, fn_name):
+    # Columns loaded for a stream of rows, decided by the first row - an
+    # AutoIdCol with value None is left out so the database assigns ids.
+    auto_id_col = table.auto_id_col
+    if auto_id_col is None or row is None:
+        return table.cols
+    values = row_values(table, row, fn_name)
+    if values[table.cols.index(auto_id_col)] is None:
+        return tuple([col for col in table.cols if not col is auto_id_col])
+    return table.cols
+
+
+def bulk_line(table, cols, row, dialect, fn_name):
+    "Returns the row as a line of tab separated, escaped fields."
+    to_field = _TO_FIELD[dialect]
+    auto_id_col = table.auto_id_col
+    skip_auto_id = not auto_id_col in cols
+    fields = []
+    for col, value in zip(table.cols, row_values(table, row, fn_name)):
+        if col is auto_id_col:
+            assert (value is None) == skip_auto_id, \
+                "%s(): AutoIdCol must be None in all rows or none" % fn_name
+            if skip_auto_id:
+                continue
+        col.check_value(value)
+        if value is None:
+            fields.append(NULL_FIELD)
+        else:
+            fields.append(escape_field(to_field[col.__class__](col, value)))
+    return "\t".join(fields) + "\n"
+
+
+def write_bulk_file(f, table, rows, dialect, fn_name):
+    # Writes rows as lines to file f, returns (cols, row count)
+    cols = None
+    count = 0
+    for row in rows:
+        if cols is None:
+            cols = bulk_cols(table, row, fn_name)
+        f.write(bulk_line(table, cols, row, dialect, fn_name))
+        count += 1
+    if cols is None:
+        cols = table.cols
+    return cols, count
+
+
+def parse_bulk_line(cols, line, dialect):
+    "Returns tuple of Python values for a line of the given columns."
+    from_field = _FROM_FIELD[dialect]
+    if line.endswith("\n"):
+        line = line[:-1]
+    fields = line.split("\t")
+    assert len(fields) == len(cols), \
+        "Expected %d fields, got %d" % (len(cols), len(fields))
+    values = []
+    for col, field in zip(cols, fields):
+        if field == NULL_FIELD:
+            values.append(None)
+        else:
+            values.append(
+                from_field[col.__class__](col, unescape_field(field, dialect))
+                )
+    return tuple(values)
+
+
+class LineReader:
+    "File-like object reading lines from an iterator, for COPY FROM STDIN."
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buf = ""
+
+    def read(self, size=-1):
+        buf = self._buf
+        parts = [buf]
+        length = len(buf)
+        while size < 0 or length < size:
+            try:
+                line = self._lines.next()
+            except StopIteration:
+                break
+            parts.append(line)
+            length += len(line)
+        data = "".join(parts)
+        if size < 0:
+            self._buf = ""
+            return data
+        self._buf = data[size:]
+        return data[:size]
+
+    def readline(self, size=-1):
+        if self._buf:
+            i = self._buf.find("\n")
+            if i >= 0:
+                line = self._buf[:i + 1]
+                self._buf = self._buf[i + 1:]
+                return line
+            line = self._buf
+            self._buf = ""
+            return line
+        try:
+            return self._lines.next()
+        except StopIteration:
+            return ""
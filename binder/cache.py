@@ -0,0 +1,78 @@
+"Bounded caches used by Connection."
+
+
+class LruCache:
+    "Least recently used cache with a size limit and hit/miss counters."
+
+    def __init__(self, max_size):
+        assert type(max_size) is int, "max_size must be int"
+        assert max_size > 0, "max_size must be > 0"
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._map = {}
+        # circular doubly linked list of [prev, next, key, value] links,
+        # most recently used first
+        self._root = root = []
+        root[:] = [root, root, None, None]
+
+    def __len__(self):
+        return len(self._map)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def keys(self):
+        return self._map.keys()
+
+    def get(self, key, default=None):
+        link = self._map.get(key)
+        if link is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._unlink(link)
+        self._link_first(link)
+        return link[3]
+
+    def put(self, key, value):
+        link = self._map.get(key)
+        if link is not None:
+            link[3] = value
+            self._unlink(link)
+            self._link_first(link)
+            return
+        if len(self._map) >= self.max_size:
+            oldest = self._root[0]
+            self._unlink(oldest)
+            del self._map[oldest[2]]
+        link = [None, None, key, value]
+        self._link_first(link)
+        self._map[key] = link
+
+    def discard(self, key):
+        link = self._map.pop(key, None)
+        if link is not None:
+            self._unlink(link)
+
+    def clear(self):
+        self._map.clear()
+        root = self._root
+        root[:] = [root, root, None, None]
+
+    def _unlink(self, link):
+        prev_link, next_link = link[0], link[1]
+        prev_link[1] = next_link
+        next_link[0] = prev_link
+
+    def _link_first(self, link):
+        root = self._root
+        first = root[1]
+        link[0] = root
+        link[1] = first
+        first[0] = link
+        root[1] = link
+
+    def __repr__(self):
+        return "<LruCache:size=%d,max_size=%d,hits=%d,misses=%d>" \
+            % (len(self._map), self.max_size, self.hits, self.misses)
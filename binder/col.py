@@ -147,6 +147,13 @@ class BoolCol(ColBase):
             return None
         return bool(int(value))
 
+    def db_to_py(self, dbvalue):
+        if dbvalue is None:
+            return None
+        else:
+            # sqlite / mysql: stored as integer
+            return bool(dbvalue)
+
     def to_str(self, value):
         if value is None:
             return ""
@@ -1,6 +1,10 @@
+import weakref
 
 from binder import sqlgen
-from binder.sqlgen import DIALECT_POSTGRES
+from binder.cache import LruCache
+from binder.sqlgen import DIALECT_SQLITE, DIALECT_POSTGRES
+from binder.table import ROW_DICT, ROW_TUPLE, _ROW_FACTORIES, SqlCondition, \
+    SqlSort, AND, QueryCol, COUNT, SUM
 
 _debug = False
 
@@ -13,27 +17,80 @@ _VALID_ISOLATION_LEVELS = [
     REPEATABLE_READ,
     ]
 
+# Max rows sent per executemany() call by insert_many()
+INSERT_MANY_CHUNK_SIZE = 1000
+
+# Default number of rows fetched at a time by result iterators
+FETCH_BATCH_SIZE = 100
+
+# Default max number of generated SQL statements cached per connection
+SQL_CACHE_SIZE = 100
+
 
 class Connection:
 
-    def __init__(self, dbconn, dberror, dialect, paramstr, read_only):
+    def __init__(self, dbconn, dberror, dialect, paramstr, read_only,
+            sql_cache_size=SQL_CACHE_SIZE, row_factory=ROW_DICT,
+            row_cache_size=0, result_cache=None, multiple_iterators=False,
+            db_id=None):
+        assert row_factory in _ROW_FACTORIES, \
+            "Unknown row_factory: %s" % row_factory
+        assert result_cache is None or db_id is not None, \
+            "result_cache requires db_id"
         self._is_open = True
         self._dbconn = dbconn
+        # result iterator closed by the next query - None if not open
         self._last_ri = None
+        # open result iterators if multiple_iterators - None if not enabled
+        if multiple_iterators:
+            self._open_ris = weakref.WeakSet()
+        else:
+            self._open_ris = None
         self._read_only = read_only
         self.DbError = dberror
         self.dialect = dialect
         self.paramstr = paramstr
+        self._prepare_count = 0
+        self.row_factory = row_factory
+        # generated SQL cache - None if disabled
+        if sql_cache_size:
+            self.sql_cache = LruCache(sql_cache_size)
+        else:
+            self.sql_cache = None
+        # rows by (table, id) for select_by_id() - None if disabled
+        if row_cache_size:
+            self.row_cache = LruCache(row_cache_size)
+        else:
+            self.row_cache = None
+        # select() results shared with other connections - None if disabled
+        self.result_cache = result_cache
+        # identifies the database in result cache keys and generations
+        self._db_id = db_id
+        # tables written in the current transaction, not read from the
+        # result cache until commit / rollback
+        self._written_tables = set()
+        # True if transactions read a snapshot taken by their first
+        # statement i.e. REPEATABLE READ, set by subclasses
+        self._snapshot_reads = False
+        self._txn_started = False
+        # result cache generations read before the transaction's snapshot
+        self._txn_gens = {}
 
 
     def commit(self):
         self._dbconn.commit()
+        self._end_transaction()
 
     def rollback(self):
         self._dbconn.rollback()
+        if self.row_cache is not None:
+            self.row_cache.clear()
+        self._end_transaction()
 
     def close(self):
-        self._close_last_ri()
+        self._close_ris()
+        if self.row_cache is not None:
+            self.row_cache.clear()
         self._dbconn.close()
         self._dbconn = None
         self._is_open = False
@@ -44,19 +101,118 @@ class Connection:
             self._last_ri.close()
             self._last_ri = None
 
-    def _execute(self, sql, values=[]):
+    def _track_ri(self, i):
+        # Each query has its own cursor, so iterators only need closing
+        # by the next query if they are not tracked for close()
+        if self._open_ris is None:
+            self._last_ri = i
+        else:
+            self._open_ris.add(i)
+
+    def _close_ris(self):
+        self._close_last_ri()
+        if self._open_ris:
+            for i in list(self._open_ris):
+                i.close()
+            self._open_ris.clear()
+
+    def _execute(self, sql, values=[], stream=False):
         assert self._is_open, "Connection is closed"
         if _debug:
             print "DEBUG: _execute(%s, %s)" % (repr(sql), values)
         self._close_last_ri()
-        cursor = self._dbconn.cursor()
+        self._txn_started = True
+        if stream:
+            cursor = self._stream_cursor()
+        else:
+            cursor = self._dbconn.cursor()
         cursor.execute(sql, values)
         return cursor
 
+    def _stream_cursor(self):
+        # Cursor that fetches rows from the server as they are consumed.
+        # sqlite3 cursors already step through results lazily.
+        return self._dbconn.cursor()
+
+    def _executemany(self, sql, values_list):
+        assert self._is_open, "Connection is closed"
+        if _debug:
+            print "DEBUG: _executemany(%s, <%d rows>)" \
+                % (repr(sql), len(values_list))
+        self._close_last_ri()
+        self._txn_started = True
+        cursor = self._dbconn.cursor()
+        cursor.executemany(sql, values_list)
+        return cursor
+
     def _check_write_ok(self):
         if self._read_only:
             raise Exception, "Connection is read only: " + self._read_only
 
+    def _row_cache_put(self, table, row):
+        # Caches the values the database will return for the row i.e.
+        # after a round trip through py_to_db() / db_to_py()
+        values = []
+        row_values = sqlgen.row_values(table, row, "_row_cache_put")
+        for col, value in zip(table.cols, row_values):
+            if not value is None:
+                value = col.db_to_py(col.py_to_db(value))
+            values.append(value)
+        row_id = values[table.cols.index(table.auto_id_col)]
+        self.row_cache.put((table, row_id), tuple(values))
+
+    def _row_cache_clear_table(self, table):
+        row_cache = self.row_cache
+        for key in row_cache.keys():
+            if key[0] is table:
+                row_cache.discard(key)
+
+    def _table_written(self, table):
+        self._table_name_written(table.table_name)
+
+    def _table_name_written(self, table_name):
+        if self.result_cache is not None:
+            self._written_tables.add(table_name)
+            self.result_cache.invalidate(self._db_id, table_name)
+
+    def _end_transaction(self):
+        # Other connections may have cached the old rows while the
+        # transaction was open, so invalidate again now it has ended
+        if self._written_tables:
+            for table_name in self._written_tables:
+                self.result_cache.invalidate(self._db_id, table_name)
+            self._written_tables.clear()
+        self._txn_started = False
+        self._txn_gens.clear()
+
+    def _result_cached(self, table):
+        result_cache = self.result_cache
+        return result_cache is not None and result_cache.caches(table) \
+            and not table.table_name in self._written_tables
+
+    def _result_gens(self, table_names):
+        # Read before the query, so a write committed while it runs leaves
+        # the stored result stale
+        return self.result_cache.gens(self._db_id, table_names)
+
+    def _result_put_ok(self, table_names, gens):
+        # A snapshot taken by an earlier statement of the transaction may be
+        # older than the last invalidation - results are only stored while
+        # the gens match those read before the snapshot was taken
+        if not self._snapshot_reads:
+            return True
+        txn_gens = self._txn_gens
+        put_ok = True
+        for table_name, gen in zip(table_names, gens):
+            if not table_name in txn_gens:
+                if self._txn_started:
+                    put_ok = False
+                    continue
+                txn_gens[table_name] = gen
+            if txn_gens[table_name] != gen:
+                put_ok = False
+        return put_ok
+
 
     def create_table(self, table):
         # read only check
@@ -64,6 +220,9 @@ class Connection:
         #
         sql = sqlgen.create_table(self.dialect, table)
         self._execute(sql)
+        if self.row_cache is not None:
+            self._row_cache_clear_table(table)
+        self._table_written(table)
 
     def drop_table(self, table, if_exists=False):
         # read only check
@@ -71,6 +230,9 @@ class Connection:
         #
         sql = sqlgen.drop_table(table, if_exists)
         self._execute(sql)
+        if self.row_cache is not None:
+            self._row_cache_clear_table(table)
+        self._table_written(table)
 
     def drop_table_if_exists(self, table):
         self.drop_table(table, True)
@@ -81,7 +243,9 @@ class Connection:
         self._check_write_ok()
         # gen sql
         sql, values, auto_id_used = \
-            sqlgen.insert(table, row, self.dialect, self.paramstr)
+            sqlgen.insert(
+                table, row, self.dialect, self.paramstr, self.sql_cache
+                )
         # execute sql
         cursor = self._execute(sql, values)
         assert cursor.rowcount == 1, \
@@ -93,19 +257,107 @@ class Connection:
             else:
                 new_id = cursor.lastrowid
             row[table.auto_id_col.col_name] = new_id
+        if self.row_cache is not None and table.auto_id_col:
+            self._row_cache_put(table, row)
+        self._table_written(table)
+
+
+    def insert_many(self, table, rows, chunk_size=INSERT_MANY_CHUNK_SIZE,
+            multirow=False):
+        # read only check
+        self._check_write_ok()
+        assert chunk_size > 0, "insert_many(): chunk_size must be > 0"
+        self._table_written(table)
+        if multirow:
+            self._insert_multirow(table, rows, chunk_size)
+            return
+        # gen sql - also checks all rows before anything is inserted
+        groups = sqlgen.insert_many(table, rows, self.dialect, self.paramstr)
+        # execute sql - one statement per NULL pattern
+        for sql, auto_id_used, row_indexes, values_list in groups:
+            for start in range(0, len(values_list), chunk_size):
+                chunk = values_list[start:start + chunk_size]
+                if auto_id_used and self.dialect == DIALECT_POSTGRES:
+                    # executemany() discards RETURNING results
+                    cursor = self._execute(sql, chunk[0])
+                    new_ids = [cursor.fetchone()[0]]
+                    for values in chunk[1:]:
+                        cursor.execute(sql, values)
+                        new_ids.append(cursor.fetchone()[0])
+                else:
+                    cursor = self._executemany(sql, chunk)
+                    assert cursor.rowcount == len(chunk), \
+                        "insert_many(): expected rowcount=%s, got %s" \
+                            % (len(chunk), cursor.rowcount)
+                    if auto_id_used:
+                        new_ids = self._new_ids(cursor, len(chunk))
+                if auto_id_used:
+                    chunk_indexes = row_indexes[start:start + chunk_size]
+                    self._set_new_ids(table, rows, chunk_indexes, new_ids)
+
+    def _insert_multirow(self, table, rows, max_rows):
+        # gen sql - also checks all rows before anything is inserted
+        stmts = sqlgen.insert_multirow(
+            table, rows, self.dialect, self.paramstr, max_rows
+            )
+        # execute sql - one multi-row INSERT per statement
+        for sql, auto_id_used, row_indexes, values in stmts:
+            cursor = self._execute(sql, values)
+            assert cursor.rowcount == len(row_indexes), \
+                "insert_many(): expected rowcount=%s, got %s" \
+                    % (len(row_indexes), cursor.rowcount)
+            if auto_id_used:
+                if self.dialect == DIALECT_POSTGRES:
+                    new_ids = [r[0] for r in cursor.fetchall()]
+                else:
+                    new_ids = self._new_ids(cursor, len(row_indexes))
+                self._set_new_ids(table, rows, row_indexes, new_ids)
 
+    def _set_new_ids(self, table, rows, row_indexes, new_ids):
+        # replace AutoIdCol None with actual ids
+        assert len(row_indexes) == len(new_ids)
+        col_name = table.auto_id_col.col_name
+        for row_index, new_id in zip(row_indexes, new_ids):
+            rows[row_index][col_name] = new_id
+
+    def _new_ids(self, cursor, count):
+        # Ids generated by a single executemany() or multi-row INSERT are
+        # consecutive since the insert holds the write lock (SQLite) or the
+        # auto-inc lock (MySQL with innodb_autoinc_lock_mode 0 or 1).
+        if self.dialect == DIALECT_SQLITE:
+            # sqlite3 does not set lastrowid for executemany()
+            cursor.execute("SELECT last_insert_rowid()")
+            last_id = cursor.fetchone()[0]
+            first_id = last_id - count + 1
+        else:
+            # MySQL returns the first id of a multi-row INSERT
+            first_id = cursor.lastrowid
+        return range(first_id, first_id + count)
 
 
     def update(self, table, row, where):
         # read only check
         self._check_write_ok()
-        # gen sql
-        sql, values = sqlgen.update(
-            table, row, where, self.dialect, self.paramstr
+        # large IN lists are split over several statements
+        first_values = dict(zip(
+            table.cols, sqlgen.row_values(table, row, "update")
+            ))
+        wheres = sqlgen.split_where(
+            where, self.dialect, len(table.cols), first_values
             )
-        # execute sql
-        cursor = self._execute(sql, values)
-        rowcount = cursor.rowcount
+        rowcount = 0
+        for part_where in wheres:
+            # gen sql
+            sql, values = sqlgen.update(
+                table, row, part_where, self.dialect, self.paramstr,
+                self.sql_cache
+                )
+            # execute sql
+            cursor = self._execute(sql, values)
+            rowcount += cursor.rowcount
+        if self.row_cache is not None:
+            self._row_cache_clear_table(table)
+        self._table_written(table)
         return rowcount
 
 
@@ -117,6 +369,12 @@ class Connection:
         # execute sql
         cursor = self._execute(sql, values)
         rc = cursor.rowcount
+        if self.row_cache is not None:
+            if rc == 1:
+                self._row_cache_put(table, row)
+            else:
+                self.row_cache.discard((table, values[-1]))
+        self._table_written(table)
         if rc == 1:
             return True
         if rc == 0:
@@ -131,13 +389,20 @@ class Connection:
     def delete(self, table, where=None):
         # read only check
         self._check_write_ok()
-        # gen sql
-        sql, values = sqlgen.delete(
-            table, where, self.dialect, self.paramstr
-            )
-        # execute sql
-        cursor = self._execute(sql, values)
-        rowcount = cursor.rowcount
+        # large IN lists are split over several statements
+        wheres = sqlgen.split_where(where, self.dialect)
+        rowcount = 0
+        for part_where in wheres:
+            # gen sql
+            sql, values = sqlgen.delete(
+                table, part_where, self.dialect, self.paramstr, self.sql_cache
+                )
+            # execute sql
+            cursor = self._execute(sql, values)
+            rowcount += cursor.rowcount
+        if self.row_cache is not None:
+            self._row_cache_clear_table(table)
+        self._table_written(table)
         return rowcount
 
 
@@ -149,6 +414,9 @@ class Connection:
         # execute sql
         cursor = self._execute(sql, values)
         rc = cursor.rowcount
+        if self.row_cache is not None:
+            self.row_cache.discard((table, row_id))
+        self._table_written(table)
         if rc == 1:
             return True
         if rc == 0:
@@ -160,7 +428,7 @@ class Connection:
             )
 
 
-    def select_by_id(self, table, row_id):
+    def select_by_id(self, table, row_id, row_factory=None, cols=None):
         # construct where clause
         auto_id_col = table.auto_id_col
         assert auto_id_col, \
@@ -170,108 +438,566 @@ class Connection:
             "select_by_id(): cannot use None for AutoIdCol"
         q_auto_id_col = getattr(table.q, auto_id_col.col_name)
         where_id = (q_auto_id_col == row_id)
-        # call select_one
-        return self.select_one(table, where_id)
+        row_cache = self.row_cache
+        if row_cache is None or not cols is None:
+            # call select_one
+            return self.select_one(table, where_id, None, row_factory, cols)
+        # cached as tuple of values, new row built for each call
+        key = (table, row_id)
+        values = row_cache.get(key)
+        if values is None:
+            values = self.select_one(table, where_id, None, ROW_TUPLE)
+            if values is None:
+                return None
+            row_cache.put(key, values)
+        return table.row_builder(row_factory or self.row_factory)(values)
 
     get = select_by_id
 
-    def xselect(self, table, where=None, order_by=None):
+    def get_many(self, table, row_ids, row_factory=None, cols=None):
+        # Returns rows in the order of row_ids, None for ids not found
+        auto_id_col = table.auto_id_col
+        assert auto_id_col, \
+            "get_many(): table '%s' does not have AutoIdCol" % \
+                table.table_name
+        row_ids = list(row_ids)
+        assert not None in row_ids, \
+            "get_many(): cannot use None for AutoIdCol"
+        if not row_ids:
+            return []
+        get_id = _row_getter(
+            table, sqlgen.select_cols(table, cols), auto_id_col, "get_many"
+            )
+        # fetch each row once - IN lists are split if too long
+        unique_ids = []
+        seen = set()
+        for row_id in row_ids:
+            if not row_id in seen:
+                seen.add(row_id)
+                unique_ids.append(row_id)
+        q_auto_id_col = getattr(table.q, auto_id_col.col_name)
+        row_cache = self.row_cache
+        row_map = {}
+        if row_cache is None or not cols is None:
+            rows = self.select(
+                table, q_auto_id_col.IN(unique_ids), None, row_factory, cols
+                )
+            for row in rows:
+                row_map[get_id(row)] = row
+        else:
+            build_row = table.row_builder(row_factory or self.row_factory)
+            missing_ids = []
+            for row_id in unique_ids:
+                values = row_cache.get((table, row_id))
+                if values is None:
+                    missing_ids.append(row_id)
+                else:
+                    row_map[row_id] = build_row(values)
+            if missing_ids:
+                values_list = self.select(
+                    table, q_auto_id_col.IN(missing_ids), None, ROW_TUPLE
+                    )
+                for values in values_list:
+                    row_id = get_id(values)
+                    row_cache.put((table, row_id), values)
+                    row_map[row_id] = build_row(values)
+        return [row_map.get(row_id) for row_id in row_ids]
+
+    def xselect(self, table, where=None, order_by=None,
+            batch_size=FETCH_BATCH_SIZE, stream=False, row_factory=None,
+            cols=None, limit=None, offset=None):
+        # large IN lists are split over several statements
+        wheres = sqlgen.split_where(where, self.dialect, 2)
+        if len(wheres) > 1:
+            return self._xselect_split(
+                table, where, wheres, order_by, batch_size, row_factory,
+                cols, limit, offset
+                )
         # gen sql
+        cols = sqlgen.select_cols(table, cols)
         sql, values = sqlgen.select(
-            table, where, order_by, self.dialect, self.paramstr
+            table, where, order_by, self.dialect, self.paramstr,
+            self.sql_cache, cols, limit, offset
             )
         # execute sql
-        cursor = self._execute(sql, values)
+        cursor = self._execute(sql, values, stream)
         # result iterator
-        i = ResultIterator(cursor, table, self.DbError, where)
-        self._last_ri = i
+        i = ResultIterator(
+            cursor, table, self.DbError, where, batch_size,
+            row_factory or self.row_factory, cols
+            )
+        self._track_ri(i)
+        return i
+
+    def _xselect_split(self, table, where, wheres, order_by, batch_size,
+            row_factory, cols, limit, offset):
+        # One query per part of the where clause, merged in order_by order.
+        # Rows are fetched eagerly.
+        if limit is None:
+            part_limit = None
+        else:
+            part_limit = (offset or 0) + limit
+        rows = []
+        for part_where in wheres:
+            rows.extend(self.select(
+                table, part_where, order_by, row_factory, cols, part_limit
+                ))
+        cols = sqlgen.select_cols(table, cols)
+        if order_by:
+            rows.sort(
+                key=self._sort_key_fn(table, cols, order_by.col, "select"),
+                reverse=not order_by.asc
+                )
+        if offset:
+            rows = rows[offset:]
+        if not limit is None:
+            rows = rows[:limit]
+        i = ResultIterator(
+            None, table, self.DbError, where, batch_size,
+            row_factory or self.row_factory, cols
+            )
+        i._rows = rows
+        self._track_ri(i)
         return i
 
-    def select(self, table, where=None, order_by=None):
-        return list(
-                self.xselect(table, where, order_by)
+    def _sort_key_fn(self, table, cols, col, fn_name):
+        # Python sort key matching the database's ORDER BY col
+        get_value = _row_getter(table, cols, col, fn_name)
+        nocase = getattr(col, "collate_nocase", False)
+        # NULL sorts first in SQLite and MySQL, last in Postgres
+        nulls_last = self.dialect == DIALECT_POSTGRES
+        def sort_key(row):
+            value = get_value(row)
+            if value is None:
+                return (nulls_last, value)
+            if nocase:
+                value = value.lower()
+            return (not nulls_last, value)
+        return sort_key
+
+    def xselect_batches(self, table, where=None, order_by=None,
+            batch_size=FETCH_BATCH_SIZE, stream=False, row_factory=None,
+            cols=None, limit=None, offset=None):
+        return self.xselect(
+            table, where, order_by, batch_size, stream, row_factory, cols,
+            limit, offset
+            ).batches()
+
+    def select(self, table, where=None, order_by=None, row_factory=None,
+            cols=None, limit=None, offset=None):
+        if self._result_cached(table):
+            return self._select_cached(
+                table, where, order_by, row_factory, cols, limit, offset
+                )
+        rows = []
+        for batch in self.xselect_batches(
+                table, where, order_by, row_factory=row_factory, cols=cols,
+                limit=limit, offset=offset):
+            rows.extend(batch)
+        return rows
+
+    def _select_cached(self, table, where, order_by, row_factory, cols,
+            limit, offset):
+        # large IN lists are split over several statements, not cached
+        if len(sqlgen.split_where(where, self.dialect, 2)) > 1:
+            xselect = self.xselect(
+                table, where, order_by, row_factory=row_factory, cols=cols,
+                limit=limit, offset=offset
+                )
+            return list(xselect)
+        # gen sql
+        cols = sqlgen.select_cols(table, cols)
+        sql, values = sqlgen.select(
+            table, where, order_by, self.dialect, self.paramstr,
+            self.sql_cache, cols, limit, offset
+            )
+        # cached values are tuples, built into rows for each caller
+        key = (self._db_id, sql, tuple(values))
+        table_names = (table.table_name,)
+        gens = self._result_gens(table_names)
+        rows_values = self.result_cache.get(key, gens)
+        if rows_values is None:
+            put_ok = self._result_put_ok(table_names, gens)
+            cursor = self._execute(sql, values)
+            i = ResultIterator(
+                cursor, table, self.DbError, where, FETCH_BATCH_SIZE,
+                ROW_TUPLE, cols
+                )
+            rows_values = list(i)
+            if put_ok:
+                self.result_cache.put(key, rows_values, gens)
+        build_row = table.row_builder(row_factory or self.row_factory, cols)
+        return [build_row(row_values) for row_values in rows_values]
+
+    def xselect_pages(self, table, order_by, where=None,
+            page_size=FETCH_BATCH_SIZE, after=None, row_factory=None,
+            cols=None):
+        # Keyset pagination - each page is a separate query starting after
+        # the last order_by value seen, so deep pages cost the same as the
+        # first unlike OFFSET. The order_by column must be unique and not
+        # NULL e.g. an AutoIdCol.
+        assert isinstance(order_by, SqlSort), \
+            "xselect_pages(): order_by must be SqlSort"
+        assert page_size > 0, "xselect_pages(): page_size must be > 0"
+        col = order_by.col
+        if order_by.asc:
+            op = ">"
+        else:
+            op = "<"
+        get_value = _row_getter(
+            table, sqlgen.select_cols(table, cols), col, "xselect_pages"
             )
+        while True:
+            page_where = where
+            if not after is None:
+                page_where = _and_where(where, SqlCondition(col, op, after))
+            rows = self.select(
+                table, page_where, order_by, row_factory, cols, page_size
+                )
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            after = get_value(rows[-1])
 
 
-    def select_one(self, table, where=None, order_by=None):
-        #
-        i = self.xselect(table, where, order_by)
+    def select_one(self, table, where=None, order_by=None, row_factory=None,
+            cols=None):
+        # only need to fetch 2 rows to check for more than 1 row
+        i = self.xselect(
+            table, where, order_by, 2, row_factory=row_factory, cols=cols
+            )
         #
-        row = None
-        try:
-            row = i.next()
-            i.next()
-            assert False, (
-                    "select_one(): more than 1 row",
-                    (table.table_name, i.where) #, rc)
-                )
-        except StopIteration:
-            return row
+        return _select_one_row(table, i)
 
 
-    def xselect_distinct(self, table, qcol, where=None, order_by=None):
+    def xselect_distinct(self, table, qcol, where=None, order_by=None,
+            batch_size=FETCH_BATCH_SIZE, stream=False):
+        # large IN lists are split over several statements
+        wheres = sqlgen.split_where(where, self.dialect)
+        if len(wheres) > 1:
+            return self._xselect_distinct_split(
+                table, qcol, wheres, order_by, batch_size
+                )
         # gen sql
         sql, values = sqlgen.select_distinct(
-            table, qcol, where, order_by, self.dialect, self.paramstr
+            table, qcol, where, order_by, self.dialect, self.paramstr,
+            self.sql_cache
             )
         # execute sql
-        cursor = self._execute(sql, values)
+        cursor = self._execute(sql, values, stream)
         # result iterator
-        i = SelectDistinctResultIterator(cursor, self.DbError)
-        self._last_ri = i
+        i = SelectDistinctResultIterator(cursor, self.DbError, batch_size)
+        self._track_ri(i)
+        return i
+
+    def _xselect_distinct_split(self, table, qcol, wheres, order_by,
+            batch_size):
+        # Values from each part merged without duplicates, in order_by
+        # order. Values are fetched eagerly.
+        col = qcol._col
+        values = []
+        seen = set()
+        for part_where in wheres:
+            for value in self.xselect_distinct(table, qcol, part_where):
+                key = sqlgen.collation_key(col, value, self.dialect)
+                if not key in seen:
+                    seen.add(key)
+                    values.append(value)
+        if order_by:
+            sort_key = self._sort_key_fn(
+                table, [col], order_by.col, "select_distinct"
+                )
+            values.sort(
+                key=lambda value: sort_key((value,)),
+                reverse=not order_by.asc
+                )
+        i = SelectDistinctResultIterator(None, self.DbError, batch_size)
+        i._rows = values
+        self._track_ri(i)
         return i
 
     def select_distinct(self, table, qcol, where=None, order_by=None):
-        return list(
-                self.xselect_distinct(table, qcol, where, order_by)
+        if not self._result_cached(table) \
+                or len(sqlgen.split_where(where, self.dialect)) > 1:
+            return list(
+                    self.xselect_distinct(table, qcol, where, order_by)
+                )
+        # gen sql
+        sql, values = sqlgen.select_distinct(
+            table, qcol, where, order_by, self.dialect, self.paramstr,
+            self.sql_cache
             )
+        key = (self._db_id, sql, tuple(values))
+        table_names = (table.table_name,)
+        gens = self._result_gens(table_names)
+        distinct_values = self.result_cache.get(key, gens)
+        if distinct_values is None:
+            put_ok = self._result_put_ok(table_names, gens)
+            cursor = self._execute(sql, values)
+            distinct_values = list(
+                SelectDistinctResultIterator(
+                    cursor, self.DbError, FETCH_BATCH_SIZE
+                    )
+                )
+            if put_ok:
+                self.result_cache.put(key, distinct_values, gens)
+        return list(distinct_values)
 
+    def count(self, table, where=None):
+        return self.aggregate(table, {"count": COUNT()}, where)["count"]
 
+    def aggregate(self, table, aggregates, where=None, group_by=None):
+        # large IN lists are split over several statements
+        wheres = sqlgen.split_where(where, self.dialect)
+        if len(wheres) > 1:
+            return self._aggregate_split(
+                table, aggregates, wheres, group_by
+                )
+        # gen sql
+        sql, values = sqlgen.aggregate(
+            table, aggregates, where, group_by, self.dialect, self.paramstr,
+            self.sql_cache
+            )
+        # execute sql
+        cursor = self._execute(sql, values)
+        values_list = cursor.fetchall()
+        cursor.close()
+        # decode - group_by columns then aggregates sorted by name
+        if isinstance(group_by, QueryCol):
+            group_by = [group_by]
+        converters = []
+        for qcol in group_by or []:
+            converters.append((qcol._col.col_name, qcol._col.db_to_py))
+        for name in sorted(aggregates.keys()):
+            converters.append((name, aggregates[name].db_to_py))
+        rows = []
+        for values in values_list:
+            row = {}
+            for (name, db_to_py), value in zip(converters, values):
+                row[name] = db_to_py(value)
+            rows.append(row)
+        if group_by is None:
+            return rows[0]
+        return rows
 
+    def _aggregate_split(self, table, aggregates, wheres, group_by):
+        # Aggregates of each part combined - the parts match disjoint rows.
+        # AVG is computed from the SUM and COUNT of each part.
+        part_aggregates = {}
+        for name, agg in aggregates.items():
+            if agg.func == "AVG":
+                qcol = QueryCol(agg.col)
+                part_aggregates[name] = SUM(qcol)
+                part_aggregates[name + " count"] = COUNT(qcol)
+            else:
+                part_aggregates[name] = agg
+        if isinstance(group_by, QueryCol):
+            group_by = [group_by]
+        group_cols = [qcol._col for qcol in group_by or []]
+        dialect = self.dialect
+        groups = {}
+        group_keys = []
+        for part_where in wheres:
+            part_rows = self.aggregate(
+                table, part_aggregates, part_where, group_by or None
+                )
+            if group_by is None:
+                part_rows = [part_rows]
+            for part_row in part_rows:
+                key = tuple([
+                    sqlgen.collation_key(col, part_row[col.col_name], dialect)
+                        for col in group_cols
+                    ])
+                row = groups.get(key)
+                if row is None:
+                    groups[key] = part_row
+                    group_keys.append(key)
+                    continue
+                for name, agg in part_aggregates.items():
+                    row[name] = _combine_aggregate(
+                        agg.func, row[name], part_row[name]
+                        )
+        rows = [groups[key] for key in group_keys]
+        for row in rows:
+            for name, agg in aggregates.items():
+                if agg.func == "AVG":
+                    count = row.pop(name + " count")
+                    if count:
+                        row[name] = float(row[name]) / count
+        if group_by is None:
+            return rows[0]
+        for col in reversed(group_cols):
+            rows.sort(key=self._sort_key_fn(table, None, col, "aggregate"))
+        return rows
 
-class ResultIterator:
+    def prepare(self, table, where=None, order_by=None, server_side=False,
+            row_factory=None, cols=None):
+        # gen sql - once for all executions
+        cols = sqlgen.select_cols(table, cols)
+        sql, params = sqlgen.prepare_select(
+            table, where, order_by, self.dialect, self.paramstr, cols
+            )
+        if server_side:
+            assert self.dialect == DIALECT_POSTGRES, \
+                "prepare(): server_side is only supported for Postgres"
+            self._prepare_count += 1
+            name = "binder_prepared_%d" % self._prepare_count
+        else:
+            name = None
+        return PreparedSelect(
+            self, table, where, sql, params, name,
+            row_factory or self.row_factory, cols
+            )
 
-    def __init__(self, cursor, table, DbError, where):
-        self.cursor = cursor
+
+def _row_getter(table, cols, col, fn_name):
+    # Returns function getting col's value from a select result row
+    col_list = list(cols or table.cols)
+    assert col in col_list, \
+        "%s(): cols must include column '%s'" % (fn_name, col.col_name)
+    index = col_list.index(col)
+    col_name = col.col_name
+    def get_value(row):
+        if isinstance(row, tuple):
+            return row[index]
+        return row[col_name]
+    return get_value
+
+
+def _combine_aggregate(func, value1, value2):
+    if value1 is None:
+        return value2
+    if value2 is None:
+        return value1
+    if func == "MIN":
+        return min(value1, value2)
+    if func == "MAX":
+        return max(value1, value2)
+    # COUNT, SUM
+    return value1 + value2
+
+
+def _and_where(where, sqlcond):
+    if where is None:
+        return sqlcond
+    return AND(where, sqlcond)
+
+
+def _select_one_row(table, i):
+    row = None
+    try:
+        row = i.next()
+        i.next()
+        assert False, (
+                "select_one(): more than 1 row",
+                (table.table_name, i.where) #, rc)
+            )
+    except StopIteration:
+        return row
+
+
+
+
+class PreparedSelect:
+
+    def __init__(self, conn, table, where, sql, params, server_side_name,
+            row_factory=ROW_DICT, cols=None):
+        self.conn = conn
         self.table = table
-        self.DbError = DbError
         self.where = where
-        self.closed = False
+        self.sql = sql
+        self._params = params
+        self._server_side_name = server_side_name
+        self._server_side_prepared = False
+        self.row_factory = row_factory
+        self.cols = cols
 
-    def __iter__(self):
-        return self
+    def _values(self, param_values):
+        values = []
+        for param_name, col, value_fn, value in self._params:
+            if not param_name is None:
+                assert param_values.has_key(param_name), \
+                    "Missing value for Param '%s'" % param_name
+                value = param_values[param_name]
+                col.check_value(value)
+                assert not value is None, \
+                    "Param '%s' cannot be None" % param_name
+                value = value_fn(col, value)
+            values.append(value)
+        return values
 
-    def next(self):
-        if self.closed:
-            raise self.DbError, "Result cursor closed."
-        row = {}
-        values = self.cursor.fetchone()
-        if values is None:
-            self.cursor = None
-            raise StopIteration
-        cols = self.table.cols
-        for i in range(len(cols)):
-            col = cols[i]
-            dbvalue = values[i]
-            value = col.db_to_py(dbvalue)
-            row[col.col_name] = value
-        return row
+    def _server_side_sql(self, values):
+        # PREPARE once per connection, then EXECUTE with just the values
+        name = self._server_side_name
+        if not self._server_side_prepared:
+            sql_parts = self.sql.split("%s")
+            pg_sql = sql_parts[0]
+            for i in range(1, len(sql_parts)):
+                pg_sql = "%s$%d%s" % (pg_sql, i, sql_parts[i])
+            self.conn._execute("PREPARE %s AS %s" % (name, pg_sql))
+            self._server_side_prepared = True
+        if values:
+            return "EXECUTE %s (%s)" \
+                % (name, ",".join(["%s"] * len(values)))
+        else:
+            return "EXECUTE %s" % name
+
+    def xselect(self, **param_values):
+        return self._xselect(param_values, FETCH_BATCH_SIZE)
+
+    def _xselect(self, param_values, batch_size):
+        conn = self.conn
+        values = self._values(param_values)
+        if self._server_side_name:
+            sql = self._server_side_sql(values)
+        else:
+            sql = self.sql
+        # execute sql
+        cursor = conn._execute(sql, values)
+        # result iterator
+        i = ResultIterator(
+            cursor, self.table, conn.DbError, self.where, batch_size,
+            self.row_factory, self.cols
+            )
+        conn._track_ri(i)
+        return i
+
+    def select(self, **param_values):
+        rows = []
+        for batch in self._xselect(param_values, FETCH_BATCH_SIZE).batches():
+            rows.extend(batch)
+        return rows
 
+    def select_one(self, **param_values):
+        i = self._xselect(param_values, 2)
+        return _select_one_row(self.table, i)
 
     def close(self):
-        self.closed = True
-        if self.cursor:
-            self.cursor.close()
+        if self._server_side_prepared and self.conn._is_open:
+            self.conn._execute("DEALLOCATE %s" % self._server_side_name)
+        self._server_side_prepared = False
 
 
 
 
-class SelectDistinctResultIterator:
+class ResultIterator:
 
-    def __init__(self, cursor, DbError):
+    def __init__(self, cursor, table, DbError, where,
+            batch_size=FETCH_BATCH_SIZE, row_factory=ROW_DICT, cols=None):
+        assert batch_size > 0, "batch_size must be > 0"
         self.cursor = cursor
+        self.table = table
+        self.row_factory = row_factory
+        if table is not None:
+            self._decode_row = table.row_decoder(row_factory, cols)
         self.DbError = DbError
+        self.where = where
+        self.batch_size = batch_size
         self.closed = False
+        # rows fetched but not yet returned: self._rows[self._pos:]
+        self._rows = []
+        self._pos = 0
 
     def __iter__(self):
         return self
@@ -279,14 +1005,65 @@ class SelectDistinctResultIterator:
     def next(self):
         if self.closed:
             raise self.DbError, "Result cursor closed."
-        values = self.cursor.fetchone()
-        if values is None:
+        pos = self._pos
+        rows = self._rows
+        if pos == len(rows):
+            rows = self._fetch_batch()
+            if not rows:
+                raise StopIteration
+            pos = 0
+        self._pos = pos + 1
+        return rows[pos]
+
+    def next_batch(self):
+        "Returns a list of up to batch_size rows, empty list at the end."
+        if self.closed:
+            raise self.DbError, "Result cursor closed."
+        if self._pos < len(self._rows):
+            rows = self._rows[self._pos:]
+        else:
+            rows = self._fetch_batch()
+        self._rows = []
+        self._pos = 0
+        return rows
+
+    def batches(self):
+        while True:
+            rows = self.next_batch()
+            if not rows:
+                return
+            yield rows
+
+    def _fetch_batch(self):
+        if self.cursor is None:
+            return []
+        values_list = self.cursor.fetchmany(self.batch_size)
+        if not values_list:
+            # frees server side cursors straight away
+            self.cursor.close()
             self.cursor = None
-            raise StopIteration
-        #assert len(values) == 1
-        return values[0]
+            return []
+        self._rows = self._decode_batch(values_list)
+        self._pos = 0
+        return self._rows
+
+    def _decode_batch(self, values_list):
+        decode_row = self._decode_row
+        return [decode_row(values) for values in values_list]
 
     def close(self):
         self.closed = True
         if self.cursor:
             self.cursor.close()
+
+
+
+
+class SelectDistinctResultIterator(ResultIterator):
+
+    def __init__(self, cursor, DbError, batch_size=FETCH_BATCH_SIZE):
+        ResultIterator.__init__(self, cursor, None, DbError, None, batch_size)
+
+    def _decode_batch(self, values_list):
+        #assert len(values) == 1
+        return [values[0] for values in values_list]
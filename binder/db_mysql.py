@@ -1,14 +1,37 @@
+import tempfile
 
-from binder.conn import Connection, REPEATABLE_READ, _VALID_ISOLATION_LEVELS
+from binder.bulkfmt import write_bulk_file
+from binder.conn import Connection, REPEATABLE_READ, _VALID_ISOLATION_LEVELS, \
+    SQL_CACHE_SIZE
 from binder.sqlgen import DIALECT_MYSQL
+from binder.table import ROW_DICT
 
 _ISOLATION_SQL = "SET SESSION TRANSACTION ISOLATION LEVEL %s"
 
+# Fields are tab separated and escaped with backslash, see binder.bulkfmt
+_LOAD_DATA_SQL = "LOAD DATA LOCAL INFILE %%s INTO TABLE %s CHARACTER SET utf8" \
+    " FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'" \
+    " LINES TERMINATED BY '\\n' (%s)"
+
+def _db_id(args, kwargs):
+    # connect() arguments identifying the database - not the password
+    params = dict(zip(["host", "user", "passwd", "db", "port"], args))
+    params.update(kwargs)
+    for name in ["passwd", "password"]:
+        params.pop(name, None)
+    return "mysql:%r" % sorted(params.items())
+
+
 class MysqlConnection(Connection):
 
     def __init__(self, *args, **kwargs):
         import MySQLdb
         read_only = kwargs.pop('read_only', None)
+        sql_cache_size = kwargs.pop('sql_cache_size', SQL_CACHE_SIZE)
+        row_factory = kwargs.pop('row_factory', ROW_DICT)
+        row_cache_size = kwargs.pop('row_cache_size', 0)
+        result_cache = kwargs.pop('result_cache', None)
+        multiple_iterators = kwargs.pop('multiple_iterators', False)
         isolation_level = kwargs.pop('isolation_level', REPEATABLE_READ)
         assert isolation_level in _VALID_ISOLATION_LEVELS, \
             ("Unknown isolation_level", isolation_level)
@@ -23,8 +46,41 @@ class MysqlConnection(Connection):
         Connection.__init__(
             self, dbconn, dberror,
             DIALECT_MYSQL, "%s",
-            read_only
+            read_only, sql_cache_size, row_factory, row_cache_size,
+            result_cache, multiple_iterators, _db_id(args, kwargs)
             )
         isolation_sql = _ISOLATION_SQL % isolation_level
         self._execute(isolation_sql)
+        # SET SESSION doesn't start a transaction
+        self._txn_started = False
+        self._snapshot_reads = isolation_level == REPEATABLE_READ
+
+    def _stream_cursor(self):
+        # unbuffered cursor - rows are read from the socket as fetched
+        import MySQLdb.cursors
+        return self._dbconn.cursor(MySQLdb.cursors.SSCursor)
+
 
+    def bulk_load(self, table, rows):
+        # LOAD DATA LOCAL INFILE from a temporary spool file, the connection
+        # must be opened with local_infile=1
+        # read only check
+        self._check_write_ok()
+        spool = tempfile.NamedTemporaryFile(prefix="binder", suffix=".tsv")
+        try:
+            cols, count = write_bulk_file(
+                spool, table, rows, DIALECT_MYSQL, "bulk_load"
+                )
+            if count == 0:
+                return 0
+            spool.flush()
+            col_names = ",".join([col.col_name for col in cols])
+            sql = _LOAD_DATA_SQL % (table.table_name, col_names)
+            cursor = self._execute(sql, [spool.name])
+            rowcount = cursor.rowcount
+        finally:
+            spool.close()
+            if self.row_cache is not None:
+                self._row_cache_clear_table(table)
+            self._table_written(table)
+        return rowcount
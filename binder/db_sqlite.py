@@ -1,17 +1,303 @@
 
+import itertools
+import os
+import re
+import shutil
 import sqlite3
+import tempfile
+import urllib
 
-from binder.conn import Connection
+from binder.conn import Connection, SQL_CACHE_SIZE
 from binder.sqlgen import DIALECT_SQLITE
+from binder.table import ROW_DICT
+
+# Pragmas for performance_profile - negative cache_size is in KB
+PERFORMANCE_PROFILES = {
+    # WAL, fsync on every commit
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        },
+    # no fsync, large cache - the database may be lost on power failure
+    "bulk_load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        },
+    # WAL readers don't block the writer, reads are memory mapped
+    "read_mostly": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 268435456,
+        "cache_size": -65536,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        },
+    }
+
+# busy_timeout first so changing journal_mode waits for other connections
+_PRAGMA_ORDER = [
+    "busy_timeout",
+    "journal_mode",
+    ]
+
+_PRAGMA_NAME_RE = re.compile(r"^[a-z_]+$")
+_PRAGMA_VALUE_RE = re.compile(r"^[A-Za-z_]+$")
+
+
+def _read_only_uri(dbfile, immutable):
+    uri = "file:%s?mode=ro" % urllib.quote(os.path.abspath(dbfile))
+    if immutable:
+        uri = uri + "&immutable=1"
+    return uri
+
+
+# None until checked by _uri_filenames()
+_uri_supported = None
+
+def _uri_filenames():
+    # sqlite3 only understands URI filenames if SQLite was built with
+    # SQLITE_USE_URI - Python 2 can't enable them for a connection
+    global _uri_supported
+    if _uri_supported is None:
+        dbconn = sqlite3.connect(":memory:")
+        try:
+            options = [
+                row[0] for row in dbconn.execute("PRAGMA compile_options")
+                ]
+        finally:
+            dbconn.close()
+        _uri_supported = sqlite3.sqlite_version_info >= (3, 7, 7) \
+            and ("USE_URI" in options or "USE_URI=1" in options)
+    return _uri_supported
+
+
+def _connect_read_only(dbfile, immutable, cached_statements):
+    # Opens the file read only so no write locks are taken. Without URI
+    # filenames PRAGMA query_only is the only protection.
+    if _uri_filenames():
+        dbfile = _read_only_uri(dbfile, immutable)
+    elif not os.path.exists(dbfile):
+        # as for mode=ro, don't create the file
+        raise sqlite3.OperationalError, "unable to open database file"
+    return sqlite3.connect(dbfile, cached_statements=cached_statements)
+
+
+# each in-memory database is private to its connection
+_memory_db_ids = itertools.count(1)
+
+def _db_id(dbfile):
+    if dbfile == ":memory:":
+        return "sqlite::memory:%d" % _memory_db_ids.next()
+    if dbfile.startswith("file:"):
+        return "sqlite:" + dbfile
+    return "sqlite:" + os.path.realpath(dbfile)
+
 
 class SqliteConnection(Connection):
 
-    def __init__(self, dbfile, read_only=False):
-        dbconn = sqlite3.connect(dbfile)
+    def __init__(self, dbfile, read_only=False,
+            sql_cache_size=SQL_CACHE_SIZE, cached_statements=100,
+            row_factory=ROW_DICT, row_cache_size=0, result_cache=None,
+            multiple_iterators=False, performance_profile=None, pragmas=None,
+            immutable=False):
+        assert read_only or not immutable, "immutable requires read_only"
+        # sqlite3 keeps up to cached_statements compiled statements per
+        # connection, keyed by SQL text - prepare() reuses the same text
+        if read_only and dbfile != ":memory:" \
+                and not dbfile.startswith("file:"):
+            dbconn = _connect_read_only(dbfile, immutable, cached_statements)
+        else:
+            dbconn = sqlite3.connect(
+                dbfile, cached_statements=cached_statements
+                )
         dberror = sqlite3.Error
         Connection.__init__(
             self, dbconn, dberror,
             DIALECT_SQLITE, "?",
-            read_only
+            read_only, sql_cache_size, row_factory, row_cache_size,
+            result_cache, multiple_iterators, _db_id(dbfile)
+            )
+        # pragma values read back after being set
+        self.pragmas = {}
+        self._set_pragmas(performance_profile, pragmas)
+        if read_only:
+            self.set_pragma("query_only", 1)
+
+    def _set_pragmas(self, performance_profile, pragmas):
+        all_pragmas = {}
+        if performance_profile is not None:
+            assert performance_profile in PERFORMANCE_PROFILES, \
+                "Unknown performance_profile: %s" % performance_profile
+            all_pragmas.update(PERFORMANCE_PROFILES[performance_profile])
+            if self._read_only:
+                # journal_mode is stored in the file, set by writers
+                del all_pragmas["journal_mode"]
+        if pragmas:
+            all_pragmas.update(pragmas)
+        names = sorted(all_pragmas.keys())
+        for name in reversed(_PRAGMA_ORDER):
+            if name in all_pragmas:
+                names.remove(name)
+                names.insert(0, name)
+        for name in names:
+            self.set_pragma(name, all_pragmas[name])
+
+    def set_pragma(self, name, value):
+        "Sets the pragma and returns the value read back."
+        assert _PRAGMA_NAME_RE.match(name), "Bad pragma name: %r" % name
+        if type(value) in (int, long):
+            value = str(value)
+        else:
+            assert type(value) is str and _PRAGMA_VALUE_RE.match(value), \
+                "pragma %s: value must be int or name, got %r" % (name, value)
+        cursor = self._execute("PRAGMA %s=%s" % (name, value))
+        cursor.fetchall()
+        value = self.get_pragma(name)
+        self.pragmas[name] = value
+        return value
+
+    def get_pragma(self, name):
+        assert _PRAGMA_NAME_RE.match(name), "Bad pragma name: %r" % name
+        row = self._execute("PRAGMA %s" % name).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def load_from(self, path, progress=None):
+        "Replaces this database with a copy of the database file path."
+        self._check_write_ok()
+        if not os.path.exists(path):
+            # connecting would create it
+            raise sqlite3.OperationalError, "unable to open database file"
+        self.commit()
+        old_table_names = _table_names(self._dbconn)
+        src = sqlite3.connect(path)
+        try:
+            table_names = _copy_database(src, self._dbconn, progress)
+        finally:
+            src.close()
+        if self.row_cache is not None:
+            self.row_cache.clear()
+        for table_name in set(old_table_names + table_names):
+            self._table_name_written(table_name)
+        self.commit()
+
+    def save_to(self, path, progress=None):
+        "Replaces the database file path with a copy of this database."
+        self.commit()
+        # copied to a temporary file renamed over path once complete, so a
+        # failed copy leaves path as it was
+        fd, tmp_path = tempfile.mkstemp(
+            ".tmp", os.path.basename(path) + ".",
+            os.path.dirname(os.path.abspath(path))
+            )
+        os.close(fd)
+        try:
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            # written by the destination's connection, this one only reads
+            # so may be read only
+            dst = sqlite3.connect(tmp_path)
+            try:
+                _copy_database(self._dbconn, dst, progress)
+            finally:
+                dst.close()
+            if os.name == "nt" and os.path.exists(path):
+                # Windows can't rename over an existing file
+                os.remove(path)
+            os.rename(tmp_path, path)
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _table_names(dbconn):
+    return [row[0] for row in dbconn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table'"
+        ).fetchall()]
+
+
+def _copy_database(src, dst, progress):
+    # Replaces the schema and rows of dst with those of src, reading src in
+    # one transaction and writing dst in another, so dst is unchanged if
+    # the copy fails. Returns the names of the tables copied.
+    src_isolation_level = src.isolation_level
+    dst_isolation_level = dst.isolation_level
+    # explicit BEGIN - sqlite3 commits before DDL statements otherwise
+    src.isolation_level = None
+    dst.isolation_level = None
+    try:
+        src.execute("BEGIN")
+        dst.execute("BEGIN IMMEDIATE")
+        try:
+            table_names = _copy_schema_rows(src, dst, progress)
+            dst.execute("COMMIT")
+        except:
+            dst.execute("ROLLBACK")
+            raise
+        finally:
+            src.execute("COMMIT")
+    finally:
+        src.isolation_level = src_isolation_level
+        dst.isolation_level = dst_isolation_level
+    return table_names
+
+
+def _copy_schema_rows(src, dst, progress):
+    schema = src.execute(
+        "SELECT type, name, sql FROM sqlite_master"
+        " WHERE sql NOT NULL AND name NOT LIKE 'sqlite_%'"
+        " ORDER BY rowid"
+        ).fetchall()
+    table_names = [
+        name for obj_type, name, sql in schema if obj_type == "table"
+        ]
+    _drop_all(dst)
+    for obj_type, name, sql in schema:
+        if obj_type == "table":
+            dst.execute(sql)
+    total = len(table_names)
+    if progress:
+        progress(0, total)
+    for i, table_name in enumerate(table_names):
+        _copy_rows(src, dst, _quote(table_name))
+        if progress:
+            progress(i + 1, total)
+    if "sqlite_sequence" in _table_names(src):
+        dst.execute("DELETE FROM sqlite_sequence")
+        _copy_rows(src, dst, "sqlite_sequence")
+    for obj_type, name, sql in schema:
+        if obj_type != "table":
+            dst.execute(sql)
+    return table_names
+
+
+def _copy_rows(src, dst, quoted_name):
+    cursor = src.execute("SELECT * FROM %s" % quoted_name)
+    params = ",".join(["?"] * len(cursor.description))
+    dst.executemany(
+        "INSERT INTO %s VALUES (%s)" % (quoted_name, params), cursor
+        )
+
+
+def _drop_all(dbconn):
+    # Drops the tables and views of the main database, indexes and
+    # triggers go with their tables
+    rows = dbconn.execute(
+        "SELECT type, name FROM sqlite_master"
+        " WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+    for obj_type, name in rows:
+        dbconn.execute(
+            "DROP %s IF EXISTS %s" % (obj_type.upper(), _quote(name))
             )
 
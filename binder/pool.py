@@ -0,0 +1,175 @@
+"Thread-safe pool of open database connections."
+
+import threading
+import time
+
+
+# Default seconds an idle connection is kept open
+POOL_IDLE_TIMEOUT = 300
+
+_HEALTH_CHECK_SQL = "SELECT 1"
+
+
+class PoolTimeout(Exception):
+    "No connection became available within the timeout given to get()."
+
+
+class ConnectionPool:
+
+    def __init__(self, conn_class, *args, **kwargs):
+        # Pool options are popped, everything else (including read_only and
+        # isolation_level) is passed to conn_class for every connection.
+        min_size = kwargs.pop('min_size', 0)
+        max_size = kwargs.pop('max_size', 10)
+        idle_timeout = kwargs.pop('idle_timeout', POOL_IDLE_TIMEOUT)
+        health_check = kwargs.pop('health_check', True)
+        assert 0 <= min_size <= max_size, \
+            "ConnectionPool: must have 0 <= min_size <= max_size"
+        assert max_size > 0, "ConnectionPool: max_size must be > 0"
+        self._conn_class = conn_class
+        self._args = args
+        self._kwargs = kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self._cond = threading.Condition(threading.Lock())
+        # (conn, time returned) - most recently returned last
+        self._idle = []
+        # number of open connections, idle or checked out
+        self.size = 0
+        self._closed = False
+        for i in range(min_size):
+            self.size += 1
+            self._idle.append((self._connect(), time.time()))
+
+    def _connect(self):
+        return self._conn_class(*self._args, **self._kwargs)
+
+    def idle_count(self):
+        return len(self._idle)
+
+    def get(self, timeout=None):
+        "Checks out a connection, waits up to timeout seconds if all in use."
+        if timeout is None:
+            deadline = None
+        else:
+            deadline = time.time() + timeout
+        while True:
+            conn = None
+            expired = []
+            self._cond.acquire()
+            try:
+                while True:
+                    assert not self._closed, "ConnectionPool is closed"
+                    expired.extend(self._pop_expired())
+                    if self._idle:
+                        conn = self._idle.pop()[0]
+                        break
+                    if self.size < self.max_size:
+                        # reserve a slot, connect outside the lock
+                        self.size += 1
+                        break
+                    if deadline is None:
+                        self._cond.wait()
+                    else:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            raise PoolTimeout, \
+                                "ConnectionPool: no connection available " \
+                                "after %s seconds" % timeout
+                        self._cond.wait(remaining)
+            finally:
+                self._cond.release()
+                # closed outside the lock, closing can be slow
+                for expired_conn in expired:
+                    self._close_quietly(expired_conn)
+            if conn is None:
+                try:
+                    return self._connect()
+                except:
+                    self._discard()
+                    raise
+            if not self.health_check or self._is_healthy(conn):
+                return conn
+            # broken connection - try the next one
+            self._close_quietly(conn)
+            self._discard()
+
+    def put(self, conn):
+        "Returns a connection to the pool, rolling back any open transaction."
+        healthy = conn._is_open
+        if healthy:
+            try:
+                conn._close_ris()
+                conn.rollback()
+            except conn.DbError:
+                healthy = False
+        self._cond.acquire()
+        try:
+            if healthy and not self._closed:
+                self._idle.append((conn, time.time()))
+                self._cond.notify()
+                return
+        finally:
+            self._cond.release()
+        self._close_quietly(conn)
+        self._discard()
+
+    def close(self):
+        "Closes idle connections, connections in use are closed by put()."
+        self._cond.acquire()
+        try:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self.size -= len(idle)
+            self._cond.notifyAll()
+        finally:
+            self._cond.release()
+        for conn, returned in idle:
+            self._close_quietly(conn)
+
+    def _pop_expired(self):
+        # Called with the lock held. Removes and returns connections idle
+        # longer than idle_timeout, oldest first, keeping min_size open.
+        expired = []
+        if self.idle_timeout is None:
+            return expired
+        expire_before = time.time() - self.idle_timeout
+        idle = self._idle
+        while idle and idle[0][1] < expire_before \
+                and self.size > self.min_size:
+            expired.append(idle.pop(0)[0])
+            self.size -= 1
+        return expired
+
+    def _discard(self):
+        # frees the slot of a connection that was closed or failed to open
+        self._cond.acquire()
+        try:
+            self.size -= 1
+            self._cond.notify()
+        finally:
+            self._cond.release()
+
+    def _is_healthy(self, conn):
+        try:
+            conn._execute(_HEALTH_CHECK_SQL).fetchall()
+            # don't leave a transaction (and snapshot) open from the check
+            conn._dbconn.rollback()
+            conn._end_transaction()
+        except conn.DbError:
+            return False
+        return True
+
+    def _close_quietly(self, conn):
+        if conn._is_open:
+            try:
+                conn.close()
+            except conn.DbError:
+                pass
+
+    def __repr__(self):
+        return "<ConnectionPool:size=%d,idle=%d,max_size=%d>" \
+            % (self.size, len(self._idle), self.max_size)
@@ -0,0 +1,210 @@
+"Query result caches shared by connections, see Connection result_cache."
+
+import cPickle
+import hashlib
+import sqlite3
+import threading
+import time
+
+from binder.cache import LruCache
+
+
+# Default seconds a cached result stays valid
+RESULT_CACHE_TTL = 60
+
+
+class ResultCache:
+    "Base for result caches - subclasses provide the storage."
+
+    # Results are keyed by database, generated SQL and values. Each table
+    # of each database has a generation number incremented when the table
+    # is written; an entry is only valid while the generations read before
+    # its query ran are current. Connections in any thread may share a
+    # cache, storage is only used with the lock held.
+
+    def __init__(self, ttl=RESULT_CACHE_TTL, tables=None):
+        assert ttl > 0, "ttl must be > 0"
+        self.ttl = ttl
+        if tables is None:
+            self.table_names = None
+        else:
+            self.table_names = set([table.table_name for table in tables])
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def caches(self, table):
+        return self.table_names is None or table.table_name in self.table_names
+
+    def gens(self, db_id, table_names):
+        "Returns the current generations of the tables, read before a query."
+        gen_names = [
+            _gen_name(db_id, table_name) for table_name in table_names
+            ]
+        self._lock.acquire()
+        try:
+            return self._get_gens(gen_names)
+        finally:
+            self._lock.release()
+
+    def get(self, key, gens):
+        key = self._key(key)
+        self._lock.acquire()
+        try:
+            entry = self._get_entry(key)
+            if entry is not None:
+                expires, entry_gens, value = entry
+                if expires > time.time() and entry_gens == gens:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+        finally:
+            self._lock.release()
+
+    def put(self, key, value, gens):
+        key = self._key(key)
+        entry = (time.time() + self.ttl, gens, value)
+        self._lock.acquire()
+        try:
+            self._put_entry(key, entry)
+        finally:
+            self._lock.release()
+
+    def invalidate(self, db_id, table_name):
+        gen_name = _gen_name(db_id, table_name)
+        self._lock.acquire()
+        try:
+            self._incr_gen(gen_name)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._clear()
+        finally:
+            self._lock.release()
+
+    def _key(self, key):
+        return key
+
+    def __repr__(self):
+        return "<%s:ttl=%s,hits=%d,misses=%d>" \
+            % (self.__class__.__name__, self.ttl, self.hits, self.misses)
+
+
+def _gen_name(db_id, table_name):
+    return "%s:%s" % (db_id, table_name)
+
+
+class DictResultCache(ResultCache):
+    "In-process result cache, shared by connections given the same object."
+
+    def __init__(self, ttl=RESULT_CACHE_TTL, tables=None, max_size=1000):
+        ResultCache.__init__(self, ttl, tables)
+        self._entries = LruCache(max_size)
+        self._gens = {}
+
+    def _get_entry(self, key):
+        return self._entries.get(key)
+
+    def _put_entry(self, key, entry):
+        self._entries.put(key, entry)
+
+    def _get_gens(self, gen_names):
+        return tuple([self._gens.get(name, 0) for name in gen_names])
+
+    def _incr_gen(self, gen_name):
+        self._gens[gen_name] = self._gens.get(gen_name, 0) + 1
+
+    def _clear(self):
+        self._entries.clear()
+
+
+# Expired entries are deleted every PURGE_INTERVAL puts
+PURGE_INTERVAL = 100
+
+class SqliteResultCache(ResultCache):
+    "Result cache in an SQLite file, shared by processes using the same file."
+
+    def __init__(self, dbfile, ttl=RESULT_CACHE_TTL, tables=None,
+            timeout=5.0):
+        ResultCache.__init__(self, ttl, tables)
+        # autocommit - each statement is its own transaction. Used from
+        # any thread, one at a time under the lock.
+        self._dbconn = sqlite3.connect(
+            dbfile, timeout=timeout, isolation_level=None,
+            check_same_thread=False
+            )
+        self._dbconn.execute(
+            "CREATE TABLE IF NOT EXISTS binder_result"
+            " (key TEXT PRIMARY KEY, expires REAL, entry BLOB)"
+            )
+        self._dbconn.execute(
+            "CREATE TABLE IF NOT EXISTS binder_result_gen"
+            " (table_name TEXT PRIMARY KEY, gen INTEGER)"
+            )
+        self._put_count = 0
+
+    def _key(self, key):
+        # repr() of the SQL and values is the same in every process
+        return hashlib.sha1(repr(key)).hexdigest()
+
+    def _get_entry(self, key):
+        cursor = self._dbconn.execute(
+            "SELECT entry FROM binder_result WHERE key=?", (key,)
+            )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return cPickle.loads(str(row[0]))
+
+    def _put_entry(self, key, entry):
+        data = cPickle.dumps(entry, cPickle.HIGHEST_PROTOCOL)
+        self._dbconn.execute(
+            "INSERT OR REPLACE INTO binder_result (key,expires,entry)"
+            " VALUES (?,?,?)",
+            (key, entry[0], sqlite3.Binary(data))
+            )
+        self._put_count += 1
+        if self._put_count % PURGE_INTERVAL == 0:
+            self._dbconn.execute(
+                "DELETE FROM binder_result WHERE expires<?", (time.time(),)
+                )
+
+    def _get_gens(self, gen_names):
+        gens = []
+        for gen_name in gen_names:
+            cursor = self._dbconn.execute(
+                "SELECT gen FROM binder_result_gen WHERE table_name=?",
+                (gen_name,)
+                )
+            row = cursor.fetchone()
+            if row is None:
+                gens.append(0)
+            else:
+                gens.append(row[0])
+        return tuple(gens)
+
+    def _incr_gen(self, gen_name):
+        self._dbconn.execute(
+            "INSERT OR IGNORE INTO binder_result_gen (table_name,gen)"
+            " VALUES (?,0)",
+            (gen_name,)
+            )
+        self._dbconn.execute(
+            "UPDATE binder_result_gen SET gen=gen+1 WHERE table_name=?",
+            (gen_name,)
+            )
+
+    def _clear(self):
+        self._dbconn.execute("DELETE FROM binder_result")
+
+    def close(self):
+        self._lock.acquire()
+        try:
+            self._dbconn.close()
+            self._dbconn = None
+        finally:
+            self._lock.release()
@@ -1,12 +1,34 @@
+import unicodedata
 
 from binder.col import *
-from binder.table import SqlCondition, SqlSort, AND, OR, QueryCol
+from binder.table import SqlCondition, SqlSort, AND, OR, NOT, QueryCol, \
+    Param, Aggregate
 
 
 DIALECT_SQLITE = "sqlite"
 DIALECT_POSTGRES = "postgres"
 DIALECT_MYSQL = "mysql"
 
+# Max bind parameters in one statement
+# (SQLite before 3.32 defaults to 999, Postgres before 14 allows 32767)
+MAX_PARAMS = {
+    DIALECT_SQLITE: 999,
+    DIALECT_POSTGRES: 32767,
+    DIALECT_MYSQL: 65535,
+}
+
+# LIMIT used for OFFSET without a limit - SQLite and MySQL require a LIMIT
+_NO_LIMIT = {
+    DIALECT_SQLITE: "LIMIT -1",
+    DIALECT_MYSQL: "LIMIT 18446744073709551615",
+}
+
+# Max statement size for drivers that quote values into the SQL text
+# (MySQL max_allowed_packet defaults to 4MB)
+MAX_STATEMENT_BYTES = {
+    DIALECT_MYSQL: 4 * 1024 * 1024 - 1024,
+}
+
 _COL_TYPE_SQLITE = {
     AutoIdCol: "INTEGER PRIMARY KEY",
     IntCol: "INTEGER",
@@ -80,61 +102,203 @@ def drop_table(table, if_exists):
 
 
 
-def insert(table, row, dialect, paramstr):
+def insert(table, row, dialect, paramstr, cache=None):
     values = []
+    null_flags = []
+    auto_id_col = table.auto_id_col
+    for col, value in zip(table.cols, row_values(table, row, "insert")):
+        col.check_value(value)
+        if value is None:
+            assert not (col is auto_id_col and isinstance(row, tuple)), \
+                "insert(): cannot use None for AutoIdCol in tuple row"
+            null_flags.append(True)
+        else:
+            null_flags.append(False)
+            value = col.py_to_db(value)
+            values.append(value)
+    null_flags = tuple(null_flags)
+    key = None
+    if cache is not None:
+        key = ("INSERT", table, null_flags, dialect, paramstr)
+    sql, auto_id_used = _compiled(
+        cache, key, _insert_sql, table, null_flags, dialect, paramstr
+        )
+    return sql, values, auto_id_used
+
+
+def insert_many(table, rows, dialect, paramstr):
+    # Groups rows by NULL pattern - each group shares one INSERT statement.
+    # Returns list of (sql, auto_id_used, row_indexes, values_list).
+    groups = []
+    for null_flags, row_indexes, values_list in _insert_groups(table, rows):
+        sql, auto_id_used = _insert_sql(table, null_flags, dialect, paramstr)
+        groups.append((sql, auto_id_used, row_indexes, values_list))
+    return groups
+
+
+def insert_multirow(table, rows, dialect, paramstr, max_rows):
+    # Packs rows with the same NULL pattern into multi-row INSERT statements
+    # of up to max_rows rows each, within the dialect's statement limits.
+    # Returns list of (sql, auto_id_used, row_indexes, values).
+    stmts = []
+    for null_flags, row_indexes, values_list in _insert_groups(table, rows):
+        start = 0
+        for row_count in _multirow_counts(values_list, dialect, max_rows):
+            end = start + row_count
+            sql, auto_id_used = \
+                _insert_sql(table, null_flags, dialect, paramstr, row_count)
+            values = []
+            for row_values in values_list[start:end]:
+                values.extend(row_values)
+            stmts.append((sql, auto_id_used, row_indexes[start:end], values))
+            start = end
+    return stmts
+
+
+def _insert_groups(table, rows):
+    groups = []
+    group_map = {}
+    cols = table.cols
+    auto_id_col = table.auto_id_col
+    for row_index in range(len(rows)):
+        row = rows[row_index]
+        values = []
+        null_flags = []
+        for col, value in zip(cols, row_values(table, row, "insert_many")):
+            col.check_value(value)
+            if value is None:
+                assert not (col is auto_id_col and isinstance(row, tuple)), \
+                    "insert_many(): cannot use None for AutoIdCol in tuple row"
+                null_flags.append(True)
+            else:
+                null_flags.append(False)
+                values.append(col.py_to_db(value))
+        null_flags = tuple(null_flags)
+        group = group_map.get(null_flags)
+        if group is None:
+            group = (null_flags, [], [])
+            group_map[null_flags] = group
+            groups.append(group)
+        group[1].append(row_index)
+        group[2].append(values)
+    return groups
+
+
+def row_values(table, row, fn_name):
+    # Column values of a dict, record, tuple or namedtuple row
+    if isinstance(row, tuple):
+        assert len(row) == len(table.cols), \
+            "%s(): expected %d values in tuple row, got %d" \
+                % (fn_name, len(table.cols), len(row))
+        return row
+    return [row[col_name] for col_name in table.col_names]
+
+
+def _multirow_counts(values_list, dialect, max_rows):
+    assert max_rows > 0, "max_rows must be > 0"
+    if not values_list:
+        return []
+    params_per_row = len(values_list[0])
+    if params_per_row:
+        max_rows = min(max_rows, MAX_PARAMS[dialect] // params_per_row)
+    max_bytes = MAX_STATEMENT_BYTES.get(dialect)
+    counts = []
+    row_count = 0
+    stmt_bytes = 0
+    for row_values in values_list:
+        row_bytes = 0
+        if max_bytes:
+            for value in row_values:
+                row_bytes += _value_bytes(value)
+        too_long = max_bytes and stmt_bytes + row_bytes > max_bytes
+        if row_count == max_rows or (row_count and too_long):
+            counts.append(row_count)
+            row_count = 0
+            stmt_bytes = 0
+        row_count += 1
+        stmt_bytes += row_bytes
+    counts.append(row_count)
+    return counts
+
+
+def _value_bytes(value):
+    # Upper bound on the size of a value quoted into SQL text
+    if isinstance(value, basestring):
+        return 3 * len(value) + 3
+    return 24
+
+
+def _insert_sql(table, null_flags, dialect, paramstr, row_count=1):
     col_names = []
     value_qs = []
     auto_id_col = table.auto_id_col
     auto_id_used = False
-    for col in table.cols:
-        col_name = col.col_name
-        value = row[col_name]
-        col.check_value(value)
-        if value is None:
+    for col, is_null in zip(table.cols, null_flags):
+        if is_null:
             if col is auto_id_col:
                 auto_id_used = True
             else:
-                col_names.append(col_name)
+                col_names.append(col.col_name)
                 value_qs.append('NULL')
         else:
-            col_names.append(col_name)
+            col_names.append(col.col_name)
             value_qs.append(paramstr)
-            value = col.py_to_db(value)
-            values.append(value)
     col_names_sql = ",".join(col_names)
-    values_sql = ",".join(value_qs)
-    sql = "INSERT INTO %s (%s) VALUES (%s)" \
+    values_sql = "(%s)" % ",".join(value_qs)
+    if row_count > 1:
+        values_sql = ",".join([values_sql] * row_count)
+    sql = "INSERT INTO %s (%s) VALUES %s" \
         % (table.table_name, col_names_sql, values_sql)
     if auto_id_used and dialect == DIALECT_POSTGRES:
         sql = sql + " RETURNING " + auto_id_col.col_name
-    return sql, values, auto_id_used
+    return sql, auto_id_used
 
 
-def update(table, row, where, dialect, paramstr):
+def update(table, row, where, dialect, paramstr, cache=None):
     values = []
-    col_names = []
+    null_flags = []
     auto_id_col = table.auto_id_col
-    for col in table.cols:
-        col_name = col.col_name
-        value = row[col_name]
+    for col, value in zip(table.cols, row_values(table, row, "update")):
         col.check_value(value)
         if value is None:
             assert not col is auto_id_col, \
                 "update(): cannot use None for AutoIdCol"
-            col_names.append(col_name + "=NULL")
+            null_flags.append(True)
         else:
-            col_names.append(col_name + "=" + paramstr)
+            null_flags.append(False)
             value = col.py_to_db(value)
             values.append(value)
+    null_flags = tuple(null_flags)
+    key = None
+    if cache is not None:
+        key = (
+            "UPDATE", table, null_flags, _where_key(where), dialect, paramstr
+            )
+    sql, where_fns = _compiled(
+        cache, key, _compile_update,
+        table, null_flags, where, dialect, paramstr
+        )
+    if not where is None:
+        values.extend(_where_values(where, where_fns))
+    return sql, values
+
+
+def _compile_update(table, null_flags, where, dialect, paramstr):
+    col_names = []
+    for col, is_null in zip(table.cols, null_flags):
+        if is_null:
+            col_names.append(col.col_name + "=NULL")
+        else:
+            col_names.append(col.col_name + "=" + paramstr)
     col_sql = ",".join(col_names)
     sql_parts = ["UPDATE", table.table_name, "SET", col_sql]
+    where_fns = None
     if not where is None:
-        cond_sql, where_values = _sqlcond_to_sql(where, dialect, paramstr)
+        cond_sql, where_fns = _compile_where(where, dialect, paramstr)
         sql_parts.append("WHERE")
         sql_parts.append(cond_sql)
-        values.extend(where_values)
     sql = " ".join(sql_parts)
-    return sql, values
+    return sql, where_fns
 
 
 def update_by_id(table, row, paramstr):
@@ -145,15 +309,13 @@ def update_by_id(table, row, paramstr):
     col_names = []
     auto_id_col = table.auto_id_col
     row_id = None
-    for col in table.cols:
-        col_name = col.col_name
-        value = row[col_name]
+    for col, value in zip(table.cols, row_values(table, row, "update_by_id")):
         col.check_value(value)
         if col is auto_id_col:
             assert not value is None, "update_by_id(): cannot use None for AutoIdCol"
             row_id = value
         else:
-            col_names.append(col_name)
+            col_names.append(col.col_name)
             value = col.py_to_db(value)
             values.append(value)
     values.append(row_id)
@@ -164,16 +326,29 @@ def update_by_id(table, row, paramstr):
     return sql, values
 
 
-def delete(table, where, dialect, paramstr):
+def delete(table, where, dialect, paramstr, cache=None):
+    key = None
+    if cache is not None:
+        key = ("DELETE", table, _where_key(where), dialect, paramstr)
+    sql, where_fns = _compiled(
+        cache, key, _compile_delete, table, where, dialect, paramstr
+        )
+    if where:
+        values = _where_values(where, where_fns)
+    else:
+        values = []
+    return sql, values
+
+
+def _compile_delete(table, where, dialect, paramstr):
     sql_parts = ["DELETE FROM", table.table_name]
+    where_fns = None
     if where:
         sql_parts.append("WHERE")
-        cond_sql, values = _sqlcond_to_sql(where, dialect, paramstr)
+        cond_sql, where_fns = _compile_where(where, dialect, paramstr)
         sql_parts.append(cond_sql)
-    else:
-        values = []
     sql = " ".join(sql_parts)
-    return sql, values
+    return sql, where_fns
 
 
 def delete_by_id(table, row_id, paramstr):
@@ -189,49 +364,233 @@ def delete_by_id(table, row_id, paramstr):
     return sql, values
 
 
-def select(table, where, order_by, dialect, paramstr):
-    col_names = [col.col_name for col in table.cols]
+def select_cols(table, cols):
+    # Returns tuple of the Cols for a list of QueryCols, None for all columns
+    if cols is None:
+        return None
+    assert cols, "select(): cols cannot be empty"
+    select_cols = []
+    for qcol in cols:
+        assert isinstance(qcol, QueryCol), "Column must be instance of QueryCol"
+        col = qcol._col
+        assert col in table.cols, \
+            "select(): column '%s' is not in table '%s'" \
+                % (col.col_name, table.table_name)
+        assert not col in select_cols, \
+            "select(): duplicate column '%s'" % col.col_name
+        select_cols.append(col)
+    return tuple(select_cols)
+
+
+def select(table, where, order_by, dialect, paramstr, cache=None, cols=None,
+        limit=None, offset=None):
+    # cols is a tuple of Cols from select_cols(), None for all columns
+    _check_limit("limit", limit)
+    _check_limit("offset", offset)
+    has_limit = not limit is None
+    has_offset = not offset is None
+    key = None
+    if cache is not None:
+        key = (
+            "SELECT", table, cols, _where_key(where), _sort_key(order_by),
+            has_limit, has_offset, dialect, paramstr
+            )
+    sql, where_fns = _compiled(
+        cache, key, _compile_select,
+        table, where, order_by, dialect, paramstr, cols, has_limit, has_offset
+        )
+    if where:
+        values = _where_values(where, where_fns)
+    else:
+        values = []
+    if has_limit:
+        values.append(limit)
+    if has_offset:
+        values.append(offset)
+    return sql, values
+
+
+def _check_limit(name, value):
+    if not value is None:
+        assert type(value) in (int, long) and value >= 0, \
+            "select(): %s must be an integer >= 0" % name
+
+
+def _compile_select(table, where, order_by, dialect, paramstr, cols=None,
+        has_limit=False, has_offset=False):
+    col_names = [col.col_name for col in (cols or table.cols)]
     col_names_sql = ",".join(col_names)
     sql_parts = ["SELECT", col_names_sql, "FROM", table.table_name]
+    where_fns = None
     if where:
         sql_parts.append("WHERE")
-        cond_sql, values = _sqlcond_to_sql(where, dialect, paramstr)
+        cond_sql, where_fns = _compile_where(where, dialect, paramstr)
         sql_parts.append(cond_sql)
-    else:
-        values = []
     if order_by:
         sql_parts.append("ORDER BY")
         sql_parts.append(_sqlsort_to_sql(order_by))
+    if has_limit:
+        sql_parts.append("LIMIT " + paramstr)
+    elif has_offset and dialect in _NO_LIMIT:
+        sql_parts.append(_NO_LIMIT[dialect])
+    if has_offset:
+        sql_parts.append("OFFSET " + paramstr)
     sql = " ".join(sql_parts)
-    return sql, values
+    return sql, where_fns
 
 
-def select_distinct(table, qcol, where, order_by, dialect, paramstr):
+def select_distinct(table, qcol, where, order_by, dialect, paramstr,
+        cache=None):
     assert isinstance(qcol, QueryCol), "Column must be instance of QueryCol"
+    key = None
+    if cache is not None:
+        key = (
+            "SELECT DISTINCT", table, qcol._col, _where_key(where),
+            _sort_key(order_by), dialect, paramstr
+            )
+    sql, where_fns = _compiled(
+        cache, key, _compile_select_distinct,
+        table, qcol, where, order_by, dialect, paramstr
+        )
+    if where:
+        values = _where_values(where, where_fns)
+    else:
+        values = []
+    return sql, values
+
+
+def _compile_select_distinct(table, qcol, where, order_by, dialect, paramstr):
     col_name = qcol._col.col_name
     sql_parts = ["SELECT DISTINCT", col_name, "FROM", table.table_name]
+    where_fns = None
     if where:
         sql_parts.append("WHERE")
-        cond_sql, values = _sqlcond_to_sql(where, dialect, paramstr)
+        cond_sql, where_fns = _compile_where(where, dialect, paramstr)
         sql_parts.append(cond_sql)
-    else:
-        values = []
     if order_by:
         sql_parts.append("ORDER BY")
         sql_parts.append(_sqlsort_to_sql(order_by))
         assert qcol._col is order_by.col, \
             "SELECT DISTINCT column must match 'order_by' column"
     sql = " ".join(sql_parts)
+    return sql, where_fns
+
+
+def aggregate(table, aggregates, where, group_by, dialect, paramstr,
+        cache=None):
+    # aggregates is a dict of name -> Aggregate, group_by a list of
+    # QueryCols. Result columns are the group_by columns followed by the
+    # aggregates sorted by name.
+    assert aggregates, "aggregate(): no aggregates given"
+    if isinstance(group_by, QueryCol):
+        group_by = [group_by]
+    group_cols = select_cols(table, group_by) or ()
+    group_col_names = [col.col_name for col in group_cols]
+    agg_key = []
+    for name in sorted(aggregates.keys()):
+        agg = aggregates[name]
+        assert type(name) is str, "aggregate(): name must be str"
+        assert isinstance(agg, Aggregate), \
+            "aggregate(): '%s' is not an aggregate" % name
+        assert agg.col is None or agg.col in table.cols, \
+            "aggregate(): column '%s' is not in table '%s'" \
+                % (agg.col.col_name, table.table_name)
+        assert not name in group_col_names, \
+            "aggregate(): name '%s' clashes with group_by column" % name
+        agg_key.append((agg.func, agg.col))
+    agg_key = tuple(agg_key)
+    key = None
+    if cache is not None:
+        key = (
+            "AGGREGATE", table, agg_key, group_cols, _where_key(where),
+            dialect, paramstr
+            )
+    sql, where_fns = _compiled(
+        cache, key, _compile_aggregate,
+        table, agg_key, group_cols, where, dialect, paramstr
+        )
+    if where:
+        values = _where_values(where, where_fns)
+    else:
+        values = []
     return sql, values
 
 
+def _compile_aggregate(table, agg_key, group_cols, where, dialect, paramstr):
+    col_sqls = [col.col_name for col in group_cols]
+    for func, col in agg_key:
+        if col is None:
+            col_sqls.append(func + "(*)")
+        else:
+            col_sqls.append("%s(%s)" % (func, col.col_name))
+    sql_parts = ["SELECT", ",".join(col_sqls), "FROM", table.table_name]
+    where_fns = None
+    if where:
+        sql_parts.append("WHERE")
+        cond_sql, where_fns = _compile_where(where, dialect, paramstr)
+        sql_parts.append(cond_sql)
+    if group_cols:
+        group_sql = ",".join([col.col_name for col in group_cols])
+        sql_parts.append("GROUP BY")
+        sql_parts.append(group_sql)
+        sql_parts.append("ORDER BY")
+        sql_parts.append(group_sql)
+    sql = " ".join(sql_parts)
+    return sql, where_fns
+
+
+def prepare_select(table, where, order_by, dialect, paramstr, cols=None):
+    # Returns (sql, params) where params is a list of
+    # (param_name, col, value_fn, value) - param_name is None for values
+    # given in the where clause itself.
+    sql, where_fns = _compile_select(
+        table, where, order_by, dialect, paramstr, cols
+        )
+    params = []
+    if where:
+        sqlconds = _where_sqlconds(where)
+        for sqlcond, value_fn in zip(sqlconds, where_fns):
+            if not value_fn:
+                continue
+            other = sqlcond.other
+            if isinstance(other, Param):
+                params.append((other.name, sqlcond.col, value_fn, None))
+            elif sqlcond.op in _LIST_OPS:
+                for value in value_fn(sqlcond.col, other):
+                    params.append((None, sqlcond.col, None, value))
+            else:
+                value = value_fn(sqlcond.col, other)
+                params.append((None, sqlcond.col, value_fn, value))
+    return sql, params
+
+
+def _compiled(cache, key, compile_fn, *args):
+    # Generated SQL depends only on the shape of the query, so it can be
+    # cached by key with the values bound separately on each call.
+    if cache is None:
+        return compile_fn(*args)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_fn(*args)
+        cache.put(key, compiled)
+    return compiled
+
+
+# Op functions return (cond_sql, value_fn) where value_fn(col, other) gives
+# the parameter value, or is None if the condition does not use a parameter.
+
+def _value_py_to_db(col, other):
+    return col.py_to_db(other)
+
+def _value_other(col, other):
+    return other
+
 def _op_eq(sqlcond, dialect, paramstr):
     if sqlcond.other == None:
-        return "%s is NULL", False, None
+        return "%s is NULL", None
     else:
         cond_sql = "%s=" + paramstr
-        value = sqlcond.col.py_to_db(sqlcond.other)
-        return cond_sql, True, value
+        return cond_sql, _value_py_to_db
 
 def _op_gtgteltlte(sqlcond, dialect, paramstr):
     assert not isinstance(sqlcond.col, BoolCol), \
@@ -241,8 +600,13 @@ def _op_gtgteltlte(sqlcond, dialect, paramstr):
     assert not sqlcond.other is None, \
         "Op '%s' does not support None" % sqlcond.op
     cond_sql = "%s" + sqlcond.op + paramstr
-    value = sqlcond.col.py_to_db(sqlcond.other)
-    return cond_sql, True, value
+    return cond_sql, _value_py_to_db
+
+def _value_year(col, other):
+    return other.year
+
+def _value_year_like(col, other):
+    return "%d-%%" % other.year
 
 def _op_YEAR(sqlcond, dialect, paramstr):
     assert isinstance(sqlcond.col, DateCol), \
@@ -251,16 +615,22 @@ def _op_YEAR(sqlcond, dialect, paramstr):
         "YEAR condition cannot use None"
     if dialect == DIALECT_SQLITE:
         cond_sql = "%s LIKE " + paramstr
-        value = "%d-%%" % sqlcond.other.year
+        value_fn = _value_year_like
     elif dialect == DIALECT_POSTGRES:
         cond_sql = "EXTRACT(YEAR FROM %s)=" + paramstr
-        value = sqlcond.other.year
+        value_fn = _value_year
     elif dialect == DIALECT_MYSQL:
         cond_sql = "YEAR(%s)=" + paramstr
-        value = sqlcond.other.year
+        value_fn = _value_year
     else:
         raise Exception, ("Unknown dialect", dialect)
-    return cond_sql, True, value
+    return cond_sql, value_fn
+
+def _value_month(col, other):
+    return other.month
+
+def _value_month_like(col, other):
+    return "%%-%02d-%%" % other.month
 
 def _op_MONTH(sqlcond, dialect, paramstr):
     assert isinstance(sqlcond.col, DateCol), \
@@ -269,13 +639,19 @@ def _op_MONTH(sqlcond, dialect, paramstr):
         "MONTH condition cannot use None"
     if dialect == DIALECT_SQLITE:
         cond_sql = "%s LIKE " + paramstr
-        value = "%%-%02d-%%" % sqlcond.other.month
+        value_fn = _value_month_like
     elif dialect == DIALECT_POSTGRES or dialect == DIALECT_MYSQL:
         cond_sql = "EXTRACT(MONTH FROM %s)=" + paramstr
-        value = sqlcond.other.month
+        value_fn = _value_month
     else:
         raise Exception, ("Unknown dialect", dialect)
-    return cond_sql, True, value
+    return cond_sql, value_fn
+
+def _value_day(col, other):
+    return other.day
+
+def _value_day_like(col, other):
+    return "%%-%02d" % other.day
 
 def _op_DAY(sqlcond, dialect, paramstr):
     assert isinstance(sqlcond.col, DateCol), \
@@ -284,13 +660,13 @@ def _op_DAY(sqlcond, dialect, paramstr):
         "DAY condition cannot use None"
     if dialect == DIALECT_SQLITE:
         cond_sql = "%s LIKE " + paramstr
-        value = "%%-%02d" % sqlcond.other.day
+        value_fn = _value_day_like
     elif dialect == DIALECT_POSTGRES or dialect == DIALECT_MYSQL:
         cond_sql = "EXTRACT(DAY FROM %s)=" + paramstr
-        value = sqlcond.other.day
+        value_fn = _value_day
     else:
         raise Exception, ("Unknown dialect", dialect)
-    return cond_sql, True, value
+    return cond_sql, value_fn
 
 def _op_LIKE(sqlcond, dialect, paramstr):
     assert isinstance(sqlcond.col, UnicodeCol), \
@@ -305,8 +681,7 @@ def _op_LIKE(sqlcond, dialect, paramstr):
         cond_sql = "%s COLLATE utf8_bin LIKE " + paramstr
     else:
         raise Exception, ("Unknown dialect", dialect)
-    value = sqlcond.other
-    return cond_sql, True, value
+    return cond_sql, _value_other
 
 def _op_ILIKE(sqlcond, dialect, paramstr):
     assert isinstance(sqlcond.col, UnicodeCol), \
@@ -321,8 +696,16 @@ def _op_ILIKE(sqlcond, dialect, paramstr):
         cond_sql = "%s LIKE " + paramstr + " COLLATE utf8_general_ci"
     else:
         raise Exception, ("Unknown dialect", dialect)
-    value = sqlcond.other
-    return cond_sql, True, value
+    return cond_sql, _value_other
+
+
+def _values_py_to_db(col, other):
+    return [col.py_to_db(value) for value in other]
+
+def _op_IN(sqlcond, dialect, paramstr):
+    value_qs = ",".join([paramstr] * len(sqlcond.other))
+    cond_sql = "%s " + sqlcond.op + " (" + value_qs + ")"
+    return cond_sql, _values_py_to_db
 
 
 _OP_MAP = {
@@ -336,35 +719,208 @@ _OP_MAP = {
     "DAY": _op_DAY,
     "LIKE": _op_LIKE,
     "ILIKE": _op_ILIKE,
+    "IN": _op_IN,
+    "NOT IN": _op_IN,
     }
 
+# Ops whose value_fn returns a list of parameter values
+_LIST_OPS = ["IN", "NOT IN"]
+
 
 def _sqlcond_to_sql(where, dialect, paramstr):
+    cond_sql, value_fns = _compile_where(where, dialect, paramstr)
+    values = _where_values(where, value_fns)
+    return cond_sql, values
+
+def _where_sqlconds(where):
+    # SqlConditions of a where clause in the order they appear in the SQL
+    if isinstance(where, SqlCondition):
+        return [where]
+    elif isinstance(where, (AND, OR)):
+        sqlconds = []
+        for child in where.sqlconds:
+            sqlconds.extend(_where_sqlconds(child))
+        return sqlconds
+    elif isinstance(where, NOT):
+        return _where_sqlconds(where.sqlcond)
+    else:
+        raise AssertionError, "Unsupported 'where' clause: %s" % where
+
+def _compile_where(where, dialect, paramstr):
+    # Returns (sql, value_fns) with one value_fn per SqlCondition in the
+    # order of _where_sqlconds()
     if paramstr == "%s":
         paramstr = "%%s"
-    combiner = " AND "
+    value_fns = []
+    sql = _compile_cond(where, dialect, paramstr, value_fns)
+    return sql, value_fns
+
+def _compile_cond(where, dialect, paramstr, value_fns):
     if isinstance(where, SqlCondition):
-        sqlconds = [where]
+        op_fn = _OP_MAP.get(where.op)
+        if not op_fn:
+            raise AssertionError, "Unsupported op '%s'" % where.op
+        cond_sql, value_fn = op_fn(where, dialect, paramstr)
+        value_fns.append(value_fn)
+        return cond_sql % where.col.col_name
+    elif isinstance(where, (AND, OR)):
+        if isinstance(where, AND):
+            combiner = " AND "
+        else:
+            combiner = " OR "
+        cond_sqls = []
+        for child in where.sqlconds:
+            cond_sql = _compile_cond(child, dialect, paramstr, value_fns)
+            # bracket a nested AND/OR of the other kind
+            if isinstance(child, (AND, OR)) \
+                    and child.__class__ is not where.__class__:
+                cond_sql = "(" + cond_sql + ")"
+            cond_sqls.append(cond_sql)
+        return combiner.join(cond_sqls)
+    elif isinstance(where, NOT):
+        cond_sql = _compile_cond(where.sqlcond, dialect, paramstr, value_fns)
+        return "NOT (" + cond_sql + ")"
+    else:
+        raise AssertionError, "Unsupported 'where' clause: %s" % where
+
+def _where_values(where, value_fns):
+    sqlconds = _where_sqlconds(where)
+    values = []
+    for sqlcond, value_fn in zip(sqlconds, value_fns):
+        if value_fn:
+            other = sqlcond.other
+            if isinstance(other, Param):
+                raise AssertionError, \
+                    "Param '%s' can only be used with prepare()" % other.name
+            if sqlcond.op in _LIST_OPS:
+                values.extend(value_fn(sqlcond.col, other))
+            else:
+                values.append(value_fn(sqlcond.col, other))
+    return values
+
+def _where_key(where):
+    # Shape of a where clause - generated SQL only depends on the nesting,
+    # the columns and ops used, on which values are None and on the length
+    # of IN lists.
+    if where is None:
+        return None
+    elif isinstance(where, SqlCondition):
+        return (where.col, where.op, _other_key(where))
     elif isinstance(where, AND):
-        sqlconds = where.sqlconds
+        return ("AND",) + tuple([_where_key(c) for c in where.sqlconds])
     elif isinstance(where, OR):
-        combiner = " OR "
-        sqlconds = where.sqlconds
+        return ("OR",) + tuple([_where_key(c) for c in where.sqlconds])
+    elif isinstance(where, NOT):
+        return ("NOT", _where_key(where.sqlcond))
     else:
         raise AssertionError, "Unsupported 'where' clause: %s" % where
-    values = []
-    cond_sqls = []
-    for sqlcond in sqlconds:
-        op_fn = _OP_MAP.get(sqlcond.op)
-        if not op_fn:
-            raise AssertionError, "Unsupported op '%s'" % sqlcond.op
-        cond_sql, have_value, value = op_fn(sqlcond, dialect, paramstr)
-        cond_sql = cond_sql % sqlcond.col.col_name
-        cond_sqls.append(cond_sql)
-        if have_value:
-            values.append(value)
-    sql = combiner.join(cond_sqls)
-    return sql, values
+
+def _other_key(sqlcond):
+    if sqlcond.op in _LIST_OPS:
+        return len(sqlcond.other)
+    return sqlcond.other is None
+
+def _where_param_count(where):
+    count = 0
+    for sqlcond in _where_sqlconds(where):
+        if sqlcond.op in _LIST_OPS:
+            count += len(sqlcond.other)
+        elif not sqlcond.other is None:
+            count += 1
+    return count
+
+def split_where(where, dialect, reserved_params=0, first_values=None):
+    # Splits a where clause with too many parameters for one statement into
+    # several, each with a chunk of the values of its largest IN list.
+    # Rows matching the original are the union of rows matching the parts.
+    # first_values maps col -> value put in the first chunk, so an UPDATE
+    # setting the IN column doesn't make rows match the later chunks.
+    if where is None:
+        return [where]
+    max_params = MAX_PARAMS[dialect] - reserved_params
+    param_count = _where_param_count(where)
+    if param_count <= max_params:
+        return [where]
+    # only an IN that is the whole where clause or directly under a
+    # top level AND can be split
+    if isinstance(where, AND):
+        sqlconds = where.sqlconds
+    else:
+        sqlconds = [where]
+    in_conds = [
+        sqlcond for sqlcond in sqlconds
+            if isinstance(sqlcond, SqlCondition) and sqlcond.op == "IN"
+        ]
+    assert in_conds, \
+        "Too many parameters in 'where' clause: %d (max %d)" \
+            % (param_count, max_params)
+    in_cond = max(in_conds, key=lambda sqlcond: len(sqlcond.other))
+    # values the column's collation treats as equal go in the same chunk,
+    # so no row is returned by more than one part
+    groups = []
+    groups_by_key = {}
+    for value in in_cond.other:
+        key = collation_key(in_cond.col, value, dialect)
+        group = groups_by_key.get(key)
+        if group is None:
+            group = groups_by_key[key] = []
+            groups.append(group)
+        if not value in group:
+            group.append(value)
+    if first_values and in_cond.col in first_values:
+        key = collation_key(
+            in_cond.col, first_values[in_cond.col], dialect
+            )
+        group = groups_by_key.get(key)
+        if group is not None:
+            groups.remove(group)
+            groups.insert(0, group)
+    chunk_size = max_params - (param_count - len(in_cond.other))
+    assert chunk_size > 0, \
+        "Too many parameters in 'where' clause: %d (max %d)" \
+            % (param_count, max_params)
+    chunks = [[]]
+    for group in groups:
+        assert len(group) <= chunk_size, \
+            "Too many equal values in 'where' clause: %d (max %d)" \
+                % (len(group), chunk_size)
+        if len(chunks[-1]) + len(group) > chunk_size:
+            chunks.append([])
+        chunks[-1].extend(group)
+    wheres = []
+    for chunk in chunks:
+        chunk_cond = SqlCondition(in_cond.col, "IN", tuple(chunk))
+        if where is in_cond:
+            wheres.append(chunk_cond)
+            continue
+        chunk_sqlconds = []
+        for sqlcond in sqlconds:
+            if sqlcond is in_cond:
+                sqlcond = chunk_cond
+            chunk_sqlconds.append(sqlcond)
+        wheres.append(AND(*chunk_sqlconds))
+    return wheres
+
+
+def collation_key(col, value, dialect):
+    # Key equal for values the database compares as equal in col: case is
+    # ignored by collate_nocase and, with accents and trailing spaces, by
+    # MySQL's utf8_general_ci. Values are only ever grouped too coarsely.
+    if value is None or col.__class__ is not UnicodeCol:
+        return value
+    if dialect == DIALECT_MYSQL:
+        value = unicodedata.normalize("NFKD", unicode(value))
+        value = u"".join([c for c in value if not unicodedata.combining(c)])
+        return value.rstrip(u" ").lower()
+    if col.collate_nocase:
+        return value.lower()
+    return value
+
+def _sort_key(order_by):
+    if not order_by:
+        return None
+    assert isinstance(order_by, SqlSort), "'order_by' must be SqlSort"
+    return (order_by.col, order_by.asc)
 
 def _sqlsort_to_sql(order_by):
     assert isinstance(order_by, SqlSort), "'order_by' must be SqlSort"
@@ -1,11 +1,36 @@
 
-from binder.col import AutoIdCol
+import threading
+from collections import namedtuple
+
+from binder.cache import LruCache
+from binder.col import ColBase, AutoIdCol, IntCol, FloatCol, BoolCol
+
+
+# Row types returned by select
+ROW_DICT = "dict"
+ROW_TUPLE = "tuple"
+ROW_RECORD = "record"
+ROW_NAMEDTUPLE = "namedtuple"
+
+_ROW_FACTORIES = [
+    ROW_DICT,
+    ROW_TUPLE,
+    ROW_RECORD,
+    ROW_NAMEDTUPLE,
+    ]
+
+# Max number of row builders / decoders kept per table, by row type and cols
+ROW_FN_CACHE_SIZE = 100
+
 
 class Table:
 
     def __init__(self, table_name, *cols):
         self.table_name = table_name
         self.cols = cols
+        # Tables are module level objects used by every thread, the lock
+        # guards the record class and row function caches
+        self._lock = threading.RLock()
         col_map = {}
         auto_id_col = None
         for col in cols:
@@ -20,6 +45,24 @@ class Table:
                 auto_id_col = col
         self.auto_id_col = auto_id_col
         self.q = QueryCols(table_name, cols)
+        self.col_names = tuple([col.col_name for col in cols])
+        self._row_builders = LruCache(ROW_FN_CACHE_SIZE)
+        self._row_decoders = LruCache(ROW_FN_CACHE_SIZE)
+        self.decode_row = self.row_decoder(ROW_DICT)
+
+    def __getattr__(self, name):
+        # record_class is made on first use
+        if name != "record_class":
+            raise AttributeError, name
+        self._lock.acquire()
+        try:
+            if not "record_class" in self.__dict__:
+                self.record_class = make_record_class(
+                    self.table_name, self.col_names
+                    )
+            return self.record_class
+        finally:
+            self._lock.release()
 
     def new(self, **col_values):
         row = {}
@@ -44,6 +87,12 @@ class Table:
             row[col_name] = value
         return row
 
+    def new_record(self, **col_values):
+        row = self.new(**col_values)
+        return self.record_class(
+            *[row[col_name] for col_name in self.col_names]
+            )
+
     def check_values(self, row):
         auto_id_used = False
         for col in self.cols:
@@ -53,6 +102,134 @@ class Table:
                 auto_id_used = True
         return auto_id_used
 
+    def row_builder(self, row_factory, cols=None):
+        "Returns function making a row of the given type from Python values."
+        key = (row_factory, cols)
+        self._lock.acquire()
+        try:
+            row_builder = self._row_builders.get(key)
+            if row_builder is None:
+                record_class = None
+                if cols is None:
+                    col_names = self.col_names
+                    if row_factory == ROW_RECORD:
+                        record_class = self.record_class
+                else:
+                    col_names = tuple([col.col_name for col in cols])
+                row_builder = make_row_builder(
+                    self.table_name, col_names, row_factory, record_class
+                    )
+                self._row_builders.put(key, row_builder)
+            return row_builder
+        finally:
+            self._lock.release()
+
+    def row_decoder(self, row_factory, cols=None):
+        "Returns function making a row of the given type from db values."
+        key = (row_factory, cols)
+        self._lock.acquire()
+        try:
+            row_decoder = self._row_decoders.get(key)
+            if row_decoder is None:
+                row_decoder = make_row_decoder(
+                    cols or self.cols, self.row_builder(row_factory, cols)
+                    )
+                self._row_decoders.put(key, row_decoder)
+            return row_decoder
+        finally:
+            self._lock.release()
+
+
+def make_row_builder(table_name, col_names, row_factory, record_class=None):
+    assert row_factory in _ROW_FACTORIES, \
+        "Unknown row_factory: %s" % row_factory
+    if row_factory == ROW_DICT:
+        def build_row(values):
+            return dict(zip(col_names, values))
+    elif row_factory == ROW_TUPLE:
+        build_row = tuple
+    elif row_factory == ROW_RECORD:
+        if record_class is None:
+            record_class = make_record_class(table_name, col_names)
+        def build_row(values):
+            return record_class(*values)
+    else:
+        build_row = namedtuple(table_name, col_names)._make
+    return build_row
+
+
+def make_row_decoder(cols, build_row):
+    # Builds a function converting a db row tuple to a row, calling
+    # db_to_py() only for columns that override it.
+    converters = []
+    for i in range(len(cols)):
+        col = cols[i]
+        if col.__class__.db_to_py.im_func is not ColBase.db_to_py.im_func:
+            converters.append((i, col.db_to_py))
+    if not converters:
+        return build_row
+    def decode_row(values):
+        values = list(values)
+        for i, db_to_py in converters:
+            values[i] = db_to_py(values[i])
+        return build_row(values)
+    return decode_row
+
+
+def make_record_class(table_name, col_names):
+    for col_name in col_names:
+        assert not col_name in _RECORD_METHODS, \
+            "ROW_RECORD: column '%s' clashes with Record.%s()" \
+                % (col_name, col_name)
+    return type(str(table_name), (Record,), {"__slots__": col_names})
+
+
+# Record methods that columns would shadow
+_RECORD_METHODS = ["keys", "values"]
+
+def _record_values(record):
+    return [getattr(record, col_name) for col_name in record.__slots__]
+
+
+class Record(object):
+    "Row with one slot per column - see Table.record_class."
+
+    # new-style class for __slots__ i.e. no per-row __dict__
+    __slots__ = ()
+
+    def __init__(self, *values):
+        assert len(values) == len(self.__slots__), \
+            "%s: expected %d values, got %d" \
+                % (self.__class__.__name__, len(self.__slots__), len(values))
+        for col_name, value in zip(self.__slots__, values):
+            setattr(self, col_name, value)
+
+    def __getitem__(self, col_name):
+        return getattr(self, col_name)
+
+    def __setitem__(self, col_name, value):
+        setattr(self, col_name, value)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def values(self):
+        return _record_values(self)
+
+    def __eq__(self, other):
+        return type(other) is type(self) \
+            and _record_values(other) == _record_values(self)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        values = ", ".join([
+            "%s=%s" % (col_name, repr(getattr(self, col_name)))
+                for col_name in self.__slots__
+            ])
+        return "%s(%s)" % (self.__class__.__name__, values)
+
 
 
 class QueryCols:
@@ -104,11 +281,34 @@ class QueryCol:
     def ILIKE(self, s):
         return SqlCondition(self._col, "ILIKE", s)
 
+    def IN(self, values):
+        return SqlCondition(self._col, "IN", tuple(values))
+
+    def NOT_IN(self, values):
+        return SqlCondition(self._col, "NOT IN", tuple(values))
+
+
+class Param:
+
+    def __init__(self, name):
+        assert type(name) is str, "Param name must be str"
+        self.name = name
+
+    def __repr__(self):
+        return "Param(%s)" % repr(self.name)
+
 
 class SqlCondition:
 
     def __init__(self, col, op, other):
-        col.check_value(other)
+        if op in ["IN", "NOT IN"]:
+            assert type(other) is tuple, "%s: values must be tuple" % op
+            assert other, "%s: values cannot be empty" % op
+            for value in other:
+                assert not value is None, "%s: cannot use None" % op
+                col.check_value(value)
+        elif not isinstance(other, Param):
+            col.check_value(other)
         if col.__class__ is AutoIdCol:
             assert other != None, \
                 "SqlCondition: cannot use None for AutoIdCol"
@@ -137,14 +337,15 @@ class AND:
     def __init__(self, *sqlconds):
         assert len(sqlconds) > 1, "AND: must have at least 2 conditions"
         for sqlcond in sqlconds:
-            assert isinstance(sqlcond, SqlCondition), \
-                "AND: conditions must be SqlCondition"
+            assert isinstance(sqlcond, _CONDITION_TYPES), \
+                "AND: conditions must be SqlCondition, AND, OR or NOT"
         self.sqlconds = sqlconds
 
     def __repr__(self):
-        conds = " AND ".join(c._repr1() for c in self.sqlconds)
-        conds = '"%s"' % conds
-        return conds
+        return '"%s"' % self._repr1()
+
+    def _repr1(self):
+        return " AND ".join(_repr_child(self, c) for c in self.sqlconds)
 
 
 class OR:
@@ -152,13 +353,91 @@ class OR:
     def __init__(self, *sqlconds):
         assert len(sqlconds) > 1, "OR: must have at least 2 conditions"
         for sqlcond in sqlconds:
-            assert isinstance(sqlcond, SqlCondition), \
-                "OR: conditions must be SqlCondition"
+            assert isinstance(sqlcond, _CONDITION_TYPES), \
+                "OR: conditions must be SqlCondition, AND, OR or NOT"
         self.sqlconds = sqlconds
 
     def __repr__(self):
-        conds = " OR ".join(c._repr1() for c in self.sqlconds)
-        conds = '"%s"' % conds
-        return conds
+        return '"%s"' % self._repr1()
+
+    def _repr1(self):
+        return " OR ".join(_repr_child(self, c) for c in self.sqlconds)
+
+
+class NOT:
+
+    def __init__(self, sqlcond):
+        assert isinstance(sqlcond, _CONDITION_TYPES), \
+            "NOT: condition must be SqlCondition, AND, OR or NOT"
+        self.sqlcond = sqlcond
+
+    def __repr__(self):
+        return '"%s"' % self._repr1()
+
+    def _repr1(self):
+        return "NOT (%s)" % self.sqlcond._repr1()
+
+
+_CONDITION_TYPES = (SqlCondition, AND, OR, NOT)
+
+def _repr_child(parent, child):
+    if isinstance(child, (AND, OR)) and child.__class__ is not parent.__class__:
+        return "(%s)" % child._repr1()
+    return child._repr1()
+
+
+
+class Aggregate:
+
+    def __init__(self, func, qcol):
+        if qcol is None:
+            assert func == "COUNT", "%s: column required" % func
+            col = None
+        else:
+            assert isinstance(qcol, QueryCol), \
+                "%s: column must be instance of QueryCol" % func
+            col = qcol._col
+        if func in ["SUM", "AVG"]:
+            assert col.__class__ in [IntCol, FloatCol], \
+                "%s: column must be IntCol or FloatCol" % func
+        if func in ["MIN", "MAX"]:
+            assert not isinstance(col, BoolCol), \
+                "%s: does not support BoolCol" % func
+        self.func = func
+        self.col = col
+
+    def db_to_py(self, dbvalue):
+        if dbvalue is None:
+            # SUM, MIN, MAX, AVG of no rows
+            return None
+        func = self.func
+        if func == "COUNT":
+            return int(dbvalue)
+        elif func == "AVG":
+            return float(dbvalue)
+        elif func == "SUM":
+            # postgres / mysql: SUM of integers is a Decimal
+            return self.col.pytype(dbvalue)
+        else:
+            return self.col.db_to_py(dbvalue)
+
+    def __repr__(self):
+        if self.col is None:
+            return "%s(*)" % self.func
+        return "%s(%s)" % (self.func, self.col.col_name)
+
+
+def COUNT(qcol=None):
+    return Aggregate("COUNT", qcol)
+
+def SUM(qcol):
+    return Aggregate("SUM", qcol)
+
+def MIN(qcol):
+    return Aggregate("MIN", qcol)
 
+def MAX(qcol):
+    return Aggregate("MAX", qcol)
 
+def AVG(qcol):
+    return Aggregate("AVG", qcol)
@@ -0,0 +1,64 @@
+"Connection manager opening one connection per thread."
+
+import threading
+import weakref
+
+
+class ThreadLocalConnection:
+
+    # A Connection must only be used by one thread - the last result
+    # iterator and the transaction are per connection. This opens a
+    # connection for each thread on first use, and Connection methods
+    # called on the manager go to the calling thread's connection.
+
+    def __init__(self, conn_class, *args, **kwargs):
+        self._conn_class = conn_class
+        self._args = args
+        self._kwargs = kwargs
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # connections of threads that have ended are garbage collected
+        self._conns = weakref.WeakSet()
+
+    def get(self):
+        "Returns the calling thread's connection, opening it if needed."
+        conn = getattr(self._local, "conn", None)
+        if conn is None or not conn._is_open:
+            conn = self._conn_class(*self._args, **self._kwargs)
+            self._local.conn = conn
+            self._lock.acquire()
+            try:
+                self._conns.add(conn)
+            finally:
+                self._lock.release()
+        return conn
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def close(self):
+        "Closes the calling thread's connection, reopened on next use."
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            if conn._is_open:
+                conn.close()
+
+    def close_all(self):
+        # Connections can only be closed by other threads if the driver
+        # allows it, sqlite3 connections are closed when their thread ends.
+        self._lock.acquire()
+        try:
+            conns = list(self._conns)
+        finally:
+            self._lock.release()
+        for conn in conns:
+            if conn._is_open:
+                try:
+                    conn.close()
+                except conn.DbError:
+                    pass
+
+    def __repr__(self):
+        return "<ThreadLocalConnection:%s,open=%d>" \
+            % (self._conn_class.__name__, len(self._conns))
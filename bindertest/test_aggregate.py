@@ -0,0 +1,87 @@
+import unittest
+
+from datetime import date
+
+from binder import *
+
+from bindertest.testdbconfig import connect
+from bindertest.tabledefs import Foo, Bar
+
+
+class ConnAggregateTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        conn.insert_many(Foo, [
+            Foo.new(i1=10, s1=u"a", d1=date(2006, 5, 30)),
+            Foo.new(i1=20, s1=u"b", d1=date(2007, 1, 1)),
+            Foo.new(i1=35, s1=u"b"),
+            ])
+        conn.drop_table_if_exists(Bar)
+        conn.create_table(Bar)
+        conn.commit()
+
+    def test_count(self):
+        conn = connect()
+        self.assertEquals(3, conn.count(Foo))
+        self.assertEquals(2, conn.count(Foo, Foo.q.s1 == u"b"))
+        self.assertEquals(0, conn.count(Foo, Foo.q.i1 > 100))
+        self.assertEquals(0, conn.count(Bar))
+
+    def test_aggregate(self):
+        conn = connect()
+        result = conn.aggregate(Foo, {
+            "n": COUNT(),
+            "n_dated": COUNT(Foo.q.d1),
+            "total": SUM(Foo.q.i1),
+            "avg": AVG(Foo.q.i1),
+            "first": MIN(Foo.q.d1),
+            "last": MAX(Foo.q.d1),
+            "max_s1": MAX(Foo.q.s1),
+            })
+        self.assertEquals({
+            "n": 3,
+            "n_dated": 2,
+            "total": 65,
+            "avg": 65 / 3.0,
+            "first": date(2006, 5, 30),
+            "last": date(2007, 1, 1),
+            "max_s1": u"b",
+            }, result)
+        self.assert_(type(result["total"]) is int)
+        # no rows
+        self.assertEquals(
+            {"total": None, "n": 0},
+            conn.aggregate(
+                Foo, {"total": SUM(Foo.q.i1), "n": COUNT()}, Foo.q.i1 > 100
+                )
+            )
+
+    def test_group_by(self):
+        conn = connect()
+        self.assertEquals(
+            [
+                {"s1": u"a", "n": 1, "total": 10},
+                {"s1": u"b", "n": 2, "total": 55},
+            ],
+            conn.aggregate(
+                Foo, {"n": COUNT(), "total": SUM(Foo.q.i1)},
+                group_by=[Foo.q.s1]
+                )
+            )
+        self.assertEquals(
+            [{"d1": date(2007, 1, 1), "total": 20}],
+            conn.aggregate(
+                Foo, {"total": SUM(Foo.q.i1)}, Foo.q.i1 == 20, Foo.q.d1
+                )
+            )
+        self.assertEquals(
+            [],
+            conn.aggregate(Bar, {"n": COUNT()}, group_by=[Bar.q.bb])
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
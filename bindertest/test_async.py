@@ -0,0 +1,95 @@
+import threading
+import unittest
+
+from binder import *
+
+from bindertest.testdbconfig import connect as connect_db
+from bindertest.tabledefs import Foo
+
+
+def connect():
+    return AsyncConnection(connect_db)
+
+
+class AsyncConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        conn.commit().result()
+        conn.close().result()
+
+    def test_queries(self):
+        conn = connect()
+        foo1 = Foo.new(foo_id=1, i1=101, s1=u"alpha")
+        foo2 = Foo.new(foo_id=2, i1=23, s1=u"beta")
+        # calls run in order, only the last result is waited for
+        conn.insert(Foo, foo1)
+        conn.insert(Foo, foo2)
+        future = conn.select(Foo, order_by=Foo.q.foo_id.ASC)
+        self.assertEquals([foo1, foo2], future.result())
+        self.assert_(future.done())
+        self.assertEquals(foo2, conn.get(Foo, 2).result())
+        self.assertEquals(2, conn.count(Foo).result())
+        foo1["i1"] = 5
+        self.assertEquals(True, conn.update_by_id(Foo, foo1).result())
+        self.assertEquals(1, conn.delete(Foo, Foo.q.i1 == 23).result())
+        conn.commit().result()
+        self.assertEquals([foo1], conn.select(Foo).result())
+        conn.close().result()
+        try:
+            conn.select(Foo)
+        except AssertionError, e:
+            self.assertEquals("Connection is closed", str(e))
+        else:
+            self.fail()
+
+    def test_xselect(self):
+        conn = connect()
+        foos = [Foo.new(foo_id=i, i1=i) for i in range(1, 6)]
+        conn.insert_many(Foo, foos)
+        i = conn.xselect(Foo, order_by=Foo.q.foo_id.ASC, batch_size=2).result()
+        rows = []
+        while True:
+            batch = i.next_batch().result()
+            if not batch:
+                break
+            self.assert_(len(batch) <= 2)
+            rows.extend(batch)
+            # other calls don't close the iterator
+            self.assertEquals(5, conn.count(Foo).result())
+        self.assertEquals(foos, rows)
+        i.close().result()
+        conn.close().result()
+
+    def test_error(self):
+        conn = connect()
+        conn.insert(Foo, Foo.new(foo_id=1))
+        future = conn.insert(Foo, Foo.new(foo_id=1))
+        self.assertRaises(conn.DbError, future.result)
+        # errors raised by xselect() are passed on
+        future = conn.xselect(Foo, batch_size=0)
+        self.assertRaises(AssertionError, future.result)
+        conn.close().result()
+
+    def test_callback(self):
+        conn = connect()
+        done = threading.Event()
+        results = []
+        def callback(future):
+            results.append(future.result())
+            done.set()
+        conn.count(Foo).add_done_callback(callback)
+        done.wait(5)
+        self.assertEquals([0], results)
+        # already done
+        future = conn.count(Foo)
+        future.result()
+        future.add_done_callback(callback)
+        self.assertEquals([0, 0], results)
+        conn.close().result()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+import tempfile
+import unittest
+
+from datetime import date, datetime
+
+from binder.bulkfmt import *
+from binder.sqlgen import DIALECT_POSTGRES, DIALECT_MYSQL
+
+from bindertest.tabledefs import Foo, Bar, Baz
+
+
+class EscapeTest(unittest.TestCase):
+
+    def test_escape(self):
+        self.assertEquals("abc", escape_field("abc"))
+        self.assertEquals(
+            "a\\tb\\nc\\rd\\\\e\\\\N", escape_field("a\tb\nc\rd\\e\\N")
+            )
+        self.assertEquals("\\0012", escape_field("\x00012"))
+
+    def test_unescape(self):
+        self.assertEquals("abc", unescape_field("abc"))
+        self.assertEquals(
+            "a\tb\nc\rd\\e\\N", unescape_field("a\\tb\\nc\\rd\\\\e\\\\N")
+            )
+        self.assertEquals("\b\f\v", unescape_field("\\b\\f\\v"))
+        self.assertEquals("AB", unescape_field("\\101\\x42"))
+        # other escaped chars are themselves
+        self.assertEquals("a.", unescape_field("\\a\\."))
+
+    def test_unescape_mysql(self):
+        self.assertEquals(
+            "a\tb\nc\rd\\e\\N",
+            unescape_field("a\\tb\\nc\\rd\\\\e\\\\N", DIALECT_MYSQL)
+            )
+        self.assertEquals(
+            "\x00012\x1a", unescape_field("\\0012\\Z", DIALECT_MYSQL)
+            )
+        # no octal or hex escapes
+        self.assertEquals("a.x42", unescape_field("\\a\\.\\x42", DIALECT_MYSQL))
+
+
+class PostgresFormatTest(unittest.TestCase):
+
+    def test_bulk_line(self):
+        bar = Bar.new(
+            bi=5, bs=u"a\tb\\c\xe9", bd=date(2006, 5, 30),
+            bdt1=datetime(2006, 5, 30, 10, 20, 30), bb=True
+            )
+        line = bulk_line(Bar, Bar.cols, bar, DIALECT_POSTGRES, "copy_in")
+        self.assertEquals(
+            "5\ta\\tb\\\\c\xc3\xa9\t2006-05-30\t2006-05-30T10:20:30Z\tt\n",
+            line
+            )
+        bar = Bar.new(bi=None, bs=u"", bd=None, bdt1=None, bb=False)
+        line = bulk_line(Bar, Bar.cols, bar, DIALECT_POSTGRES, "copy_in")
+        self.assertEquals("\\N\t\t\\N\t\\N\tf\n", line)
+        # tuple rows
+        line = bulk_line(Baz, Baz.cols, (3, 1.5, u"x"), DIALECT_POSTGRES, "copy_in")
+        self.assertEquals("3\t1.5\tx\n", line)
+        # values are checked
+        try:
+            bulk_line(Baz, Baz.cols, (3, 1.5, u"xxxxxx"), DIALECT_POSTGRES, "copy_in")
+        except ValueError, e:
+            self.assertEquals("UnicodeCol 's3': string too long", str(e))
+        else:
+            self.fail()
+
+    def test_auto_id(self):
+        foo = Foo.new(foo_id=None, i1=1, s1=u"a")
+        cols = bulk_cols(Foo, foo, "copy_in")
+        self.assertEquals(Foo.cols[1:], cols)
+        self.assertEquals(
+            "1\ta\t\\N\n", bulk_line(Foo, cols, foo, DIALECT_POSTGRES, "copy_in")
+            )
+        foo2 = Foo.new(foo_id=2, i1=1, s1=u"a")
+        self.assertEquals(Foo.cols, bulk_cols(Foo, foo2, "copy_in"))
+        try:
+            bulk_line(Foo, cols, foo2, DIALECT_POSTGRES, "copy_in")
+        except AssertionError, e:
+            self.assertEquals(
+                "copy_in(): AutoIdCol must be None in all rows or none", str(e)
+                )
+        else:
+            self.fail()
+        try:
+            bulk_line(Foo, Foo.cols, foo, DIALECT_POSTGRES, "copy_in")
+        except AssertionError, e:
+            self.assertEquals(
+                "copy_in(): AutoIdCol must be None in all rows or none", str(e)
+                )
+        else:
+            self.fail()
+
+    def test_parse_bulk_line(self):
+        # as output by COPY TO
+        self.assertEquals(
+            (5, u"a\tb\\c\xe9", date(2006, 5, 30),
+                datetime(2006, 5, 30, 10, 20, 30), True),
+            parse_bulk_line(
+                Bar.cols,
+                "5\ta\\tb\\\\c\xc3\xa9\t2006-05-30\t2006-05-30 10:20:30.25\tt\n",
+                DIALECT_POSTGRES
+                )
+            )
+        self.assertEquals(
+            (None, u"", None, None, False),
+            parse_bulk_line(Bar.cols, "\\N\t\t\\N\t\\N\tf\n", DIALECT_POSTGRES)
+            )
+        self.assertEquals(
+            (3, 1.5), parse_bulk_line(Baz.cols[:2], "3\t1.5", DIALECT_POSTGRES)
+            )
+        try:
+            parse_bulk_line(Baz.cols, "3\t1.5", DIALECT_POSTGRES)
+        except AssertionError, e:
+            self.assertEquals("Expected 3 fields, got 2", str(e))
+        else:
+            self.fail()
+
+    def test_round_trip(self):
+        baz = (7, 0.1, u"\\N\n\r")
+        line = bulk_line(Baz, Baz.cols, baz, DIALECT_POSTGRES, "copy_in")
+        self.assertEquals(baz, parse_bulk_line(Baz.cols, line, DIALECT_POSTGRES))
+
+
+class MysqlFormatTest(unittest.TestCase):
+
+    def test_bulk_line(self):
+        bar = Bar.new(
+            bi=5, bs=u"a\tb\x00c\xe9", bd=date(2006, 5, 30),
+            bdt1=datetime(2006, 5, 30, 10, 20, 30, 5), bb=True
+            )
+        line = bulk_line(Bar, Bar.cols, bar, DIALECT_MYSQL, "bulk_load")
+        self.assertEquals(
+            "5\ta\\tb\\0c\xc3\xa9\t2006-05-30\t2006-05-30 10:20:30\t1\n",
+            line
+            )
+        bar = Bar.new(bi=None, bs=u"", bd=None, bdt1=None, bb=False)
+        line = bulk_line(Bar, Bar.cols, bar, DIALECT_MYSQL, "bulk_load")
+        self.assertEquals("\\N\t\t\\N\t\\N\t0\n", line)
+
+    def test_spool_round_trip(self):
+        bars = [
+            Bar.new(
+                bi=5, bs=u"a\tb\\c\n\xe9", bd=date(2006, 5, 30),
+                bdt1=datetime(2006, 5, 30, 10, 20, 30), bb=True
+                ),
+            Bar.new(bi=None, bs=u"\\N", bd=None, bdt1=None, bb=False),
+            ]
+        spool = tempfile.TemporaryFile()
+        cols, count = write_bulk_file(spool, Bar, iter(bars), DIALECT_MYSQL, "bulk_load")
+        self.assertEquals((Bar.cols, 2), (cols, count))
+        spool.seek(0)
+        rows = [
+            parse_bulk_line(Bar.cols, line, DIALECT_MYSQL) for line in spool
+            ]
+        self.assertEquals(
+            [tuple([bar[col.col_name] for col in Bar.cols]) for bar in bars],
+            rows
+            )
+        spool.close()
+
+    def test_spool_auto_id(self):
+        foos = [Foo.new(i1=i, s1=u"s%d" % i) for i in range(3)]
+        spool = tempfile.TemporaryFile()
+        cols, count = write_bulk_file(spool, Foo, foos, DIALECT_MYSQL, "bulk_load")
+        self.assertEquals((Foo.cols[1:], 3), (cols, count))
+        spool.seek(0)
+        self.assertEquals("0\ts0\t\\N\n", spool.readline())
+        spool.close()
+        # no rows
+        self.assertEquals(
+            (Foo.cols, 0),
+            write_bulk_file(spool, Foo, [], DIALECT_MYSQL, "bulk_load")
+            )
+
+
+class LineReaderTest(unittest.TestCase):
+
+    def test_read(self):
+        lines = ["abc\n", "de\n", "fghij\n"]
+        reader = LineReader(iter(lines))
+        self.assertEquals("ab", reader.read(2))
+        self.assertEquals("c\nde\nf", reader.read(6))
+        self.assertEquals("ghij\n", reader.read(100))
+        self.assertEquals("", reader.read(100))
+        reader = LineReader(lines)
+        self.assertEquals("".join(lines), reader.read())
+
+    def test_readline(self):
+        reader = LineReader(["abc\n", "de\n", "fghij\n"])
+        self.assertEquals("a", reader.read(1))
+        self.assertEquals("bc\n", reader.readline())
+        self.assertEquals("de\n", reader.readline())
+        self.assertEquals("fghij\n", reader.readline())
+        self.assertEquals("", reader.readline())
+
+
+if __name__ == '__main__':
+    unittest.main()
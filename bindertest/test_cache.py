@@ -0,0 +1,58 @@
+
+import unittest
+
+from binder.cache import LruCache
+
+
+class LruCacheTest(unittest.TestCase):
+
+    def test_get_put(self):
+        cache = LruCache(10)
+        self.assertEquals(None, cache.get("a"))
+        self.assertEquals(42, cache.get("a", 42))
+        cache.put("a", 1)
+        self.assertEquals(1, cache.get("a"))
+        cache.put("a", 2)
+        self.assertEquals(2, cache.get("a"))
+        self.assertEquals(1, len(cache))
+        self.assert_("a" in cache)
+        self.assertEquals(2, cache.hits)
+        self.assertEquals(2, cache.misses)
+
+    def test_evict_lru(self):
+        cache = LruCache(3)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("c", 3)
+        # "a" becomes most recently used
+        self.assertEquals(1, cache.get("a"))
+        cache.put("d", 4)
+        self.assertEquals(3, len(cache))
+        self.assertFalse("b" in cache)
+        self.assertEquals(["a", "c", "d"], sorted(cache.keys()))
+        cache.put("e", 5)
+        self.assertFalse("c" in cache)
+
+    def test_discard_clear(self):
+        cache = LruCache(3)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.discard("a")
+        cache.discard("x")
+        self.assertEquals(["b"], cache.keys())
+        cache.clear()
+        self.assertEquals(0, len(cache))
+        cache.put("c", 3)
+        self.assertEquals(3, cache.get("c"))
+
+    def test_max_size(self):
+        try:
+            LruCache(0)
+        except AssertionError, e:
+            self.assertEquals("max_size must be > 0", str(e))
+        else:
+            self.fail()
+
+
+if __name__ == '__main__':
+    unittest.main()
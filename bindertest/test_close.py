@@ -63,6 +63,35 @@ class ConnCloseTest(unittest.TestCase):
             self.fail()
         conn.close()
 
+    def test_multiple_iterators(self):
+        "With multiple_iterators, new operations leave cursors open."
+        conn = connect(multiple_iterators=True)
+        foos = [Foo.new(foo_id=i, i1=i, s1=u"s%d" % i) for i in range(1, 4)]
+        conn.insert_many(Foo, foos)
+        # nested loops over the same table
+        pairs = []
+        for foo_a in conn.xselect(Foo, order_by=Foo.q.foo_id.ASC, batch_size=1):
+            for foo_b in conn.xselect(Foo, Foo.q.foo_id > foo_a["foo_id"], batch_size=1):
+                pairs.append((foo_a["foo_id"], foo_b["foo_id"]))
+        self.assertEquals([(1, 2), (1, 3), (2, 3)], sorted(pairs))
+        foo_iter = conn.xselect(Foo, order_by=Foo.q.foo_id.ASC, batch_size=1)
+        self.assertEquals(foos[0], foo_iter.next())
+        conn.update_by_id(Foo, foos[0])
+        self.assertEquals(foos[1], foo_iter.next())
+        # closing the connection closes all open iterators
+        foo_iter2 = conn.xselect(Foo, batch_size=1)
+        foo_iter2.next()
+        self.assertEquals(2, len(conn._open_ris))
+        conn.close()
+        self.assert_(foo_iter.closed)
+        self.assert_(foo_iter2.closed)
+        try:
+            foo_iter2.next()
+        except conn.DbError, e:
+            self.assertEquals("Result cursor closed.", str(e))
+        else:
+            self.fail()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -161,6 +161,13 @@ class BoolColTest(unittest.TestCase):
         self.assertEquals('1', colnn.to_str(True))
         self.assertEquals('', colnn.to_str(None))
 
+    def test_db_to_py(self):
+        col = BoolCol('alpha', False)
+        self.assertEquals(None, col.db_to_py(None))
+        self.assert_(col.db_to_py(1) is True)
+        self.assert_(col.db_to_py(0) is False)
+        self.assert_(col.db_to_py(True) is True)
+
 
 class UnicodeColTest(unittest.TestCase):
 
@@ -0,0 +1,120 @@
+
+import unittest
+
+from binder import *
+import datetime
+
+from bindertest.testdbconfig import connect
+from bindertest.tabledefs import Foo, Bar
+
+
+class ConnInsertManyTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.drop_table_if_exists(Bar)
+        conn.create_table(Foo)
+        conn.create_table(Bar)
+        conn.commit()
+
+    def test_manualid(self):
+        conn = connect()
+        foo1 = Foo.new(foo_id=1, i1=101, s1="alpha")
+        foo2 = Foo.new(foo_id=2, i1=23, s1="beta")
+        conn.insert_many(Foo, [foo1, foo2])
+        foo_list = conn.select(Foo, order_by=Foo.q.foo_id.ASC)
+        self.assertEquals([foo1, foo2], foo_list)
+
+    def test_auto_id(self):
+        conn = connect()
+        foo_list = [Foo.new(i1=i, s1="s%d" % i) for i in range(10)]
+        conn.insert_many(Foo, foo_list, chunk_size=3)
+        self.assertEquals(range(1, 11), [foo["foo_id"] for foo in foo_list])
+        self.assertEquals(
+            foo_list, conn.select(Foo, order_by=Foo.q.foo_id.ASC)
+            )
+        # ids continue after existing rows
+        foo_list2 = [Foo.new(i1=20), Foo.new(i1=21)]
+        conn.insert_many(Foo, foo_list2)
+        self.assertEquals([11, 12], [foo["foo_id"] for foo in foo_list2])
+
+    def test_null_patterns(self):
+        conn = connect()
+        foo1 = Foo.new(i1=1, s1="alpha")
+        foo2 = Foo.new(foo_id=20, i1=2, s1="beta")
+        foo3 = Foo.new(i1=3, s1="gamma", d1=datetime.date(2006, 6, 12))
+        foo4 = Foo.new(i1=4, s1="delta")
+        conn.insert_many(Foo, [foo1, foo2, foo3, foo4])
+        self.assertEquals(20, foo2["foo_id"])
+        self.assertEquals(foo1, conn.get(Foo, foo1["foo_id"]))
+        self.assertEquals(foo3, conn.get(Foo, foo3["foo_id"]))
+        self.assertEquals(foo4, conn.get(Foo, foo4["foo_id"]))
+        self.assertEquals(4, len(conn.select(Foo)))
+
+    def test_no_auto_id_col(self):
+        conn = connect()
+        bar1 = Bar.new(bi=5, bs="abc", bd=datetime.date(2006, 3, 21))
+        bar2 = Bar.new(bi=None, bs="xyz", bb=True)
+        conn.insert_many(Bar, [bar1, bar2])
+        self.assertEquals([bar1, bar2], conn.select(Bar, order_by=Bar.q.bs.ASC))
+
+    def test_empty(self):
+        conn = connect()
+        conn.insert_many(Foo, [])
+        self.assertEquals([], conn.select(Foo))
+
+    def test_multirow_auto_id(self):
+        conn = connect()
+        foo_list = [Foo.new(i1=i, s1="s%d" % i) for i in range(10)]
+        conn.insert_many(Foo, foo_list, chunk_size=4, multirow=True)
+        self.assertEquals(range(1, 11), [foo["foo_id"] for foo in foo_list])
+        self.assertEquals(
+            foo_list, conn.select(Foo, order_by=Foo.q.foo_id.ASC)
+            )
+
+    def test_multirow_null_patterns(self):
+        conn = connect()
+        foo1 = Foo.new(i1=1, s1="alpha")
+        foo2 = Foo.new(foo_id=20, i1=2, s1="beta")
+        foo3 = Foo.new(i1=3, s1="gamma", d1=datetime.date(2006, 6, 12))
+        foo4 = Foo.new(i1=4, s1="delta")
+        conn.insert_many(Foo, [foo1, foo2, foo3, foo4], multirow=True)
+        self.assertEquals(20, foo2["foo_id"])
+        for foo in [foo1, foo2, foo3, foo4]:
+            self.assertEquals(foo, conn.get(Foo, foo["foo_id"]))
+        self.assertEquals(4, len(conn.select(Foo)))
+
+    def test_multirow_max_params(self):
+        conn = connect()
+        bar_list = [Bar.new(bi=i, bs="b%d" % i) for i in range(500)]
+        conn.insert_many(Bar, bar_list, multirow=True)
+        self.assertEquals(bar_list, conn.select(Bar, order_by=Bar.q.bi.ASC))
+
+    def test_bad_values(self):
+        conn = connect()
+        foo1 = Foo.new(i1=1, s1="alpha")
+        foo2 = Foo.new()
+        foo2["i1"] = "xyz"
+        try:
+            conn.insert_many(Foo, [foo1, foo2])
+        except TypeError, e:
+            self.assertEquals("IntCol 'i1': int expected, got str", str(e))
+        else:
+            self.fail()
+        # nothing inserted
+        self.assertEquals(None, foo1["foo_id"])
+        self.assertEquals([], conn.select(Foo))
+
+    def test_RO(self):
+        conn = connect("test123")
+        try:
+            conn.insert_many(Foo, [Foo.new(foo_id=1, i1=101, s1="alpha")])
+        except Exception, e:
+            self.assertEquals("Connection is read only: test123", str(e))
+        else:
+            self.fail()
+
+
+if __name__ == '__main__':
+    unittest.main()
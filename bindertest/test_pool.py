@@ -0,0 +1,146 @@
+import threading
+import time
+import unittest
+
+from binder import *
+
+from bindertest.testdbconfig import connect
+from bindertest.tabledefs import Foo
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        conn.commit()
+        conn.close()
+
+    def test_get_put(self):
+        pool = ConnectionPool(connect, min_size=1, max_size=2)
+        self.assertEquals((1, 1), (pool.size, pool.idle_count()))
+        conn1 = pool.get()
+        conn2 = pool.get()
+        self.assertEquals((2, 0), (pool.size, pool.idle_count()))
+        self.assert_(conn1 is not conn2)
+        pool.put(conn2)
+        self.assertEquals((2, 1), (pool.size, pool.idle_count()))
+        # reused
+        self.assert_(pool.get() is conn2)
+        pool.put(conn1)
+        pool.put(conn2)
+        pool.close()
+        self.assertEquals((0, 0), (pool.size, pool.idle_count()))
+        self.assertFalse(conn1._is_open)
+        try:
+            pool.get()
+        except AssertionError, e:
+            self.assertEquals("ConnectionPool is closed", str(e))
+        else:
+            self.fail()
+
+    def test_bad_sizes(self):
+        try:
+            ConnectionPool(connect, min_size=3, max_size=2)
+        except AssertionError, e:
+            self.assertEquals(
+                "ConnectionPool: must have 0 <= min_size <= max_size", str(e)
+                )
+        else:
+            self.fail()
+
+    def test_conn_args(self):
+        pool = ConnectionPool(
+            connect, read_only="pooled", row_factory=ROW_TUPLE
+            )
+        conn = pool.get()
+        self.assertEquals(ROW_TUPLE, conn.row_factory)
+        try:
+            conn.insert(Foo, Foo.new(foo_id=1))
+        except Exception, e:
+            self.assertEquals("Connection is read only: pooled", str(e))
+        else:
+            self.fail()
+        pool.put(conn)
+        pool.close()
+
+    def test_put_rollback(self):
+        pool = ConnectionPool(connect, max_size=1)
+        conn = pool.get()
+        conn.insert(Foo, Foo.new(foo_id=1))
+        pool.put(conn)
+        conn = pool.get()
+        self.assertEquals([], conn.select(Foo))
+        # closed connections are not reused
+        conn.close()
+        pool.put(conn)
+        self.assertEquals((0, 0), (pool.size, pool.idle_count()))
+        self.assert_(pool.get() is not conn)
+
+    def test_health_check(self):
+        pool = ConnectionPool(connect, max_size=1)
+        conn = pool.get()
+        pool.put(conn)
+        # connection broken while idle
+        conn._dbconn.close()
+        conn2 = pool.get()
+        self.assert_(conn2 is not conn)
+        self.assertEquals([], conn2.select(Foo))
+        self.assertEquals(1, pool.size)
+
+    def test_health_check_result_cache(self):
+        # the check's transaction ends, so a snapshot reads connection
+        # (REPEATABLE READ) still stores results
+        cache = DictResultCache()
+        def connect_snapshot():
+            conn = connect(result_cache=cache)
+            conn._snapshot_reads = True
+            return conn
+        pool = ConnectionPool(connect_snapshot, max_size=1)
+        pool.put(pool.get())
+        conn = pool.get()
+        conn.select(Foo)
+        conn.select(Foo)
+        self.assertEquals((1, 1), (cache.hits, cache.misses))
+        pool.put(conn)
+        pool.close()
+
+    def test_idle_timeout(self):
+        pool = ConnectionPool(
+            connect, min_size=1, max_size=3, idle_timeout=0.05
+            )
+        conns = [pool.get(), pool.get(), pool.get()]
+        for conn in conns:
+            pool.put(conn)
+        self.assertEquals((3, 3), (pool.size, pool.idle_count()))
+        time.sleep(0.1)
+        conn = pool.get()
+        # min_size kept open, the most recently returned
+        self.assert_(conn is conns[-1])
+        self.assertEquals((1, 0), (pool.size, pool.idle_count()))
+        self.assertFalse(conns[0]._is_open)
+
+    def test_timeout(self):
+        pool = ConnectionPool(connect, max_size=1)
+        conn = pool.get()
+        try:
+            pool.get(0.01)
+        except PoolTimeout, e:
+            self.assertEquals(
+                "ConnectionPool: no connection available after 0.01 seconds",
+                str(e)
+                )
+        else:
+            self.fail()
+        # waits for a connection returned by another thread - replaced if
+        # it can't be rolled back by that thread, as for sqlite3
+        t = threading.Timer(0.05, pool.put, [conn])
+        t.start()
+        self.assertEquals([], pool.get(5).select(Foo))
+        t.join()
+        self.assertEquals(1, pool.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+
+import unittest
+
+from binder import *
+import datetime
+
+from bindertest.testdbconfig import connect, connect_postgres
+from bindertest.tabledefs import Foo
+
+
+foo1 = Foo.new(foo_id=1, i1=101, s1="alpha")
+foo2 = Foo.new(foo_id=2, i1=101, s1="beta", d1=datetime.date(2006, 6, 10))
+foo3 = Foo.new(foo_id=3, i1=102, s1="beta", d1=datetime.date(2007, 6, 10))
+
+
+class ConnPrepareTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        conn.commit()
+        conn = connect()
+        conn.insert(Foo, foo1)
+        conn.insert(Foo, foo2)
+        conn.insert(Foo, foo3)
+        conn.commit()
+
+    def test_select(self):
+        conn = connect()
+        q = conn.prepare(Foo, Foo.q.i1 == Param("i1"), Foo.q.foo_id.ASC)
+        self.assertEquals([foo1, foo2], q.select(i1=101))
+        self.assertEquals([foo3], q.select(i1=102))
+        self.assertEquals([], q.select(i1=103))
+        self.assertEquals(foo3, q.xselect(i1=102).next())
+
+    def test_select_one(self):
+        conn = connect()
+        q = conn.prepare(Foo, Foo.q.foo_id == Param("foo_id"))
+        self.assertEquals(foo1, q.select_one(foo_id=1))
+        self.assertEquals(foo2, q.select_one(foo_id=2))
+        self.assertEquals(None, q.select_one(foo_id=4))
+
+    def test_mixed_values(self):
+        conn = connect()
+        q = conn.prepare(
+            Foo, AND(Foo.q.s1 == "beta", Foo.q.d1.YEAR(Param("d")))
+            )
+        self.assertEquals([foo2], q.select(d=datetime.date(2006, 1, 1)))
+        self.assertEquals([foo3], q.select(d=datetime.date(2007, 1, 1)))
+
+    def test_no_where(self):
+        conn = connect()
+        q = conn.prepare(Foo, order_by=Foo.q.foo_id.DESC)
+        self.assertEquals([foo3, foo2, foo1], q.select())
+
+    def test_bad_values(self):
+        conn = connect()
+        q = conn.prepare(Foo, Foo.q.i1 > Param("i1"))
+        try:
+            q.select(i1="101")
+        except TypeError, e:
+            self.assertEquals("IntCol 'i1': int expected, got str", str(e))
+        else:
+            self.fail()
+        try:
+            q.select()
+        except AssertionError, e:
+            self.assertEquals("Missing value for Param 'i1'", str(e))
+        else:
+            self.fail()
+        q = conn.prepare(Foo, Foo.q.d1 == Param("d1"))
+        try:
+            q.select(d1=None)
+        except AssertionError, e:
+            self.assertEquals("Param 'd1' cannot be None", str(e))
+        else:
+            self.fail()
+
+    def test_param_without_prepare(self):
+        conn = connect()
+        try:
+            conn.select(Foo, Foo.q.i1 == Param("i1"))
+        except AssertionError, e:
+            self.assertEquals(
+                "Param 'i1' can only be used with prepare()", str(e)
+                )
+        else:
+            self.fail()
+
+    def test_server_side(self):
+        conn = connect()
+        if connect != connect_postgres:
+            try:
+                conn.prepare(Foo, Foo.q.i1 == Param("i1"), server_side=True)
+            except AssertionError, e:
+                self.assertEquals(
+                    "prepare(): server_side is only supported for Postgres",
+                    str(e)
+                    )
+            else:
+                self.fail()
+            return
+        q = conn.prepare(
+            Foo, Foo.q.i1 == Param("i1"), Foo.q.foo_id.ASC, server_side=True
+            )
+        self.assertEquals([foo1, foo2], q.select(i1=101))
+        self.assertEquals([foo3], q.select(i1=102))
+        q.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,287 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from binder import *
+from binder import db_postgres
+
+from bindertest.testdbconfig import connect as connect_db
+from bindertest.tabledefs import Foo, Bar
+
+
+def connect(result_cache):
+    return connect_db(result_cache=result_cache)
+
+
+class FetchedCursor:
+
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchmany(self, size):
+        rows = self._rows[:size]
+        self._rows = self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect(None)
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        self.foo1 = Foo.new(foo_id=1, i1=101, s1=u"alpha")
+        self.foo2 = Foo.new(foo_id=2, i1=23, s1=u"beta")
+        conn.insert_many(Foo, [self.foo1, self.foo2])
+        conn.drop_table_if_exists(Bar)
+        conn.create_table(Bar)
+        conn.commit()
+
+    def test_select(self):
+        cache = DictResultCache()
+        conn = connect(cache)
+        self.assertEquals(cache, conn.result_cache)
+        self.assertEquals([self.foo1], conn.select(Foo, Foo.q.i1 == 101))
+        self.assertEquals((0, 1), (cache.hits, cache.misses))
+        foos = conn.select(Foo, Foo.q.i1 == 101)
+        self.assertEquals([self.foo1], foos)
+        self.assertEquals((1, 1), (cache.hits, cache.misses))
+        # new row objects each time
+        foos[0]["i1"] = 5
+        self.assertEquals([self.foo1], conn.select(Foo, Foo.q.i1 == 101))
+        # different values, different entry
+        self.assertEquals([self.foo2], conn.select(Foo, Foo.q.i1 == 23))
+        self.assertEquals((2, 2), (cache.hits, cache.misses))
+        # row types and cols
+        self.assertEquals(
+            [(1, 101)],
+            conn.select(
+                Foo, Foo.q.i1 == 101, row_factory=ROW_TUPLE,
+                cols=[Foo.q.foo_id, Foo.q.i1]
+                )
+            )
+        self.assertEquals(
+            [u"alpha"],
+            [r.s1 for r in conn.select(Foo, Foo.q.i1 == 101, row_factory=ROW_RECORD)]
+            )
+        self.assertEquals((3, 3), (cache.hits, cache.misses))
+
+    def test_select_distinct(self):
+        cache = DictResultCache()
+        conn = connect(cache)
+        self.assertEquals(
+            [23, 101], conn.select_distinct(Foo, Foo.q.i1, order_by=Foo.q.i1.ASC)
+            )
+        self.assertEquals(
+            [23, 101], conn.select_distinct(Foo, Foo.q.i1, order_by=Foo.q.i1.ASC)
+            )
+        self.assertEquals((1, 1), (cache.hits, cache.misses))
+
+    def test_ttl(self):
+        cache = DictResultCache(ttl=0.05)
+        conn = connect(cache)
+        conn.select(Foo)
+        conn.select(Foo)
+        self.assertEquals((1, 1), (cache.hits, cache.misses))
+        time.sleep(0.1)
+        conn.select(Foo)
+        self.assertEquals((1, 2), (cache.hits, cache.misses))
+
+    def test_tables(self):
+        cache = DictResultCache(tables=[Bar])
+        conn = connect(cache)
+        conn.select(Foo)
+        conn.select(Foo)
+        self.assertEquals((0, 0), (cache.hits, cache.misses))
+        conn.select(Bar)
+        conn.select(Bar)
+        self.assertEquals((1, 1), (cache.hits, cache.misses))
+
+    def test_write_invalidates(self):
+        cache = DictResultCache()
+        conn1 = connect(cache)
+        conn2 = connect(cache)
+        self.assertEquals(2, len(conn1.select(Foo)))
+        conn1.select(Bar)
+        foo3 = Foo.new(foo_id=3, i1=7, s1=u"gamma")
+        conn2.insert(Foo, foo3)
+        # cache not used for Foo by the writer until commit
+        self.assertEquals(3, len(conn2.select(Foo)))
+        self.assertEquals((0, 2), (cache.hits, cache.misses))
+        conn2.commit()
+        self.assertEquals(3, len(conn1.select(Foo)))
+        self.assertEquals(3, len(conn2.select(Foo)))
+        self.assertEquals((1, 3), (cache.hits, cache.misses))
+        # other tables still cached
+        conn1.select(Bar)
+        self.assertEquals((2, 3), (cache.hits, cache.misses))
+        # update, delete
+        foo3["i1"] = 8
+        conn1.update_by_id(Foo, foo3)
+        conn1.commit()
+        self.assertEquals([8], conn2.select_distinct(Foo, Foo.q.i1, Foo.q.foo_id == 3))
+        conn1.delete(Foo, Foo.q.foo_id == 3)
+        conn1.commit()
+        self.assertEquals(2, len(conn2.select(Foo)))
+
+    def test_rollback(self):
+        cache = DictResultCache()
+        conn = connect(cache)
+        conn.select(Foo)
+        conn.delete_by_id(Foo, 1)
+        self.assertEquals(1, len(conn.select(Foo)))
+        conn.rollback()
+        self.assertEquals(2, len(conn.select(Foo)))
+        self.assertEquals(2, len(conn.select(Foo)))
+        self.assertEquals((1, 2), (cache.hits, cache.misses))
+
+    def test_db_id(self):
+        # same SQL on different databases doesn't share results - the
+        # second database is always an SQLite file
+        fd, dbfile2 = tempfile.mkstemp(".db3")
+        os.close(fd)
+        try:
+            cache = DictResultCache()
+            conn1 = connect(cache)
+            conn2 = SqliteConnection(dbfile2, result_cache=cache)
+            conn2.create_table(Foo)
+            conn2.commit()
+            self.assertEquals(2, len(conn1.select(Foo)))
+            self.assertEquals([], conn2.select(Foo))
+            conn2.insert(Foo, Foo.new(foo_id=5, i1=5, s1=u"e"))
+            conn2.commit()
+            self.assertEquals(2, len(conn1.select(Foo)))
+            self.assertEquals((1, 2), (cache.hits, cache.misses))
+            conn2.close()
+        finally:
+            os.remove(dbfile2)
+
+    def test_postgres_db_id(self):
+        # the password isn't kept in the id, which SqliteResultCache writes
+        # to its file
+        class DbConn:
+            dsn = "host=h password='se cret' dbname=d"
+        self.assertEquals("postgres:host=h dbname=d", db_postgres._db_id(DbConn()))
+        DbConn.dsn = "postgresql://u:secret@h/d"
+        self.assertEquals("postgres:postgresql://u@h/d", db_postgres._db_id(DbConn()))
+
+    def test_write_during_query(self):
+        # a write committed after the query read its rows leaves them stale
+        cache = DictResultCache()
+        conn1 = connect(cache)
+        conn2 = connect(cache)
+        execute = conn1._execute
+        def execute_then_write(sql, values=[], stream=False):
+            cursor = execute(sql, values, stream)
+            rows = cursor.fetchall()
+            conn2.update_by_id(Foo, Foo.new(foo_id=1, i1=102, s1=u"alpha"))
+            conn2.commit()
+            return FetchedCursor(rows)
+        conn1._execute = execute_then_write
+        self.assertEquals(101, conn1.select(Foo, Foo.q.foo_id == 1)[0]["i1"])
+        conn1._execute = execute
+        self.assertEquals(102, conn1.select(Foo, Foo.q.foo_id == 1)[0]["i1"])
+        self.assertEquals((0, 2), (cache.hits, cache.misses))
+
+    def test_snapshot_reads(self):
+        cache = DictResultCache()
+        conn1 = connect(cache)
+        conn2 = connect(cache)
+        # as for REPEATABLE READ
+        conn1._snapshot_reads = True
+        conn1.select(Bar)
+        conn2.insert(Foo, Foo.new(foo_id=3, i1=7, s1=u"gamma"))
+        conn2.commit()
+        # Foo invalidated by conn2 since conn1's first statement, so its
+        # snapshot may be older than conn2's write - not stored
+        conn1.select(Foo)
+        conn1.select(Foo)
+        self.assertEquals((0, 3), (cache.hits, cache.misses))
+        # Bar gens read before the snapshot still current
+        conn1.select(Bar)
+        self.assertEquals((1, 3), (cache.hits, cache.misses))
+        conn1.commit()
+        self.assertEquals(3, len(conn1.select(Foo)))
+        self.assertEquals(3, len(conn1.select(Foo)))
+        self.assertEquals((2, 4), (cache.hits, cache.misses))
+
+    def test_sqlite_cache(self):
+        fd, cache_file = tempfile.mkstemp(".db3")
+        os.close(fd)
+        try:
+            cache1 = SqliteResultCache(cache_file)
+            cache2 = SqliteResultCache(cache_file)
+            conn1 = connect(cache1)
+            conn2 = connect(cache2)
+            self.assertEquals([self.foo1], conn1.select(Foo, Foo.q.foo_id == 1))
+            # shared through the file
+            self.assertEquals([self.foo1], conn2.select(Foo, Foo.q.foo_id == 1))
+            self.assertEquals((0, 1), (cache1.hits, cache1.misses))
+            self.assertEquals((1, 0), (cache2.hits, cache2.misses))
+            # invalidated through the file
+            conn1.update_by_id(Foo, Foo.new(foo_id=1, i1=102, s1=u"alpha"))
+            conn1.commit()
+            self.assertEquals(102, conn2.select(Foo, Foo.q.foo_id == 1)[0]["i1"])
+            self.assertEquals((1, 1), (cache2.hits, cache2.misses))
+            cache1.clear()
+            conn2.select(Foo, Foo.q.foo_id == 1)
+            self.assertEquals((1, 2), (cache2.hits, cache2.misses))
+            cache1.close()
+            cache2.close()
+        finally:
+            os.remove(cache_file)
+
+
+    def test_sqlite_cache_threads(self):
+        # the cache's sqlite3 connection is used from the worker thread
+        fd, cache_file = tempfile.mkstemp(".db3")
+        os.close(fd)
+        try:
+            cache = SqliteResultCache(cache_file)
+            conn = AsyncConnection(connect_db, result_cache=cache)
+            self.assertEquals(2, len(conn.select(Foo).result()))
+            self.assertEquals(2, len(conn.select(Foo).result()))
+            self.assertEquals((1, 1), (cache.hits, cache.misses))
+            conn.close().result()
+            cache.close()
+        finally:
+            os.remove(cache_file)
+
+    def test_dict_cache_threads(self):
+        cache = DictResultCache(max_size=8)
+        errors = []
+        def run(n):
+            try:
+                for i in range(2000):
+                    key = ("db", "sql", (n, i % 20))
+                    gens = cache.gens("db", ["foo"])
+                    if cache.get(key, gens) is None:
+                        cache.put(key, [i], gens)
+                    if i % 50 == 0:
+                        cache.invalidate("db", "foo")
+            except Exception, e:
+                errors.append(e)
+        check_interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            threads = [threading.Thread(target=run, args=(n,)) for n in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setcheckinterval(check_interval)
+        self.assertEquals([], errors)
+        self.assertEquals(8, len(cache._entries))
+        self.assertEquals(8000, cache.hits + cache.misses)
+        self.assertEquals(160, cache._gens["db:foo"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+
+from datetime import date, datetime
+
+from binder import *
+
+from bindertest.testdbconfig import connect as connect_db
+from bindertest.tabledefs import Foo, Bar
+
+
+def connect(row_cache_size=10):
+    return connect_db(row_cache_size=row_cache_size)
+
+
+class ConnRowCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        self.foo1 = Foo.new(foo_id=1, i1=101, s1=u"alpha", d1=date(2006, 5, 30))
+        self.foo2 = Foo.new(foo_id=2, i1=23, s1=u"beta")
+        conn.insert_many(Foo, [self.foo1, self.foo2])
+        conn.commit()
+
+    def test_disabled(self):
+        conn = connect(0)
+        self.assertEquals(None, conn.row_cache)
+        self.assertEquals(self.foo1, conn.get(Foo, 1))
+
+    def test_get(self):
+        conn = connect()
+        row_cache = conn.row_cache
+        self.assertEquals(self.foo1, conn.get(Foo, 1))
+        self.assertEquals((0, 1), (row_cache.hits, row_cache.misses))
+        foo = conn.get(Foo, 1)
+        self.assertEquals(self.foo1, foo)
+        self.assertEquals((1, 1), (row_cache.hits, row_cache.misses))
+        # new row object each time
+        foo["i1"] = 5
+        self.assertEquals(self.foo1, conn.get(Foo, 1))
+        # row types
+        self.assertEquals(
+            (1, 101, u"alpha", date(2006, 5, 30)), conn.get(Foo, 1, ROW_TUPLE)
+            )
+        self.assertEquals(101, conn.get(Foo, 1, ROW_RECORD).i1)
+        self.assertEquals((4, 1), (row_cache.hits, row_cache.misses))
+        # projection bypasses the cache
+        self.assertEquals({"i1": 101}, conn.get(Foo, 1, cols=[Foo.q.i1]))
+        self.assertEquals((4, 1), (row_cache.hits, row_cache.misses))
+        # not found is not cached
+        self.assertEquals(None, conn.get(Foo, 3))
+        self.assertEquals(None, conn.get(Foo, 3))
+        self.assertEquals((4, 3), (row_cache.hits, row_cache.misses))
+
+    def test_get_many(self):
+        conn = connect()
+        row_cache = conn.row_cache
+        conn.get(Foo, 2)
+        self.assertEquals(
+            [self.foo1, self.foo2, None, self.foo1],
+            conn.get_many(Foo, [1, 2, 3, 1])
+            )
+        self.assertEquals((1, 3), (row_cache.hits, row_cache.misses))
+        self.assertEquals(self.foo1, conn.get(Foo, 1))
+        self.assertEquals((2, 3), (row_cache.hits, row_cache.misses))
+
+    def test_write_through(self):
+        conn = connect()
+        row_cache = conn.row_cache
+        # insert
+        foo3 = Foo.new(i1=3, s1="gamma")
+        conn.insert(Foo, foo3)
+        self.assertEquals(foo3, conn.get(Foo, 3))
+        self.assertEquals((1, 0), (row_cache.hits, row_cache.misses))
+        self.assertEquals(type(u""), type(conn.get(Foo, 3)["s1"]))
+        # update_by_id
+        conn.get(Foo, 1)
+        foo1 = Foo.new(foo_id=1, i1=102, s1=u"alpha")
+        self.assertEquals(True, conn.update_by_id(Foo, foo1))
+        self.assertEquals(foo1, conn.get(Foo, 1))
+        # delete_by_id
+        self.assertEquals(True, conn.delete_by_id(Foo, 1))
+        self.assertEquals(None, conn.get(Foo, 1))
+        # datetime values are cached as stored
+        Qux = Table("qux", AutoIdCol("qux_id"), DateTimeUTCCol("dt"))
+        conn.drop_table_if_exists(Qux)
+        conn.create_table(Qux)
+        qux = Qux.new(dt=datetime(2006, 5, 30, 1, 2, 3, 456))
+        conn.insert(Qux, qux)
+        self.assertEquals(
+            datetime(2006, 5, 30, 1, 2, 3), conn.get(Qux, 1)["dt"]
+            )
+        conn.drop_table(Qux)
+
+    def test_invalidate(self):
+        conn = connect()
+        row_cache = conn.row_cache
+        conn.get(Foo, 1)
+        conn.get(Foo, 2)
+        self.assertEquals(2, len(row_cache))
+        conn.update(Foo, Foo.new(foo_id=1, i1=7), Foo.q.foo_id == 1)
+        self.assertEquals(0, len(row_cache))
+        self.assertEquals(7, conn.get(Foo, 1)["i1"])
+        conn.delete(Foo, Foo.q.foo_id == 1)
+        self.assertEquals(None, conn.get(Foo, 1))
+        # other tables not affected
+        conn.get(Foo, 2)
+        conn.drop_table_if_exists(Bar)
+        conn.create_table(Bar)
+        conn.delete(Bar)
+        self.assertEquals(1, len(row_cache))
+
+    def test_rollback(self):
+        conn = connect()
+        conn.update_by_id(Foo, Foo.new(foo_id=1, i1=7))
+        self.assertEquals(7, conn.get(Foo, 1)["i1"])
+        conn.rollback()
+        self.assertEquals(0, len(conn.row_cache))
+        self.assertEquals(101, conn.get(Foo, 1)["i1"])
+
+    def test_lru(self):
+        conn = connect(2)
+        conn.insert_many(Foo, [Foo.new(i1=i) for i in range(3, 6)])
+        for row_id in [1, 2, 3, 1]:
+            conn.get(Foo, row_id)
+        self.assertEquals(
+            [(Foo, 1), (Foo, 3)], sorted(conn.row_cache.keys())
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
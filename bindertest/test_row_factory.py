@@ -0,0 +1,123 @@
+import unittest
+
+from datetime import date
+
+from binder import *
+
+from bindertest.testdbconfig import connect, connect_sqlite, DBFILE
+from bindertest.tabledefs import Foo
+
+
+class ConnRowFactoryTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        self.foo1 = Foo.new(foo_id=1, i1=101, s1=u"alpha", d1=date(2006, 5, 30))
+        self.foo2 = Foo.new(foo_id=2, i1=23, s1=u"beta")
+        conn.insert(Foo, self.foo1)
+        conn.insert(Foo, self.foo2)
+        conn.commit()
+
+    def test_select_row_factory(self):
+        conn = connect()
+        order_by = Foo.q.foo_id.ASC
+        self.assertEquals(
+            [self.foo1, self.foo2], conn.select(Foo, order_by=order_by)
+            )
+        foo_list = conn.select(Foo, order_by=order_by, row_factory=ROW_TUPLE)
+        self.assertEquals(
+            [(1, 101, u"alpha", date(2006, 5, 30)), (2, 23, u"beta", None)],
+            foo_list
+            )
+        self.assertEquals(tuple, type(foo_list[0]))
+        foo_list = conn.select(Foo, order_by=order_by, row_factory=ROW_RECORD)
+        self.assertEquals(Foo.record_class, type(foo_list[0]))
+        self.assertEquals(101, foo_list[0].i1)
+        self.assertEquals(u"beta", foo_list[1]["s1"])
+        foo_list = list(conn.xselect(
+            Foo, order_by=order_by, row_factory=ROW_NAMEDTUPLE
+            ))
+        self.assertEquals(date(2006, 5, 30), foo_list[0].d1)
+        self.assertEquals((2, 23, u"beta", None), foo_list[1])
+        foo = conn.get(Foo, 2, row_factory=ROW_TUPLE)
+        self.assertEquals((2, 23, u"beta", None), foo)
+        foo = conn.select_one(Foo, Foo.q.i1 == 101, row_factory=ROW_RECORD)
+        self.assertEquals(u"alpha", foo.s1)
+
+    def test_connection_row_factory(self):
+        conn = SqliteConnection(DBFILE, row_factory=ROW_TUPLE)
+        self.assertEquals(
+            [(1, 101, u"alpha", date(2006, 5, 30))],
+            conn.select(Foo, Foo.q.foo_id == 1)
+            )
+        # per query override
+        self.assertEquals(
+            [self.foo1], conn.select(Foo, Foo.q.foo_id == 1, row_factory=ROW_DICT)
+            )
+        # distinct unaffected
+        self.assertEquals(
+            [23, 101], conn.select_distinct(Foo, Foo.q.i1, order_by=Foo.q.i1.ASC)
+            )
+        # prepared query
+        p = conn.prepare(Foo, Foo.q.i1 == Param("i1"))
+        self.assertEquals((2, 23, u"beta", None), p.select_one(i1=23))
+        try:
+            SqliteConnection(DBFILE, row_factory="list")
+        except AssertionError, e:
+            self.assertEquals("Unknown row_factory: list", str(e))
+        else:
+            self.fail()
+
+    def test_record_update(self):
+        conn = connect()
+        foo = conn.get(Foo, 1, row_factory=ROW_RECORD)
+        foo.i1 = 102
+        self.assertEquals(True, conn.update_by_id(Foo, foo))
+        conn.update(Foo, foo, Foo.q.foo_id == 1)
+        foo = conn.get(Foo, 1)
+        self.assertEquals(102, foo["i1"])
+
+    def test_insert_record(self):
+        conn = connect()
+        foo = Foo.new_record(i1=3, s1=u"gamma")
+        conn.insert(Foo, foo)
+        self.assertEquals(3, foo.foo_id)
+        foo_list = [Foo.new_record(i1=4), Foo.new_record(i1=5)]
+        conn.insert_many(Foo, foo_list)
+        self.assertEquals([4, 5], [foo.foo_id for foo in foo_list])
+
+    def test_tuple_rows(self):
+        conn = connect()
+        conn.insert(Foo, (3, 3, u"gamma", None))
+        conn.insert_many(Foo, [(4, 4, u"", None), (5, 5, u"", None)])
+        foo = conn.get(Foo, 4, row_factory=ROW_NAMEDTUPLE)
+        self.assertEquals(4, foo.i1)
+        self.assertEquals(True, conn.update_by_id(Foo, foo._replace(i1=40)))
+        self.assertEquals(40, conn.get(Foo, 4)["i1"])
+        self.assertEquals([3, 40, 5], [
+            foo.i1 for foo in conn.select(
+                Foo, Foo.q.foo_id > 2, Foo.q.foo_id.ASC, row_factory=ROW_RECORD
+                )
+            ])
+        try:
+            conn.insert(Foo, (None, 6, u"", None))
+        except AssertionError, e:
+            self.assertEquals(
+                "insert(): cannot use None for AutoIdCol in tuple row", str(e)
+                )
+        else:
+            self.fail()
+        try:
+            conn.insert_many(Foo, [(6, 6, u"")])
+        except AssertionError, e:
+            self.assertEquals(
+                "insert_many(): expected 4 values in tuple row, got 3", str(e)
+                )
+        else:
+            self.fail()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -245,6 +245,64 @@ class ConnSelectTest(unittest.TestCase):
         )
         self.assertEquals([foo1, foo4], foo_list)
 
+    def test_where_nested(self):
+        conn = connect()
+        foo1 = Foo.new(foo_id=1, i1=101, s1="alpha")
+        foo2 = Foo.new(foo_id=2, i1=23, s1="beta")
+        foo3 = Foo.new(foo_id=3, i1=42, s1="alpha", d1=datetime.date(2006, 6, 10))
+        foo4 = Foo.new(foo_id=4, i1=84, s1="gamma")
+        conn.insert_many(Foo, [foo1, foo2, foo3, foo4])
+        # a AND (b OR c)
+        foo_list = conn.select(
+            Foo,
+            AND(Foo.q.s1 == 'alpha', OR(Foo.q.i1 == 42, Foo.q.i1 == 23)),
+            Foo.q.foo_id.ASC
+            )
+        self.assertEquals([foo3], foo_list)
+        # (a AND b) OR c
+        foo_list = conn.select(
+            Foo,
+            OR(AND(Foo.q.s1 == 'alpha', Foo.q.d1 == None), Foo.q.i1 < 30),
+            Foo.q.foo_id.ASC
+            )
+        self.assertEquals([foo1, foo2], foo_list)
+        # NOT
+        foo_list = conn.select(
+            Foo,
+            NOT(OR(Foo.q.s1 == 'alpha', Foo.q.foo_id.IN([2]))),
+            Foo.q.foo_id.ASC
+            )
+        self.assertEquals([foo4], foo_list)
+        foo_list = conn.select(
+            Foo,
+            AND(NOT(Foo.q.d1 == None), OR(Foo.q.i1 > 100, Foo.q.i1 < 50)),
+            Foo.q.foo_id.ASC
+            )
+        self.assertEquals([foo3], foo_list)
+
+    def test_sql_cache(self):
+        conn = connect()
+        foo1 = Foo.new(foo_id=1, i1=101, s1="alpha")
+        foo2 = Foo.new(foo_id=2, i1=23, s1="beta")
+        conn.insert(Foo, foo1)
+        conn.insert(Foo, foo2)
+        hits, misses = conn.sql_cache.hits, conn.sql_cache.misses
+        self.assertEquals([foo1], conn.select(Foo, Foo.q.i1 == 101))
+        self.assertEquals([foo2], conn.select(Foo, Foo.q.i1 == 23))
+        self.assertEquals([], conn.select(Foo, Foo.q.i1 == 42))
+        self.assertEquals(hits + 2, conn.sql_cache.hits)
+        self.assertEquals(misses + 1, conn.sql_cache.misses)
+
+    def test_sql_cache_disabled(self):
+        if connect != connect_sqlite:
+            return
+        from bindertest.testdbconfig import DBFILE
+        conn = SqliteConnection(DBFILE, sql_cache_size=0)
+        self.assertEquals(None, conn.sql_cache)
+        foo1 = Foo.new(foo_id=1, i1=101, s1="alpha")
+        conn.insert(Foo, foo1)
+        self.assertEquals([foo1], conn.select(Foo, Foo.q.i1 == 101))
+
 
     # select sum(...) ...
 
@@ -0,0 +1,113 @@
+
+import unittest
+
+from binder import *
+
+from bindertest.testdbconfig import connect
+from bindertest.tabledefs import Foo
+
+
+class ConnSelectBatchesTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        self.foo_list = [
+            Foo.new(foo_id=i, i1=i * 10, s1="s%d" % i) for i in range(1, 11)
+            ]
+        conn.insert_many(Foo, self.foo_list)
+        conn.commit()
+
+    def test_xselect_batch_size(self):
+        conn = connect()
+        for batch_size in [1, 3, 10, 100]:
+            foo_iter = conn.xselect(
+                Foo, order_by=Foo.q.foo_id.ASC, batch_size=batch_size
+                )
+            self.assertEquals(self.foo_list, list(foo_iter))
+            try:
+                foo_iter.next()
+            except StopIteration:
+                pass
+            else:
+                self.fail()
+
+    def test_xselect_batches(self):
+        conn = connect()
+        batches = list(
+            conn.xselect_batches(Foo, order_by=Foo.q.foo_id.ASC, batch_size=4)
+            )
+        self.assertEquals([4, 4, 2], [len(batch) for batch in batches])
+        self.assertEquals(self.foo_list, batches[0] + batches[1] + batches[2])
+        batches = list(
+            conn.xselect_batches(Foo, Foo.q.foo_id > 10, batch_size=4)
+            )
+        self.assertEquals([], batches)
+
+    def test_next_then_batches(self):
+        conn = connect()
+        foo_iter = conn.xselect(Foo, order_by=Foo.q.foo_id.ASC, batch_size=4)
+        self.assertEquals(self.foo_list[0], foo_iter.next())
+        self.assertEquals(self.foo_list[1:4], foo_iter.next_batch())
+        self.assertEquals(self.foo_list[4:8], foo_iter.next_batch())
+        self.assertEquals(self.foo_list[8], foo_iter.next())
+        self.assertEquals(self.foo_list[9:], list(foo_iter.batches())[0])
+        self.assertEquals([], foo_iter.next_batch())
+
+    def test_xselect_distinct_batch_size(self):
+        conn = connect()
+        i1_list = list(conn.xselect_distinct(
+            Foo, Foo.q.i1, order_by=Foo.q.i1.DESC, batch_size=3
+            ))
+        self.assertEquals(range(100, 0, -10), i1_list)
+
+    def test_stream(self):
+        conn = connect()
+        foo_iter = conn.xselect(
+            Foo, order_by=Foo.q.foo_id.ASC, batch_size=3, stream=True
+            )
+        self.assertEquals(self.foo_list, list(foo_iter))
+        batches = list(conn.xselect_batches(
+            Foo, Foo.q.foo_id > 5, Foo.q.foo_id.ASC, batch_size=3, stream=True
+            ))
+        self.assertEquals([3, 2], [len(batch) for batch in batches])
+        i1_list = list(conn.xselect_distinct(
+            Foo, Foo.q.i1, order_by=Foo.q.i1.ASC, stream=True
+            ))
+        self.assertEquals(range(10, 110, 10), i1_list)
+        # new operation closes the streaming cursor
+        foo_iter = conn.xselect(Foo, stream=True)
+        foo_iter.next()
+        conn.insert(Foo, Foo.new(foo_id=11))
+        try:
+            foo_iter.next()
+        except conn.DbError, e:
+            self.assertEquals("Result cursor closed.", str(e))
+        else:
+            self.fail()
+
+    def test_cursor_closed_at_end(self):
+        conn = connect()
+        foo_iter = conn.xselect(Foo, stream=True, batch_size=4)
+        cursor = foo_iter.cursor
+        self.assertEquals(10, len(list(foo_iter)))
+        self.assertEquals(None, foo_iter.cursor)
+        self.assertRaises(conn.DbError, cursor.fetchone)
+        conn.close()
+
+    def test_batches_close(self):
+        conn = connect()
+        batches = conn.xselect_batches(Foo, order_by=Foo.q.foo_id.ASC, batch_size=4)
+        self.assertEquals(self.foo_list[:4], batches.next())
+        conn.close()
+        try:
+            batches.next()
+        except conn.DbError, e:
+            self.assertEquals("Result cursor closed.", str(e))
+        else:
+            self.fail()
+
+
+if __name__ == '__main__':
+    unittest.main()
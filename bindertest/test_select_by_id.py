@@ -79,6 +79,42 @@ class ConnSelectByIdTest(unittest.TestCase):
         else:
             self.fail()
 
+    def test_get_many(self):
+        conn = connect()
+        self.assertEquals(
+            [foo2, None, foo1, foo2], conn.get_many(Foo, [2, 3, 1, 2])
+            )
+        self.assertEquals([], conn.get_many(Foo, []))
+        self.assertEquals(
+            [(u"beta", 2), None],
+            conn.get_many(Foo, [2, 5], ROW_TUPLE, [Foo.q.s1, Foo.q.foo_id])
+            )
+        # more ids than fit in one statement
+        conn.insert_many(Foo, [Foo.new(s1=u"x") for i in range(1500)])
+        row_ids = range(1600, 0, -1)
+        foo_list = conn.get_many(Foo, row_ids, ROW_RECORD)
+        self.assertEquals(
+            [None] * 98 + range(1502, 0, -1),
+            [foo and foo.foo_id for foo in foo_list]
+            )
+
+    def test_get_many_bad_values(self):
+        conn = connect()
+        for table, row_ids, cols, msg in [
+                (Bar, [1], None,
+                    "get_many(): table 'bar' does not have AutoIdCol"),
+                (Foo, [1, None], None,
+                    "get_many(): cannot use None for AutoIdCol"),
+                (Foo, [1], [Foo.q.s1],
+                    "get_many(): cols must include column 'foo_id'"),
+                ]:
+            try:
+                conn.get_many(table, row_ids, cols=cols)
+            except AssertionError, e:
+                self.assertEquals(msg, str(e))
+            else:
+                self.fail()
+
 
 
 
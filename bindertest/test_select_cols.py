@@ -0,0 +1,64 @@
+import unittest
+
+from datetime import date
+
+from binder import *
+
+from bindertest.testdbconfig import connect
+from bindertest.tabledefs import Foo
+
+
+class ConnSelectColsTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        conn.insert(Foo, Foo.new(foo_id=1, i1=101, s1=u"alpha", d1=date(2006, 5, 30)))
+        conn.insert(Foo, Foo.new(foo_id=2, i1=23, s1=u"beta"))
+        conn.commit()
+
+    def test_select(self):
+        conn = connect()
+        cols = [Foo.q.foo_id, Foo.q.d1]
+        self.assertEquals(
+            [{"foo_id": 1, "d1": date(2006, 5, 30)}, {"foo_id": 2, "d1": None}],
+            conn.select(Foo, order_by=Foo.q.foo_id.ASC, cols=cols)
+            )
+        self.assertEquals(
+            [(u"beta", 23)],
+            conn.select(
+                Foo, Foo.q.foo_id == 2, row_factory=ROW_TUPLE,
+                cols=[Foo.q.s1, Foo.q.i1]
+                )
+            )
+        foo_list = list(conn.xselect(
+            Foo, order_by=Foo.q.foo_id.DESC, row_factory=ROW_RECORD,
+            cols=[Foo.q.i1]
+            ))
+        self.assertEquals([23, 101], [foo.i1 for foo in foo_list])
+        self.assertEquals(["i1"], foo_list[0].keys())
+        foo = conn.select_one(
+            Foo, Foo.q.i1 == 101, row_factory=ROW_NAMEDTUPLE, cols=cols
+            )
+        self.assertEquals((1, date(2006, 5, 30)), foo)
+        self.assertEquals(date(2006, 5, 30), foo.d1)
+        self.assertEquals({"s1": u"beta"}, conn.get(Foo, 2, cols=[Foo.q.s1]))
+
+    def test_prepare(self):
+        conn = connect()
+        p = conn.prepare(Foo, Foo.q.i1 == Param("i1"), cols=[Foo.q.s1])
+        self.assertEquals([{"s1": u"alpha"}], p.select(i1=101))
+
+    def test_bad_cols(self):
+        conn = connect()
+        try:
+            conn.select(Foo, cols=[Foo.q.i1, Foo.q.i1])
+        except AssertionError, e:
+            self.assertEquals("select(): duplicate column 'i1'", str(e))
+        else:
+            self.fail()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+
+from binder import *
+
+from bindertest.testdbconfig import connect
+from bindertest.tabledefs import Foo, Bar
+
+
+class ConnSelectInTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        self.foo_list = [
+            Foo.new(foo_id=i, i1=i % 7, s1="s%d" % (i % 10)) for i in range(1, 2601)
+            ]
+        conn.insert_many(Foo, self.foo_list)
+        conn.commit()
+
+    def test_in(self):
+        conn = connect()
+        foo_list = conn.select(
+            Foo, Foo.q.foo_id.IN([5, 3, 1000, 7]), Foo.q.foo_id.ASC
+            )
+        self.assertEquals([3, 5, 7, 1000], [foo["foo_id"] for foo in foo_list])
+        foo_list = conn.select(
+            Foo, AND(Foo.q.i1.NOT_IN([0, 1, 2, 3, 4, 5]), Foo.q.foo_id < 30),
+            Foo.q.foo_id.ASC
+            )
+        self.assertEquals([6, 13, 20, 27], [foo["foo_id"] for foo in foo_list])
+        self.assertEquals(
+            [u"s1", u"s2"],
+            conn.select_distinct(
+                Foo, Foo.q.s1, Foo.q.s1.IN([u"s2", u"s1", u"x"]), Foo.q.s1.ASC
+                )
+            )
+
+    def test_in_split(self):
+        conn = connect()
+        ids = range(2600, 0, -2) + [1, 2, 2601]
+        # no order_by - any order
+        foo_list = conn.select(Foo, Foo.q.foo_id.IN(ids))
+        self.assertEquals(
+            sorted(set(ids) - set([2601])),
+            sorted([foo["foo_id"] for foo in foo_list])
+            )
+        # merged in order
+        foo_list = conn.select(Foo, Foo.q.foo_id.IN(ids), Foo.q.foo_id.DESC)
+        self.assertEquals(
+            sorted(set(ids) - set([2601]), reverse=True),
+            [foo["foo_id"] for foo in foo_list]
+            )
+        where = AND(Foo.q.foo_id.IN(ids), Foo.q.i1 == 3)
+        expected = [
+            foo for foo in self.foo_list
+                if foo["foo_id"] in ids and foo["i1"] == 3
+            ]
+        self.assertEquals(
+            expected[5:15],
+            conn.select(Foo, where, Foo.q.foo_id.ASC, limit=10, offset=5)
+            )
+        # collate_nocase / row factory / projection
+        foo_list = conn.select(
+            Foo, Foo.q.foo_id.IN(ids), Foo.q.s1.ASC, row_factory=ROW_TUPLE,
+            cols=[Foo.q.s1]
+            )
+        self.assertEquals(
+            sorted([(foo["s1"],) for foo in self.foo_list if foo["foo_id"] in ids]),
+            foo_list
+            )
+        self.assertEquals(
+            len(set(ids)) - 1,
+            len(list(conn.xselect(Foo, Foo.q.foo_id.IN(ids))))
+            )
+
+    def test_in_split_update_delete(self):
+        conn = connect()
+        conn.drop_table_if_exists(Bar)
+        conn.create_table(Bar)
+        conn.insert_many(Bar, [Bar.new(bi=i, bs=u"a") for i in range(2500)])
+        values = range(2000)
+        self.assertEquals(
+            2000, conn.update(Bar, Bar.new(bi=1, bs=u"b"), Bar.q.bi.IN(values))
+            )
+        self.assertEquals(2000, conn.count(Bar, Bar.q.bs == u"b"))
+        ids = range(1, 2001)
+        self.assertEquals(
+            1999, conn.delete(Foo, AND(Foo.q.foo_id.IN(ids), Foo.q.foo_id > 1))
+            )
+        self.assertEquals(601, conn.count(Foo))
+
+    def test_in_split_update_in_col(self):
+        # rows set to a value in a later chunk are not updated again
+        conn = connect()
+        conn.drop_table_if_exists(Bar)
+        conn.create_table(Bar)
+        conn.insert_many(Bar, [Bar.new(bi=i, bs=u"a") for i in range(2500)])
+        self.assertEquals(
+            2500,
+            conn.update(Bar, Bar.new(bi=2400, bs=u"b"), Bar.q.bi.IN(range(3000)))
+            )
+        self.assertEquals(2500, conn.count(Bar, Bar.q.bi == 2400))
+
+    def test_in_split_nocase(self):
+        # values differing only in case match the same rows in every part
+        conn = connect()
+        conn.update(Foo, Foo.new(foo_id=1, i1=1, s1=u"abc"), Foo.q.foo_id == 1)
+        values = [u"abc"] + [u"x%d" % i for i in range(1200)] + [u"ABC"]
+        where = Foo.q.s1.IN(values)
+        self.assertEquals(
+            [1], [foo["foo_id"] for foo in conn.select(Foo, where)]
+            )
+        self.assertEquals(1, conn.count(Foo, where))
+        self.assertEquals([u"abc"], conn.select_distinct(Foo, Foo.q.s1, where))
+        self.assertEquals(
+            [{"s1": u"abc", "n": 1}],
+            conn.aggregate(Foo, {"n": COUNT()}, where, Foo.q.s1)
+            )
+
+    def test_in_split_distinct_aggregate(self):
+        conn = connect()
+        ids = range(2600, 0, -2) + [1, 2, 2601]
+        foo_list = [foo for foo in self.foo_list if foo["foo_id"] in ids]
+        where = Foo.q.foo_id.IN(ids)
+        self.assertEquals(
+            sorted(set([foo["i1"] for foo in foo_list])),
+            conn.select_distinct(Foo, Foo.q.i1, where, Foo.q.i1.ASC)
+            )
+        self.assertEquals(
+            sorted(set([foo["s1"] for foo in foo_list]), reverse=True),
+            list(conn.xselect_distinct(Foo, Foo.q.s1, where, Foo.q.s1.DESC))
+            )
+        self.assertEquals(len(foo_list), conn.count(Foo, where))
+        i1_values = [foo["i1"] for foo in foo_list]
+        self.assertEquals(
+            {
+                "n": len(foo_list),
+                "total": sum(i1_values),
+                "lo": min(i1_values),
+                "avg": float(sum(i1_values)) / len(i1_values),
+            },
+            conn.aggregate(
+                Foo, {
+                    "n": COUNT(), "total": SUM(Foo.q.i1),
+                    "lo": MIN(Foo.q.i1), "avg": AVG(Foo.q.i1),
+                    },
+                where
+                )
+            )
+        expected = []
+        for s1 in sorted(set([foo["s1"] for foo in foo_list])):
+            group = [foo["foo_id"] for foo in foo_list if foo["s1"] == s1]
+            expected.append({"s1": s1, "n": len(group), "hi": max(group)})
+        self.assertEquals(
+            expected,
+            conn.aggregate(
+                Foo, {"n": COUNT(), "hi": MAX(Foo.q.foo_id)}, where, Foo.q.s1
+                )
+            )
+
+if __name__ == '__main__':
+    unittest.main()
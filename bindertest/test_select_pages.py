@@ -0,0 +1,100 @@
+import unittest
+
+from binder import *
+
+from bindertest.testdbconfig import connect
+from bindertest.tabledefs import Foo
+
+
+class ConnSelectLimitTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        self.foo_list = [
+            Foo.new(foo_id=i, i1=i % 3, s1="s%d" % i) for i in range(1, 11)
+            ]
+        conn.insert_many(Foo, self.foo_list)
+        conn.commit()
+
+    def test_limit_offset(self):
+        conn = connect()
+        order_by = Foo.q.foo_id.ASC
+        self.assertEquals(
+            self.foo_list[:3], conn.select(Foo, order_by=order_by, limit=3)
+            )
+        self.assertEquals(
+            self.foo_list[3:5],
+            conn.select(Foo, order_by=order_by, limit=2, offset=3)
+            )
+        self.assertEquals(
+            self.foo_list[8:], conn.select(Foo, order_by=order_by, offset=8)
+            )
+        self.assertEquals(
+            [], conn.select(Foo, order_by=order_by, limit=2, offset=10)
+            )
+        self.assertEquals([], conn.select(Foo, limit=0))
+        foo_list = [foo for foo in self.foo_list if foo["i1"] == 1]
+        self.assertEquals(
+            foo_list[1:2],
+            list(conn.xselect(Foo, Foo.q.i1 == 1, order_by, limit=1, offset=1))
+            )
+
+    def test_xselect_pages(self):
+        conn = connect()
+        pages = list(conn.xselect_pages(Foo, Foo.q.foo_id.ASC, page_size=4))
+        self.assertEquals([4, 4, 2], [len(page) for page in pages])
+        self.assertEquals(self.foo_list, pages[0] + pages[1] + pages[2])
+        # exact multiple of page_size
+        pages = list(conn.xselect_pages(Foo, Foo.q.foo_id.ASC, page_size=5))
+        self.assertEquals([5, 5], [len(page) for page in pages])
+        # DESC with where clause and after
+        pages = list(conn.xselect_pages(
+            Foo, Foo.q.foo_id.DESC, Foo.q.i1 > 0, page_size=2, after=9
+            ))
+        self.assertEquals(
+            [[8, 7], [5, 4], [2, 1]],
+            [[foo["foo_id"] for foo in page] for page in pages]
+            )
+        where = AND(Foo.q.i1 > 0, Foo.q.foo_id > 2)
+        pages = list(conn.xselect_pages(Foo, Foo.q.foo_id.ASC, where, 3))
+        self.assertEquals(
+            [[4, 5, 7], [8, 10]],
+            [[foo["foo_id"] for foo in page] for page in pages]
+            )
+        # no rows
+        self.assertEquals(
+            [], list(conn.xselect_pages(Foo, Foo.q.foo_id.ASC, Foo.q.i1 > 5))
+            )
+
+    def test_xselect_pages_row_factory(self):
+        conn = connect()
+        pages = list(conn.xselect_pages(
+            Foo, Foo.q.foo_id.ASC, page_size=6, row_factory=ROW_TUPLE,
+            cols=[Foo.q.s1, Foo.q.foo_id]
+            ))
+        self.assertEquals(
+            [("s%d" % i, i) for i in range(1, 11)], pages[0] + pages[1]
+            )
+        pages = list(conn.xselect_pages(
+            Foo, Foo.q.s1.ASC, page_size=3, row_factory=ROW_RECORD
+            ))
+        self.assertEquals(
+            ["s1", "s10", "s2", "s3", "s4", "s5", "s6", "s7", "s8", "s9"],
+            [foo.s1 for page in pages for foo in page]
+            )
+        try:
+            list(conn.xselect_pages(
+                Foo, Foo.q.foo_id.ASC, cols=[Foo.q.s1]
+                ))
+        except AssertionError, e:
+            self.assertEquals(
+                "xselect_pages(): cols must include column 'foo_id'", str(e)
+                )
+        else:
+            self.fail()
+
+
+if __name__ == '__main__':
+    unittest.main()
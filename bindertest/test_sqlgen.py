@@ -2,8 +2,9 @@
 import unittest
 
 from binder.col import *
-from binder.table import Table, AND, OR
+from binder.table import Table, AND, OR, NOT, Param, COUNT, SUM, MIN, MAX, AVG
 from binder import sqlgen
+from binder.cache import LruCache
 import datetime
 
 from bindertest.tabledefs import Foo, Bar, Baz
@@ -179,6 +180,110 @@ class InsertTest(unittest.TestCase):
             self.fail()
 
 
+class InsertManyTest(unittest.TestCase):
+
+    def test(self):
+        foo1 = Foo.new(foo_id=None, i1=25, s1="xyz")
+        foo2 = Foo.new(foo_id=4, i1=23, s1="pqr", d1=datetime.date(2006, 5, 4))
+        foo3 = Foo.new(foo_id=None, i1=26, s1="abc")
+        groups = sqlgen.insert_many(
+            Foo, [foo1, foo2, foo3], sqlgen.DIALECT_POSTGRES, "%s"
+            )
+        self.assertEquals(
+            [
+                (
+                    "INSERT INTO foo (i1,s1,d1) VALUES (%s,%s,NULL) RETURNING foo_id",
+                    True,
+                    [0, 2],
+                    [[25, "xyz"], [26, "abc"]],
+                ),
+                (
+                    "INSERT INTO foo (foo_id,i1,s1,d1) VALUES (%s,%s,%s,%s)",
+                    False,
+                    [1],
+                    [[4, 23, u"pqr", "2006-05-04"]],
+                ),
+            ],
+            groups
+            )
+
+    def test_empty(self):
+        groups = sqlgen.insert_many(Foo, [], sqlgen.DIALECT_SQLITE, "?")
+        self.assertEquals([], groups)
+
+    def test_bad_values(self):
+        foo1 = Foo.new()
+        foo2 = Foo.new()
+        foo2["i1"] = "xyz"
+        try:
+            sqlgen.insert_many(Foo, [foo1, foo2], sqlgen.DIALECT_SQLITE, "?")
+        except TypeError, e:
+            self.assertEquals("IntCol 'i1': int expected, got str", str(e))
+        else:
+            self.fail()
+
+
+class InsertMultirowTest(unittest.TestCase):
+
+    def test(self):
+        foo1 = Foo.new(foo_id=None, i1=25, s1="xyz")
+        foo2 = Foo.new(foo_id=4, i1=23, s1="pqr", d1=datetime.date(2006, 5, 4))
+        foo3 = Foo.new(foo_id=None, i1=26, s1="abc")
+        foo4 = Foo.new(foo_id=None, i1=27, s1="def")
+        stmts = sqlgen.insert_multirow(
+            Foo, [foo1, foo2, foo3, foo4], sqlgen.DIALECT_POSTGRES, "%s", 2
+            )
+        self.assertEquals(
+            [
+                (
+                    "INSERT INTO foo (i1,s1,d1) VALUES (%s,%s,NULL),(%s,%s,NULL) RETURNING foo_id",
+                    True,
+                    [0, 2],
+                    [25, "xyz", 26, "abc"],
+                ),
+                (
+                    "INSERT INTO foo (i1,s1,d1) VALUES (%s,%s,NULL) RETURNING foo_id",
+                    True,
+                    [3],
+                    [27, "def"],
+                ),
+                (
+                    "INSERT INTO foo (foo_id,i1,s1,d1) VALUES (%s,%s,%s,%s)",
+                    False,
+                    [1],
+                    [4, 23, u"pqr", "2006-05-04"],
+                ),
+            ],
+            stmts
+            )
+
+    def test_max_params(self):
+        foo_list = [Foo.new(foo_id=i, i1=i) for i in range(1, 501)]
+        stmts = sqlgen.insert_multirow(
+            Foo, foo_list, sqlgen.DIALECT_SQLITE, "?", 1000
+            )
+        # 3 params per row, 999 params max
+        self.assertEquals([333, 167], [len(stmt[2]) for stmt in stmts])
+        self.assertEquals([999, 501], [len(stmt[3]) for stmt in stmts])
+
+    def test_max_statement_bytes(self):
+        foo_list = [Foo.new(foo_id=i, s1=u"x" * 10) for i in range(1, 21)]
+        old_max_bytes = sqlgen.MAX_STATEMENT_BYTES[sqlgen.DIALECT_MYSQL]
+        sqlgen.MAX_STATEMENT_BYTES[sqlgen.DIALECT_MYSQL] = 500
+        try:
+            stmts = sqlgen.insert_multirow(
+                Foo, foo_list, sqlgen.DIALECT_MYSQL, "%s", 1000
+                )
+        finally:
+            sqlgen.MAX_STATEMENT_BYTES[sqlgen.DIALECT_MYSQL] = old_max_bytes
+        # 33 bytes for s1 + 24 each for foo_id and i1
+        self.assertEquals([6, 6, 6, 2], [len(stmt[2]) for stmt in stmts])
+
+    def test_empty(self):
+        stmts = sqlgen.insert_multirow(Foo, [], sqlgen.DIALECT_MYSQL, "%s", 10)
+        self.assertEquals([], stmts)
+
+
 class UpdateTest(unittest.TestCase):
 
     def test(self):
@@ -711,6 +816,336 @@ class SelectTest(unittest.TestCase):
             )
         self.assertEquals([], values)
 
+    def test_cols(self):
+        cols = sqlgen.select_cols(Foo, [Foo.q.s1, Foo.q.foo_id])
+        self.assertEquals((Foo.cols[2], Foo.cols[0]), cols)
+        self.assertEquals(None, sqlgen.select_cols(Foo, None))
+        sql, values = sqlgen.select(
+            Foo, Foo.q.i1 == 5, Foo.q.foo_id.ASC, sqlgen.DIALECT_SQLITE, "?",
+            None, cols
+            )
+        self.assertEquals(
+            "SELECT s1,foo_id FROM foo WHERE i1=? ORDER BY foo_id ASC",
+            sql
+            )
+        self.assertEquals([5], values)
+        # cached by cols
+        cache = LruCache(10)
+        sql1, values = sqlgen.select(
+            Foo, None, None, sqlgen.DIALECT_SQLITE, "?", cache, cols
+            )
+        sql2, values = sqlgen.select(
+            Foo, None, None, sqlgen.DIALECT_SQLITE, "?", cache
+            )
+        self.assertEquals("SELECT s1,foo_id FROM foo", sql1)
+        self.assertEquals("SELECT foo_id,i1,s1,d1 FROM foo", sql2)
+        self.assertEquals((0, 2), (cache.hits, cache.misses))
+
+    def test_limit_offset(self):
+        sql, values = sqlgen.select(
+            Foo, Foo.q.i1 == 5, Foo.q.foo_id.ASC, sqlgen.DIALECT_SQLITE, "?",
+            limit=10, offset=20
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE i1=? ORDER BY foo_id ASC LIMIT ? OFFSET ?",
+            sql
+            )
+        self.assertEquals([5, 10, 20], values)
+        sql, values = sqlgen.select(
+            Foo, None, None, sqlgen.DIALECT_POSTGRES, "%s", limit=10
+            )
+        self.assertEquals("SELECT foo_id,i1,s1,d1 FROM foo LIMIT %s", sql)
+        self.assertEquals([10], values)
+        # offset without limit
+        sql, values = sqlgen.select(
+            Foo, None, None, sqlgen.DIALECT_SQLITE, "?", offset=3
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo LIMIT -1 OFFSET ?", sql
+            )
+        self.assertEquals([3], values)
+        sql, values = sqlgen.select(
+            Foo, None, None, sqlgen.DIALECT_POSTGRES, "%s", offset=3
+            )
+        self.assertEquals("SELECT foo_id,i1,s1,d1 FROM foo OFFSET %s", sql)
+        sql, values = sqlgen.select(
+            Foo, None, None, sqlgen.DIALECT_MYSQL, "%s", offset=3
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo LIMIT 18446744073709551615 OFFSET %s",
+            sql
+            )
+        # cached by use of limit / offset, not values
+        cache = LruCache(10)
+        sql1, values = sqlgen.select(
+            Foo, None, None, sqlgen.DIALECT_SQLITE, "?", cache, limit=1
+            )
+        sql2, values = sqlgen.select(
+            Foo, None, None, sqlgen.DIALECT_SQLITE, "?", cache, limit=2
+            )
+        sql3, values = sqlgen.select(
+            Foo, None, None, sqlgen.DIALECT_SQLITE, "?", cache
+            )
+        self.assert_(sql1 is sql2)
+        self.assertEquals("SELECT foo_id,i1,s1,d1 FROM foo", sql3)
+        self.assertEquals((1, 2), (cache.hits, cache.misses))
+
+    def test_bad_limit_offset(self):
+        for limit, offset, name in [
+                (-1, None, "limit"), ("1", None, "limit"), (1.0, None, "limit"),
+                (None, -1, "offset"), (1, "2", "offset"),
+                ]:
+            try:
+                sqlgen.select(
+                    Foo, None, None, sqlgen.DIALECT_SQLITE, "?",
+                    limit=limit, offset=offset
+                    )
+            except AssertionError, e:
+                self.assertEquals(
+                    "select(): %s must be an integer >= 0" % name, str(e)
+                    )
+            else:
+                self.fail()
+
+    def test_bad_cols(self):
+        try:
+            sqlgen.select_cols(Foo, [])
+        except AssertionError, e:
+            self.assertEquals("select(): cols cannot be empty", str(e))
+        else:
+            self.fail()
+        try:
+            sqlgen.select_cols(Foo, ["s1"])
+        except AssertionError, e:
+            self.assertEquals("Column must be instance of QueryCol", str(e))
+        else:
+            self.fail()
+        try:
+            sqlgen.select_cols(Foo, [Bar.q.bi])
+        except AssertionError, e:
+            self.assertEquals(
+                "select(): column 'bi' is not in table 'foo'", str(e)
+                )
+        else:
+            self.fail()
+        try:
+            sqlgen.select_cols(Foo, [Foo.q.i1, Foo.q.i1])
+        except AssertionError, e:
+            self.assertEquals("select(): duplicate column 'i1'", str(e))
+        else:
+            self.fail()
+
+
+class NestedWhereTest(unittest.TestCase):
+
+    def test(self):
+        where = AND(
+            Foo.q.i1 == 1,
+            OR(Foo.q.s1 == "a", AND(Foo.q.d1 == None, Foo.q.i1 > 2)),
+            NOT(OR(Foo.q.foo_id.IN([4, 5]), Foo.q.i1 < 6)),
+            AND(Foo.q.foo_id >= 7, Foo.q.s1 == "b"),
+            )
+        sql, values = sqlgen.select(
+            Foo, where, None, sqlgen.DIALECT_POSTGRES, "%s"
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE i1=%s"
+            " AND (s1=%s OR (d1 is NULL AND i1>%s))"
+            " AND NOT (foo_id IN (%s,%s) OR i1<%s)"
+            " AND foo_id>=%s AND s1=%s",
+            sql
+            )
+        self.assertEquals([1, "a", 2, 4, 5, 6, 7, "b"], values)
+        sql, values = sqlgen.delete(
+            Foo, OR(AND(Foo.q.i1 == 1, Foo.q.s1 == "a"), NOT(Foo.q.i1 == 2)),
+            sqlgen.DIALECT_SQLITE, "?"
+            )
+        self.assertEquals(
+            "DELETE FROM foo WHERE (i1=? AND s1=?) OR NOT (i1=?)", sql
+            )
+        self.assertEquals([1, "a", 2], values)
+
+    def test_cache(self):
+        cache = LruCache(10)
+        def select(where):
+            return sqlgen.select(
+                Foo, where, None, sqlgen.DIALECT_SQLITE, "?", cache
+                )
+        sql1, values = select(
+            AND(Foo.q.i1 == 1, OR(Foo.q.s1 == "a", Foo.q.s1 == "b"))
+            )
+        sql2, values = select(
+            AND(Foo.q.i1 == 2, OR(Foo.q.s1 == "c", Foo.q.s1 == "d"))
+            )
+        self.assert_(sql1 is sql2)
+        self.assertEquals([2, "c", "d"], values)
+        # same conditions, different nesting
+        sql3, values = select(
+            OR(AND(Foo.q.i1 == 2, Foo.q.s1 == "c"), Foo.q.s1 == "d")
+            )
+        sql4, values = select(
+            AND(Foo.q.i1 == 2, Foo.q.s1 == "c", Foo.q.s1 == "d")
+            )
+        sql5, values = select(
+            AND(Foo.q.i1 == 2, NOT(OR(Foo.q.s1 == "c", Foo.q.s1 == "d")))
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE (i1=? AND s1=?) OR s1=?",
+            sql3
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE i1=? AND s1=? AND s1=?",
+            sql4
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE i1=? AND NOT (s1=? OR s1=?)",
+            sql5
+            )
+        self.assertEquals((1, 4), (cache.hits, cache.misses))
+
+    def test_prepare(self):
+        sql, params = sqlgen.prepare_select(
+            Foo, OR(Foo.q.i1 == Param("i1"), NOT(Foo.q.s1 == "x")), None,
+            sqlgen.DIALECT_SQLITE, "?"
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE i1=? OR NOT (s1=?)", sql
+            )
+        self.assertEquals(["i1", None], [param[0] for param in params])
+
+    def test_split_where(self):
+        ids = range(1, 1501)
+        where = AND(OR(Foo.q.i1 == 1, Foo.q.i1 == 2), Foo.q.foo_id.IN(ids))
+        wheres = sqlgen.split_where(where, sqlgen.DIALECT_SQLITE)
+        self.assertEquals(2, len(wheres))
+        self.assertEquals([997, 503], [len(w.sqlconds[1].other) for w in wheres])
+        self.assert_(wheres[0].sqlconds[0] is where.sqlconds[0])
+        where = AND(Foo.q.i1 == 1, NOT(Foo.q.foo_id.IN(ids)))
+        try:
+            sqlgen.split_where(where, sqlgen.DIALECT_SQLITE)
+        except AssertionError, e:
+            self.assertEquals(
+                "Too many parameters in 'where' clause: 1501 (max 999)", str(e)
+                )
+        else:
+            self.fail()
+
+
+class InTest(unittest.TestCase):
+
+    def test(self):
+        sql, values = sqlgen.select(
+            Foo, Foo.q.foo_id.IN([3, 1, 2]), None, sqlgen.DIALECT_SQLITE, "?"
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE foo_id IN (?,?,?)", sql
+            )
+        self.assertEquals([3, 1, 2], values)
+        sql, values = sqlgen.select(
+            Foo, AND(Foo.q.i1 == 5, Foo.q.d1.NOT_IN([datetime.date(2006, 5, 30)])),
+            None, sqlgen.DIALECT_POSTGRES, "%s"
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE i1=%s AND d1 NOT IN (%s)",
+            sql
+            )
+        self.assertEquals([5, "2006-05-30"], values)
+        sql, values = sqlgen.delete(
+            Foo, Foo.q.s1.IN(["a", "b"]), sqlgen.DIALECT_MYSQL, "%s"
+            )
+        self.assertEquals("DELETE FROM foo WHERE s1 IN (%s,%s)", sql)
+        self.assertEquals([u"a", u"b"], values)
+
+    def test_cache(self):
+        cache = LruCache(10)
+        sql1, values = sqlgen.select(
+            Foo, Foo.q.foo_id.IN([1, 2]), None, sqlgen.DIALECT_SQLITE, "?",
+            cache
+            )
+        sql2, values = sqlgen.select(
+            Foo, Foo.q.foo_id.IN([3, 4]), None, sqlgen.DIALECT_SQLITE, "?",
+            cache
+            )
+        self.assert_(sql1 is sql2)
+        self.assertEquals([3, 4], values)
+        sql3, values = sqlgen.select(
+            Foo, Foo.q.foo_id.IN([3, 4, 5]), None, sqlgen.DIALECT_SQLITE, "?",
+            cache
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE foo_id IN (?,?,?)", sql3
+            )
+        self.assertEquals((1, 2), (cache.hits, cache.misses))
+
+    def test_prepare(self):
+        sql, params = sqlgen.prepare_select(
+            Foo, AND(Foo.q.foo_id.IN([1, 2]), Foo.q.i1 == Param("i1")), None,
+            sqlgen.DIALECT_SQLITE, "?"
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE foo_id IN (?,?) AND i1=?",
+            sql
+            )
+        self.assertEquals(
+            [None, None, "i1"], [param[0] for param in params]
+            )
+        self.assertEquals([1, 2], [param[3] for param in params[:2]])
+
+    def test_split_where(self):
+        ids = range(1, 2501)
+        where = Foo.q.foo_id.IN(ids)
+        self.assertEquals([where], sqlgen.split_where(where, sqlgen.DIALECT_MYSQL))
+        wheres = sqlgen.split_where(where, sqlgen.DIALECT_SQLITE)
+        self.assertEquals([999, 999, 502], [len(w.other) for w in wheres])
+        self.assertEquals(ids, [v for w in wheres for v in w.other])
+        # reserved params, other conditions and duplicates
+        where = AND(Foo.q.i1 == 1, Foo.q.foo_id.IN(ids + ids), Foo.q.d1 == None)
+        wheres = sqlgen.split_where(where, sqlgen.DIALECT_SQLITE, 2)
+        self.assertEquals(3, len(wheres))
+        self.assertEquals([996, 996, 508], [len(w.sqlconds[1].other) for w in wheres])
+        self.assertEquals(ids, [v for w in wheres for v in w.sqlconds[1].other])
+        self.assert_(wheres[2].sqlconds[0] is where.sqlconds[0])
+        self.assertEquals(None, sqlgen.split_where(None, sqlgen.DIALECT_SQLITE)[0])
+        # values equal in the column's collation share a chunk
+        values = [u"abc"] + [u"x%d" % i for i in range(1200)] + [u"ABC"]
+        wheres = sqlgen.split_where(Foo.q.s1.IN(values), sqlgen.DIALECT_SQLITE)
+        self.assertEquals([u"abc", u"ABC"], list(wheres[0].other[:2]))
+        self.assertEquals([999, 203], [len(w.other) for w in wheres])
+        values = [u"\xe9 "] + [u"x%d" % i for i in range(1200)] + [u"E"]
+        wheres = sqlgen.split_where(Bar.q.bs.IN(values), sqlgen.DIALECT_SQLITE)
+        self.assertEquals(u"\xe9 ", wheres[0].other[0])
+        self.assertEquals(u"E", wheres[1].other[-1])
+        wheres = sqlgen.split_where(
+            Bar.q.bs.IN(values), sqlgen.DIALECT_MYSQL, 65535 - 999
+            )
+        self.assertEquals((u"\xe9 ", u"E"), wheres[0].other[:2])
+        # the group of the value set by an update goes first
+        values = [u"x%d" % i for i in range(1200)] + [u"E", u"e"]
+        wheres = sqlgen.split_where(
+            Foo.q.s1.IN(values), sqlgen.DIALECT_SQLITE, 0,
+            {Foo.q.s1._col: u"e"}
+            )
+        self.assertEquals((u"E", u"e"), wheres[0].other[:2])
+        # cannot split
+        for where in [
+                Foo.q.foo_id.NOT_IN(ids),
+                OR(Foo.q.i1 == 1, Foo.q.foo_id.IN(ids)),
+                ]:
+            try:
+                sqlgen.split_where(where, sqlgen.DIALECT_SQLITE)
+            except AssertionError, e:
+                self.assertEquals(
+                    "Too many parameters in 'where' clause: %d (max 999)"
+                        % _param_count(where),
+                    str(e)
+                    )
+            else:
+                self.fail()
+
+
+def _param_count(where):
+    return sqlgen._where_param_count(where)
+
 
 class SelectDistinctTest(unittest.TestCase):
 
@@ -787,5 +1222,214 @@ class SelectDistinctTest(unittest.TestCase):
 
 
 
+class AggregateTest(unittest.TestCase):
+
+    def test(self):
+        sql, values = sqlgen.aggregate(
+            Foo, {"n": COUNT()}, None, None, sqlgen.DIALECT_SQLITE, "?"
+            )
+        self.assertEquals("SELECT COUNT(*) FROM foo", sql)
+        self.assertEquals([], values)
+        sql, values = sqlgen.aggregate(
+            Foo,
+            {"total": SUM(Foo.q.i1), "first": MIN(Foo.q.d1),
+                "last": MAX(Foo.q.d1), "avg": AVG(Foo.q.i1),
+                "with_date": COUNT(Foo.q.d1)},
+            Foo.q.i1 > 5, None, sqlgen.DIALECT_POSTGRES, "%s"
+            )
+        self.assertEquals(
+            "SELECT AVG(i1),MIN(d1),MAX(d1),SUM(i1),COUNT(d1) FROM foo WHERE i1>%s",
+            sql
+            )
+        self.assertEquals([5], values)
+
+    def test_group_by(self):
+        sql, values = sqlgen.aggregate(
+            Bar, {"n": COUNT(), "total": SUM(Bar.q.bi)}, Bar.q.bs == "x",
+            [Bar.q.bb, Bar.q.bd], sqlgen.DIALECT_MYSQL, "%s"
+            )
+        self.assertEquals(
+            "SELECT bb,bd,COUNT(*),SUM(bi) FROM bar WHERE bs=%s GROUP BY bb,bd ORDER BY bb,bd",
+            sql
+            )
+        self.assertEquals(["x"], values)
+        sql, values = sqlgen.aggregate(
+            Bar, {"n": COUNT()}, None, Bar.q.bs, sqlgen.DIALECT_SQLITE, "?"
+            )
+        self.assertEquals(
+            "SELECT bs,COUNT(*) FROM bar GROUP BY bs ORDER BY bs", sql
+            )
+
+    def test_cache(self):
+        cache = LruCache(10)
+        sql1, values = sqlgen.aggregate(
+            Foo, {"n": COUNT()}, Foo.q.i1 == 1, None, sqlgen.DIALECT_SQLITE,
+            "?", cache
+            )
+        sql2, values = sqlgen.aggregate(
+            Foo, {"m": COUNT()}, Foo.q.i1 == 2, None, sqlgen.DIALECT_SQLITE,
+            "?", cache
+            )
+        self.assert_(sql1 is sql2)
+        self.assertEquals([2], values)
+        sqlgen.aggregate(
+            Foo, {"n": SUM(Foo.q.i1)}, Foo.q.i1 == 2, None,
+            sqlgen.DIALECT_SQLITE, "?", cache
+            )
+        self.assertEquals((1, 2), (cache.hits, cache.misses))
+
+    def test_bad_values(self):
+        def check(msg, table, aggregates, group_by=None):
+            try:
+                sqlgen.aggregate(
+                    table, aggregates, None, group_by, sqlgen.DIALECT_SQLITE, "?"
+                    )
+            except AssertionError, e:
+                self.assertEquals(msg, str(e))
+            else:
+                self.fail()
+        check("aggregate(): no aggregates given", Foo, {})
+        check("aggregate(): 'n' is not an aggregate", Foo, {"n": Foo.q.i1})
+        check(
+            "aggregate(): column 'bi' is not in table 'foo'",
+            Foo, {"n": SUM(Bar.q.bi)}
+            )
+        check(
+            "aggregate(): name 'bs' clashes with group_by column",
+            Bar, {"bs": COUNT()}, [Bar.q.bs]
+            )
+
+
+class PrepareSelectTest(unittest.TestCase):
+
+    def test(self):
+        sql, params = sqlgen.prepare_select(
+            Foo,
+            AND(Foo.q.i1 == Param("i"), Foo.q.s1 == "x", Foo.q.d1 == None),
+            Foo.q.foo_id.ASC,
+            sqlgen.DIALECT_POSTGRES, "%s"
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE i1=%s AND s1=%s AND d1 is NULL ORDER BY foo_id ASC",
+            sql
+            )
+        self.assertEquals(
+            [("i", Foo.q.i1._col), (None, Foo.q.s1._col)],
+            [(param[0], param[1]) for param in params]
+            )
+        self.assertEquals(u"x", params[1][3])
+
+    def test_param_without_prepare(self):
+        try:
+            sqlgen.select(
+                Foo, Foo.q.i1 == Param("i"), None, sqlgen.DIALECT_SQLITE, "?"
+                )
+        except AssertionError, e:
+            self.assertEquals(
+                "Param 'i' can only be used with prepare()", str(e)
+                )
+        else:
+            self.fail()
+
+
+class SqlCacheTest(unittest.TestCase):
+
+    def test_select(self):
+        cache = LruCache(10)
+        sql, values = sqlgen.select(
+            Foo, AND(Foo.q.i1 == 12, Foo.q.s1 == 'y'), Foo.q.foo_id.ASC,
+            sqlgen.DIALECT_SQLITE, "?", cache
+            )
+        self.assertEquals(
+            "SELECT foo_id,i1,s1,d1 FROM foo WHERE i1=? AND s1=? ORDER BY foo_id ASC",
+            sql
+            )
+        self.assertEquals([12, 'y'], values)
+        self.assertEquals((0, 1), (cache.hits, cache.misses))
+        # same shape - new values
+        sql2, values = sqlgen.select(
+            Foo, AND(Foo.q.i1 == 13, Foo.q.s1 == 'z'), Foo.q.foo_id.ASC,
+            sqlgen.DIALECT_SQLITE, "?", cache
+            )
+        self.assert_(sql2 is sql)
+        self.assertEquals([13, 'z'], values)
+        self.assertEquals((1, 1), (cache.hits, cache.misses))
+        # different order_by / dialect
+        sqlgen.select(
+            Foo, AND(Foo.q.i1 == 13, Foo.q.s1 == 'z'), Foo.q.foo_id.DESC,
+            sqlgen.DIALECT_SQLITE, "?", cache
+            )
+        sqlgen.select(
+            Foo, AND(Foo.q.i1 == 13, Foo.q.s1 == 'z'), Foo.q.foo_id.ASC,
+            sqlgen.DIALECT_MYSQL, "%s", cache
+            )
+        self.assertEquals((1, 3), (cache.hits, cache.misses))
+
+    def test_null_shape(self):
+        cache = LruCache(10)
+        sql, values = sqlgen.select(
+            Foo, Foo.q.d1 == datetime.date(2006, 5, 4), None,
+            sqlgen.DIALECT_SQLITE, "?", cache
+            )
+        self.assertEquals("SELECT foo_id,i1,s1,d1 FROM foo WHERE d1=?", sql)
+        self.assertEquals(["2006-05-04"], values)
+        sql, values = sqlgen.select(
+            Foo, Foo.q.d1 == None, None, sqlgen.DIALECT_SQLITE, "?", cache
+            )
+        self.assertEquals("SELECT foo_id,i1,s1,d1 FROM foo WHERE d1 is NULL", sql)
+        self.assertEquals([], values)
+        self.assertEquals((0, 2), (cache.hits, cache.misses))
+
+    def test_date_ops(self):
+        cache = LruCache(10)
+        for month in [3, 7]:
+            sql, values = sqlgen.select(
+                Foo, Foo.q.d1.MONTH(datetime.date(2005, month, 12)), None,
+                sqlgen.DIALECT_SQLITE, "?", cache
+                )
+            self.assertEquals("SELECT foo_id,i1,s1,d1 FROM foo WHERE d1 LIKE ?", sql)
+            self.assertEquals(["%%-%02d-%%" % month], values)
+        self.assertEquals((1, 1), (cache.hits, cache.misses))
+
+    def test_update_delete(self):
+        cache = LruCache(10)
+        foo = Foo.new(foo_id=4, i1=23, s1="pqr", d1=None)
+        for i in range(2):
+            sql, values = sqlgen.update(
+                Foo, foo, Foo.q.i1 == 434 + i, sqlgen.DIALECT_MYSQL, "%s", cache
+                )
+            self.assertEquals(
+                "UPDATE foo SET foo_id=%s,i1=%s,s1=%s,d1=NULL WHERE i1=%s",
+                sql
+                )
+            self.assertEquals([4, 23, u"pqr", 434 + i], values)
+        foo["d1"] = datetime.date(2006, 5, 4)
+        sql, values = sqlgen.update(
+            Foo, foo, Foo.q.i1 == 434, sqlgen.DIALECT_MYSQL, "%s", cache
+            )
+        self.assertEquals(
+            "UPDATE foo SET foo_id=%s,i1=%s,s1=%s,d1=%s WHERE i1=%s",
+            sql
+            )
+        for i in range(2):
+            sql, values = sqlgen.delete(
+                Foo, OR(Foo.q.i1 == i, Foo.q.s1 == "aeiou"),
+                sqlgen.DIALECT_SQLITE, "?", cache
+                )
+            self.assertEquals("DELETE FROM foo WHERE i1=? OR s1=?", sql)
+            self.assertEquals([i, "aeiou"], values)
+        self.assertEquals((2, 3), (cache.hits, cache.misses))
+
+    def test_bad_values(self):
+        cache = LruCache(10)
+        sqlgen.select(Bar, Bar.q.bi > 1, None, sqlgen.DIALECT_SQLITE, "?", cache)
+        try:
+            sqlgen.select(Bar, Bar.q.bi > None, None, sqlgen.DIALECT_SQLITE, "?", cache)
+        except AssertionError, e:
+            self.assertEquals("Op '>' does not support None", str(e))
+        else:
+            self.fail()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from binder import *
+
+from bindertest.tabledefs import Foo, Bar, Baz
+
+
+class SqliteBackupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dbfile = os.path.join(self.tmp_dir, "snapshot.db3")
+        conn = SqliteConnection(self.dbfile)
+        conn.create_table(Foo)
+        conn.create_table(Bar)
+        conn._execute("CREATE INDEX foo_i1 ON foo (i1)")
+        self.foos = [Foo.new(foo_id=i, i1=i * 10, s1=u"s%d" % i) for i in range(1, 6)]
+        conn.insert_many(Foo, self.foos)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_load_save(self):
+        conn = SqliteConnection(":memory:")
+        calls = []
+        def progress(done, total):
+            calls.append((done, total))
+        conn.load_from(self.dbfile, progress)
+        self.assert_(calls)
+        self.assertEquals(calls[-1][0], calls[-1][1])
+        self.assertEquals(self.foos, conn.select(Foo, order_by=Foo.q.foo_id.ASC))
+        self.assertEquals([], conn.select(Bar))
+        # changes in memory, saved to a new file
+        foo6 = Foo.new(foo_id=None, i1=60, s1=u"s6")
+        conn.insert(Foo, foo6)
+        self.assertEquals(6, foo6["foo_id"])
+        conn.delete_by_id(Foo, 1)
+        dbfile2 = os.path.join(self.tmp_dir, "saved.db3")
+        conn.save_to(dbfile2)
+        conn.close()
+        conn2 = SqliteConnection(dbfile2)
+        self.assertEquals(
+            self.foos[1:] + [foo6], conn2.select(Foo, order_by=Foo.q.foo_id.ASC)
+            )
+        index_names = [row[0] for row in conn2._execute(
+            "SELECT name FROM sqlite_master WHERE type='index'"
+            ).fetchall()]
+        self.assertEquals(["foo_i1"], index_names)
+        conn2.close()
+
+    def test_save_replaces(self):
+        # tables not in the saved database are dropped
+        conn = SqliteConnection(":memory:")
+        conn.create_table(Bar)
+        conn.commit()
+        conn.save_to(self.dbfile)
+        conn.close()
+        conn = SqliteConnection(self.dbfile)
+        table_names = [row[0] for row in conn._execute(
+            "SELECT name FROM sqlite_master WHERE type='table'"
+            ).fetchall()]
+        self.assertEquals(["bar"], table_names)
+        conn.close()
+
+    def test_load_replaces(self):
+        conn = SqliteConnection(":memory:", row_cache_size=10)
+        conn.create_table(Foo)
+        conn.insert(Foo, Foo.new(foo_id=1, i1=5))
+        conn.create_table(Baz)
+        conn.commit()
+        self.assertEquals(5, conn.get(Foo, 1)["i1"])
+        conn.load_from(self.dbfile)
+        # row cache cleared
+        self.assertEquals(self.foos[0], conn.get(Foo, 1))
+        table_names = [row[0] for row in conn._execute(
+            "SELECT name FROM sqlite_master WHERE type='table'"
+            ).fetchall()]
+        self.assertEquals(["foo", "bar"], table_names)
+        conn.close()
+
+    def test_load_invalidates(self):
+        # results of tables dropped by the load are not used
+        conn = SqliteConnection(":memory:", result_cache=DictResultCache())
+        conn.create_table(Baz)
+        conn.create_table(Foo)
+        conn.commit()
+        self.assertEquals([], conn.select(Baz))
+        self.assertEquals([], conn.select(Foo))
+        conn.load_from(self.dbfile)
+        self.assertRaises(conn.DbError, conn.select, Baz)
+        self.assertEquals(5, len(conn.select(Foo)))
+        conn.close()
+
+    def test_load_checks(self):
+        conn = SqliteConnection(":memory:", read_only="test123")
+        try:
+            conn.load_from(self.dbfile)
+        except Exception, e:
+            self.assertEquals("Connection is read only: test123", str(e))
+        else:
+            self.fail()
+        conn.close()
+        conn = SqliteConnection(":memory:")
+        dbfile = os.path.join(self.tmp_dir, "missing.db3")
+        self.assertRaises(conn.DbError, conn.load_from, dbfile)
+        self.assertFalse(os.path.exists(dbfile))
+        conn.close()
+
+    def test_save_fails(self):
+        # the previous file is kept if the copy fails part way
+        conn = SqliteConnection(":memory:")
+        conn.create_table(Bar)
+        conn.create_table(Baz)
+        conn.commit()
+        def progress(done, total):
+            if done:
+                raise ValueError, "stop"
+        self.assertRaises(ValueError, conn.save_to, self.dbfile, progress)
+        conn.close()
+        self.assertEquals(["snapshot.db3"], os.listdir(self.tmp_dir))
+        conn = SqliteConnection(self.dbfile)
+        self.assertEquals(self.foos, conn.select(Foo, order_by=Foo.q.foo_id.ASC))
+        conn.close()
+
+    def test_load_fails(self):
+        # the database is unchanged if the copy fails part way
+        dbfile = os.path.join(self.tmp_dir, "target.db3")
+        conn = SqliteConnection(dbfile)
+        conn.create_table(Baz)
+        conn.create_table(Foo)
+        conn.insert(Foo, Foo.new(foo_id=9, i1=9))
+        conn.commit()
+        def progress(done, total):
+            if done:
+                raise ValueError, "stop"
+        self.assertRaises(ValueError, conn.load_from, self.dbfile, progress)
+        self.assertEquals([9], [foo["foo_id"] for foo in conn.select(Foo)])
+        self.assertEquals([], conn.select(Baz))
+        conn.close()
+
+    def test_save_read_only(self):
+        conn = SqliteConnection(self.dbfile, read_only="test123")
+        dbfile2 = os.path.join(self.tmp_dir, "saved.db3")
+        conn.save_to(dbfile2)
+        conn.close()
+        conn = SqliteConnection(dbfile2)
+        self.assertEquals(self.foos, conn.select(Foo, order_by=Foo.q.foo_id.ASC))
+        conn.close()
+
+    def test_shared_memory(self):
+        uri = "file:binder_backup_test?mode=memory&cache=shared"
+        conn1 = SqliteConnection(uri)
+        conn1.load_from(self.dbfile)
+        conn2 = SqliteConnection(uri)
+        self.assertEquals(5, conn2.count(Foo))
+        conn1.close()
+        conn2.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
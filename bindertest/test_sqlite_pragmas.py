@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from binder import *
+
+
+class SqlitePragmasTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dbfile = os.path.join(self.tmp_dir, "pragmas.db3")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_default(self):
+        conn = SqliteConnection(self.dbfile)
+        self.assertEquals({}, conn.pragmas)
+        self.assertEquals(u"delete", conn.get_pragma("journal_mode"))
+        conn.close()
+
+    def test_profile(self):
+        conn = SqliteConnection(self.dbfile, performance_profile="read_mostly")
+        self.assertEquals(
+            {
+                "journal_mode": u"wal",
+                "synchronous": 1,
+                "mmap_size": 268435456,
+                "cache_size": -65536,
+                "temp_store": 2,
+                "busy_timeout": 5000,
+            },
+            conn.pragmas
+            )
+        self.assertEquals(u"wal", conn.get_pragma("journal_mode"))
+        conn.close()
+        conn = SqliteConnection(self.dbfile, performance_profile="bulk_load")
+        self.assertEquals(0, conn.pragmas["synchronous"])
+        conn.close()
+        conn = SqliteConnection(self.dbfile, performance_profile="durable")
+        self.assertEquals(2, conn.pragmas["synchronous"])
+        conn.close()
+
+    def test_pragmas(self):
+        # pragmas override the profile
+        conn = SqliteConnection(
+            self.dbfile, performance_profile="durable",
+            pragmas={"synchronous": "NORMAL", "cache_size": 500}
+            )
+        self.assertEquals(1, conn.pragmas["synchronous"])
+        self.assertEquals(500, conn.pragmas["cache_size"])
+        self.assertEquals(500, conn.get_pragma("cache_size"))
+        self.assertEquals(1000, conn.set_pragma("busy_timeout", 1000))
+        self.assertEquals(1000, conn.pragmas["busy_timeout"])
+        conn.close()
+
+    def test_bad_pragmas(self):
+        try:
+            SqliteConnection(self.dbfile, performance_profile="fast")
+        except AssertionError, e:
+            self.assertEquals("Unknown performance_profile: fast", str(e))
+        else:
+            self.fail()
+        conn = SqliteConnection(self.dbfile)
+        try:
+            conn.set_pragma("cache_size=1; DROP TABLE foo", 1)
+        except AssertionError, e:
+            self.assertEquals(
+                "Bad pragma name: 'cache_size=1; DROP TABLE foo'", str(e)
+                )
+        else:
+            self.fail()
+        try:
+            conn.set_pragma("journal_mode", "WAL; DROP TABLE foo")
+        except AssertionError, e:
+            self.assertEquals(
+                "pragma journal_mode: value must be int or name, "
+                "got 'WAL; DROP TABLE foo'",
+                str(e)
+                )
+        else:
+            self.fail()
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
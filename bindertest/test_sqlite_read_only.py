@@ -0,0 +1,105 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from binder import *
+from binder import db_sqlite
+
+from bindertest.tabledefs import Foo
+
+
+class SqliteReadOnlyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dbfile = os.path.join(self.tmp_dir, "read only.db3")
+        conn = SqliteConnection(self.dbfile)
+        conn.create_table(Foo)
+        conn.insert(Foo, Foo.new(foo_id=1, i1=101))
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assertWriteFails(self, conn):
+        try:
+            conn._dbconn.execute("DELETE FROM foo")
+        except conn.DbError, e:
+            self.assertEquals("attempt to write a readonly database", str(e))
+        else:
+            self.fail()
+
+    def test_read_only(self):
+        conn = SqliteConnection(self.dbfile, read_only="test123")
+        self.assertEquals(1, conn.pragmas["query_only"])
+        self.assertEquals([101], conn.select_distinct(Foo, Foo.q.i1))
+        self.assertWriteFails(conn)
+        # opened with mode=ro, so still read only without query_only
+        conn.set_pragma("query_only", 0)
+        self.assertWriteFails(conn)
+        conn.close()
+        self.assertEquals(["read only.db3"], os.listdir(self.tmp_dir))
+
+    def test_immutable(self):
+        conn = SqliteConnection(self.dbfile, read_only="test123", immutable=True)
+        self.assertEquals([101], conn.select_distinct(Foo, Foo.q.i1))
+        self.assertWriteFails(conn)
+        conn.close()
+        try:
+            SqliteConnection(self.dbfile, immutable=True)
+        except AssertionError, e:
+            self.assertEquals("immutable requires read_only", str(e))
+        else:
+            self.fail()
+
+    def test_wal_readers(self):
+        conn = SqliteConnection(self.dbfile, performance_profile="durable")
+        self.assertEquals(u"wal", conn.pragmas["journal_mode"])
+        readers = [
+            SqliteConnection(
+                self.dbfile, read_only="reader", performance_profile="read_mostly"
+                )
+            for i in range(3)
+            ]
+        # readers see committed rows while the writer has a transaction open
+        conn.insert(Foo, Foo.new(foo_id=2, i1=23))
+        for reader in readers:
+            self.assertEquals(1, reader.count(Foo))
+        conn.commit()
+        for reader in readers:
+            self.assertEquals(2, reader.count(Foo))
+            reader.close()
+        conn.close()
+
+    def test_missing_file(self):
+        dbfile = os.path.join(self.tmp_dir, "missing.db3")
+        self.assertRaises(
+            sqlite3.OperationalError, SqliteConnection, dbfile,
+            read_only="test123"
+            )
+        self.assertFalse(os.path.exists(dbfile))
+
+    def test_no_uri_filenames(self):
+        # SQLite built without SQLITE_USE_URI - only PRAGMA query_only
+        db_sqlite._uri_supported = False
+        try:
+            conn = SqliteConnection(self.dbfile, read_only="test123")
+            self.assertEquals([101], conn.select_distinct(Foo, Foo.q.i1))
+            self.assertWriteFails(conn)
+            conn.close()
+            self.test_missing_file()
+        finally:
+            db_sqlite._uri_supported = None
+        self.assertEquals(["read only.db3"], os.listdir(self.tmp_dir))
+
+    def test_memory(self):
+        conn = SqliteConnection(":memory:", read_only="test123")
+        self.assertEquals({"query_only": 1}, conn.pragmas)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,11 @@
 import unittest
 
 from datetime import date
+from decimal import Decimal
 from binder.col import *
-from binder.table import Table, SqlCondition, SqlSort, AND, OR
+from binder.table import Table, SqlCondition, SqlSort, AND, OR, NOT, Param, \
+    ROW_DICT, ROW_TUPLE, ROW_RECORD, ROW_NAMEDTUPLE, \
+    COUNT, SUM, MIN, MAX, AVG, ROW_FN_CACHE_SIZE
 
 from bindertest.tabledefs import Foo, Bar
 
@@ -218,6 +221,107 @@ class TableTest(unittest.TestCase):
         auto_id = Foo.check_values(foo)
         self.assert_(True, auto_id)
 
+    def test_decode_row(self):
+        foo = Foo.decode_row((1, 101, u"alpha", "2006-05-30"))
+        self.assertEquals(
+            {"foo_id": 1, "i1": 101, "s1": u"alpha", "d1": date(2006, 5, 30)},
+            foo
+            )
+        bar = Bar.decode_row((None, u"x", None, None, 1))
+        self.assertEquals(
+            {"bi": None, "bs": u"x", "bd": None, "bdt1": None, "bb": True},
+            bar
+            )
+        self.assert_(bar["bb"] is True)
+        # no converters needed
+        Baz = Table("baz", AutoIdCol("baz_id"), FloatCol("f3"))
+        self.assertEquals(
+            {"baz_id": 3, "f3": 1.5}, Baz.decode_row((3, 1.5))
+            )
+
+    def test_row_decoder(self):
+        values = (1, 101, u"alpha", "2006-05-30")
+        d = date(2006, 5, 30)
+        self.assert_(Foo.row_decoder(ROW_DICT) is Foo.decode_row)
+        self.assert_(Foo.row_decoder(ROW_TUPLE) is Foo.row_decoder(ROW_TUPLE))
+        self.assertEquals(
+            (1, 101, u"alpha", d), Foo.row_decoder(ROW_TUPLE)(values)
+            )
+        foo = Foo.row_decoder(ROW_RECORD)(values)
+        self.assert_(isinstance(foo, Foo.record_class))
+        self.assertEquals(Foo.new_record(foo_id=1, i1=101, s1=u"alpha", d1=d), foo)
+        foo = Foo.row_decoder(ROW_NAMEDTUPLE)(values)
+        self.assertEquals((1, 101, u"alpha", d), foo)
+        self.assertEquals(101, foo.i1)
+        self.assertEquals("foo", foo.__class__.__name__)
+        try:
+            Foo.row_decoder("list")
+        except AssertionError, e:
+            self.assertEquals("Unknown row_factory: list", str(e))
+        else:
+            self.fail()
+
+    def test_row_fn_cache_size(self):
+        t = Table("t", IntCol("a"), IntCol("b"), IntCol("c"))
+        col_sets = []
+        for i in range(ROW_FN_CACHE_SIZE + 10):
+            # a distinct cols tuple for each projection
+            col_sets.append(tuple([t.cols[i % 3]] * (i + 1)))
+        for cols in col_sets:
+            t.row_decoder(ROW_TUPLE, cols)
+        self.assertEquals(ROW_FN_CACHE_SIZE, len(t._row_decoders))
+        self.assertEquals(ROW_FN_CACHE_SIZE, len(t._row_builders))
+        decoder = t.row_decoder(ROW_TUPLE, col_sets[-1])
+        self.assert_(decoder is t.row_decoder(ROW_TUPLE, col_sets[-1]))
+
+    def test_record(self):
+        foo = Foo.new_record(i1=5, s1=u"x")
+        self.assertEquals(["foo_id", "i1", "s1", "d1"], foo.keys())
+        self.assertEquals([None, 5, u"x", None], foo.values())
+        self.assertEquals(5, foo.i1)
+        self.assertEquals(5, foo["i1"])
+        foo["i1"] = 6
+        self.assertEquals(6, foo.i1)
+        foo.s1 = u"y"
+        self.assertEquals(u"y", foo["s1"])
+        self.assertEquals(
+            "foo(foo_id=None, i1=6, s1=u'y', d1=None)", repr(foo)
+            )
+        self.assertFalse(hasattr(foo, "__dict__"))
+        try:
+            foo.x = 1
+        except AttributeError:
+            pass
+        else:
+            self.fail()
+        self.assertEquals(Foo.record_class(None, 6, u"y", None), foo)
+        self.assertNotEquals(Foo.record_class(None, 7, u"y", None), foo)
+        self.assertNotEquals(Foo.new(i1=6, s1=u"y"), foo)
+        try:
+            Foo.record_class(1, 2)
+        except AssertionError, e:
+            self.assertEquals("foo: expected 4 values, got 2", str(e))
+        else:
+            self.fail()
+
+    def test_record_class(self):
+        # made on first use, unicode table names allowed
+        t = Table(u"t", IntCol("a"), IntCol("values"))
+        self.assertFalse("record_class" in t.__dict__)
+        self.assertEquals({"a": 1, "values": 2}, t.row_builder(ROW_DICT)((1, 2)))
+        try:
+            t.record_class
+        except AssertionError, e:
+            self.assertEquals(
+                "ROW_RECORD: column 'values' clashes with Record.values()", str(e)
+                )
+        else:
+            self.fail()
+        t = Table(u"t", IntCol("a"))
+        self.assert_(t.record_class is t.record_class)
+        self.assertEquals("t", t.record_class.__name__)
+        self.assertEquals(t.new_record(a=3), t.new_record(a=3))
+
     def test_q(self):
         q = Foo.q
         # existing columns
@@ -275,6 +379,18 @@ class TableTest(unittest.TestCase):
         else:
             self.fail()
 
+    def test_q_ops_param(self):
+        # Param values are checked when the prepared query is run
+        qexpr = Foo.q.foo_id == Param("foo_id")
+        self.assert_(isinstance(qexpr, SqlCondition))
+        self.assertEquals("\"foo_id = Param('foo_id')\"", repr(qexpr))
+        try:
+            Param(1)
+        except AssertionError, e:
+            self.assertEquals("Param name must be str", str(e))
+        else:
+            self.fail()
+
     def test_AND(self):
         qexpr1 = Foo.q.foo_id == 1
         qexpr2 = Foo.q.s1 == 'x'
@@ -284,7 +400,9 @@ class TableTest(unittest.TestCase):
         try:
             AND(qexpr1, "xyz")
         except AssertionError, e:
-            self.assertEquals("AND: conditions must be SqlCondition", str(e))
+            self.assertEquals(
+                "AND: conditions must be SqlCondition, AND, OR or NOT", str(e)
+                )
         else:
             self.fail()
         try:
@@ -303,7 +421,9 @@ class TableTest(unittest.TestCase):
         try:
             OR(qexpr1, "xyz")
         except AssertionError, e:
-            self.assertEquals("OR: conditions must be SqlCondition", str(e))
+            self.assertEquals(
+                "OR: conditions must be SqlCondition, AND, OR or NOT", str(e)
+                )
         else:
             self.fail()
         try:
@@ -313,6 +433,87 @@ class TableTest(unittest.TestCase):
         else:
             self.fail()
 
+    def test_NOT(self):
+        qexpr1 = Foo.q.foo_id == 1
+        NOT(qexpr1)
+        NOT(NOT(qexpr1))
+        try:
+            NOT("xyz")
+        except AssertionError, e:
+            self.assertEquals(
+                "NOT: condition must be SqlCondition, AND, OR or NOT", str(e)
+                )
+        else:
+            self.fail()
+
+    def test_nested(self):
+        qexpr1 = Foo.q.foo_id == 1
+        qexpr2 = Foo.q.s1 == 'x'
+        qexpr3 = Foo.q.d1 == None
+        self.assertEquals(
+            "\"foo_id = 1 AND (s1 = 'x' OR d1 = None)\"",
+            repr(AND(qexpr1, OR(qexpr2, qexpr3)))
+            )
+        self.assertEquals(
+            "\"foo_id = 1 AND s1 = 'x' AND NOT (d1 = None OR foo_id = 1)\"",
+            repr(AND(AND(qexpr1, qexpr2), NOT(OR(qexpr3, qexpr1))))
+            )
+
+    def test_q_ops_in(self):
+        cond = Foo.q.foo_id.IN([1, 2L])
+        self.assertEquals("IN", cond.op)
+        self.assertEquals((1, 2L), cond.other)
+        self.assertEquals('"foo_id IN (1, 2L)"', repr(cond))
+        cond = Foo.q.s1.NOT_IN(x for x in ["a", "b"])
+        self.assertEquals("NOT IN", cond.op)
+        self.assertEquals(("a", "b"), cond.other)
+        for fn, values, msg in [
+                (Foo.q.i1.IN, [], "IN: values cannot be empty"),
+                (Foo.q.i1.NOT_IN, [1, None], "NOT IN: cannot use None"),
+                ]:
+            try:
+                fn(values)
+            except AssertionError, e:
+                self.assertEquals(msg, str(e))
+            else:
+                self.fail()
+        try:
+            Foo.q.i1.IN([1, "2"])
+        except TypeError, e:
+            self.assertEquals("IntCol 'i1': int expected, got str", str(e))
+        else:
+            self.fail()
+
+    def test_aggregates(self):
+        self.assertEquals("COUNT(*)", repr(COUNT()))
+        self.assertEquals("COUNT(d1)", repr(COUNT(Foo.q.d1)))
+        self.assertEquals("SUM(i1)", repr(SUM(Foo.q.i1)))
+        self.assertEquals("MIN(s1)", repr(MIN(Foo.q.s1)))
+        self.assertEquals("MAX(d1)", repr(MAX(Foo.q.d1)))
+        self.assertEquals("AVG(i1)", repr(AVG(Foo.q.i1)))
+        # typed values
+        self.assertEquals(3, COUNT().db_to_py(3L))
+        self.assert_(type(SUM(Foo.q.i1).db_to_py(Decimal("12"))) is int)
+        self.assertEquals(12, SUM(Foo.q.i1).db_to_py(Decimal("12")))
+        self.assertEquals(2.5, AVG(Foo.q.i1).db_to_py(Decimal("2.5")))
+        self.assertEquals(
+            date(2006, 5, 30), MAX(Foo.q.d1).db_to_py("2006-05-30")
+            )
+        self.assertEquals(None, SUM(Foo.q.i1).db_to_py(None))
+        # bad columns
+        for fn, qcol, msg in [
+                (SUM, Foo.q.s1, "SUM: column must be IntCol or FloatCol"),
+                (AVG, Foo.q.d1, "AVG: column must be IntCol or FloatCol"),
+                (MAX, Bar.q.bb, "MAX: does not support BoolCol"),
+                (MIN, "i1", "MIN: column must be instance of QueryCol"),
+                ]:
+            try:
+                fn(qcol)
+            except AssertionError, e:
+                self.assertEquals(msg, str(e))
+            else:
+                self.fail()
+
     def test_q_sort(self):
         qexpr = Foo.q.foo_id.ASC
         self.assert_(isinstance(qexpr, SqlSort))
@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from binder import *
+
+from bindertest.testdbconfig import connect
+from bindertest.tabledefs import Foo
+
+
+class ThreadLocalConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        conn = connect()
+        conn.drop_table_if_exists(Foo)
+        conn.create_table(Foo)
+        conn.insert(Foo, Foo.new(foo_id=1, i1=101))
+        conn.commit()
+        conn.close()
+
+    def test_per_thread(self):
+        tlconn = ThreadLocalConnection(connect, row_factory=ROW_TUPLE)
+        conn = tlconn.get()
+        self.assert_(tlconn.get() is conn)
+        self.assertEquals(ROW_TUPLE, conn.row_factory)
+        # methods go to this thread's connection
+        self.assertEquals(1, tlconn.count(Foo))
+        results = []
+        def run():
+            thread_conn = tlconn.get()
+            rows = tlconn.select(Foo, cols=[Foo.q.i1])
+            tlconn.close()
+            results.append((thread_conn is conn, rows, thread_conn._is_open))
+        threads = [threading.Thread(target=run) for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEquals([(False, [(101,)], False)] * 3, results)
+        self.assertEquals(1, len(tlconn._conns))
+        tlconn.close_all()
+        self.assertFalse(conn._is_open)
+
+    def test_close(self):
+        tlconn = ThreadLocalConnection(connect)
+        conn = tlconn.get()
+        tlconn.close()
+        self.assertFalse(conn._is_open)
+        # reopened on next use
+        conn2 = tlconn.get()
+        self.assert_(conn2 is not conn)
+        self.assertEquals(1, tlconn.count(Foo))
+        conn2.close()
+        self.assert_(tlconn.get() is not conn2)
+        tlconn.close()
+
+    def test_iterators(self):
+        # each thread's iterator is independent
+        tlconn = ThreadLocalConnection(connect)
+        i = tlconn.xselect(Foo)
+        results = []
+        def run():
+            results.append(tlconn.count(Foo))
+            tlconn.close()
+        t = threading.Thread(target=run)
+        t.start()
+        t.join()
+        self.assertEquals([1], results)
+        self.assertEquals(1, len(list(i)))
+        tlconn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
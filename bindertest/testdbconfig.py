@@ -8,8 +8,8 @@ import os
 # SQLite
 _bindertest_dir = os.path.dirname( __file__ )
 DBFILE = os.path.join(_bindertest_dir, "test.db3")
-def connect_sqlite(read_only=None):
-    return SqliteConnection(DBFILE, read_only)
+def connect_sqlite(read_only=None, **kwargs):
+    return SqliteConnection(DBFILE, read_only, **kwargs)
 
 # Postgres / MySQL test database details - modify as needed
 TEST_HOST = "localhost"
@@ -18,7 +18,7 @@ TEST_PASSWORD = "binderpassword"
 TEST_DATABASE = "bindertestdb"
 
 # Postgres - modify as needed
-def connect_postgres(read_only=None, isolation_level=None):
+def connect_postgres(read_only=None, isolation_level=None, **kwargs):
     d = {
         "host": TEST_HOST,
         "user": TEST_USER,
@@ -28,10 +28,11 @@ def connect_postgres(read_only=None, isolation_level=None):
     d['read_only'] = read_only
     if isolation_level:
         d['isolation_level'] = isolation_level
+    d.update(kwargs)
     return PostgresConnection(**d)
 
 # MySQL - modify as needed
-def connect_mysql(read_only=None, isolation_level=None):
+def connect_mysql(read_only=None, isolation_level=None, **kwargs):
     d = {
         "host": TEST_HOST,
         "user": TEST_USER,
@@ -41,6 +42,7 @@ def connect_mysql(read_only=None, isolation_level=None):
     d['read_only'] = read_only
     if isolation_level:
         d['isolation_level'] = isolation_level
+    d.update(kwargs)
     return MysqlConnection(**d)
 
 